@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""
+Microbenchmark de los generadores de scripts SQL (SqlScriptBuilder).
+
+Arma libros Excel sintéticos de crear_tabla (hasta 10.000 columnas) y de
+asignar_permisos (hasta 50.000 GRANT), los lee una sola vez y mide solo la
+generación del script para tamaños crecientes. Con escalamiento lineal el
+costo por elemento (µs/elem) se mantiene constante al duplicar la entrada.
+
+Uso:
+    python scripts/benchmark_generadores.py [--columnas 10000] [--grants 50000] [--repeticiones 3]
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import django
+
+# Configurar Django
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tickets_project.settings')
+django.setup()
+
+from openpyxl import Workbook
+from tickets.utils import (ParsedWorkbook, SqlScriptBuilder, generar_script_permisos_usuarios,
+                           generar_script_tabla)
+
+TIPOS = ['varchar', 'int', 'bigint', 'decimal', 'date', 'timestamp', 'boolean', 'text']
+
+
+def libro_tabla(ruta, columnas):
+    """Plantilla crear_tabla con `columnas` filas de definición"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(['Nombre Tabla', 'bench'])
+    ws.append(['Esquema', 'public'])
+    ws.append([])
+    ws.append(['Nombre de la columna', 'Tipo de dato', 'Tamaño', 'Es nullable', 'Valor por defecto',
+               'Es llave primaria', 'Comentario de campo'])
+    for i in range(columnas):
+        ws.append([f'col_{i}', TIPOS[i % len(TIPOS)], 50 if i % len(TIPOS) == 0 else None,
+                   'NO' if i % 3 else 'SI', None, 'SI' if i == 0 else 'NO', f'columna {i}'])
+    wb.save(ruta)
+
+
+def libro_permisos(ruta, grants):
+    """Plantilla asignar_permisos con `grants` tablas"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(['Nombre Usuario', 'usr_bench'])
+    ws.append(['base de datos', 'bench'])
+    ws.append(['Es usuario Nuevo', 'Si'])
+    ws.append([])
+    ws.append(['Esquema', 'Nombre Tabla', 'Select', 'Insert', 'Update', 'Delete'])
+    for i in range(grants):
+        ws.append([f'esq_{i % 20}', f't{i}', 'Si', 'Si' if i % 2 else 'No', 'No', 'Si' if i % 5 == 0 else 'No'])
+    wb.save(ruta)
+
+
+def medir(funcion, repeticiones):
+    """Mediana en segundos; la salida por consola de los generadores se descarta"""
+    tiempos = []
+    for _ in range(repeticiones):
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def tamanos(maximo):
+    return [maximo // 8, maximo // 4, maximo // 2, maximo]
+
+
+def imprimir(titulo, filas):
+    print(f"\n{'=' * 20} {titulo} {'=' * 20}")
+    print(f"{'elementos':>10} {'ms':>10} {'µs/elem':>10} {'KB':>10}")
+    for cantidad, segundos, largo in filas:
+        print(f"{cantidad:10} {segundos * 1000:10.1f} {segundos * 1e6 / cantidad:10.2f} {largo / 1024:10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--columnas', type=int, default=10000)
+    parser.add_argument('--grants', type=int, default=50000)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directorio:
+        filas = []
+        for cantidad in tamanos(args.columnas):
+            ruta = os.path.join(directorio, f'tabla_{cantidad}.xlsx')
+            libro_tabla(ruta, cantidad)
+            df = ParsedWorkbook(ruta).dataframe()
+            script = generar_script_tabla(df.copy(), 'crear_tabla', 'bench', 'postgresql')
+            segundos = medir(lambda: generar_script_tabla(df.copy(), 'crear_tabla', 'bench', 'postgresql'),
+                             args.repeticiones)
+            filas.append((cantidad, segundos, len(script)))
+        imprimir('crear_tabla (columnas)', filas)
+
+        filas = []
+        for cantidad in tamanos(args.grants):
+            ruta = os.path.join(directorio, f'permisos_{cantidad}.xlsx')
+            libro_permisos(ruta, cantidad)
+            libro = ParsedWorkbook(ruta)
+            with contextlib.redirect_stdout(io.StringIO()):
+                script = generar_script_permisos_usuarios(libro, 'sqlserver')
+            segundos = medir(lambda: generar_script_permisos_usuarios(libro, 'sqlserver'), args.repeticiones)
+            filas.append((cantidad, segundos, len(script)))
+        imprimir('asignar_permisos sqlserver (GRANT)', filas)
+
+    # Solo el buffer: sentencias sintéticas, sin pandas ni lectura de filas
+    filas = []
+    for cantidad in tamanos(args.grants * 4):
+        def armar():
+            sql = SqlScriptBuilder('sqlserver')
+            for i in range(cantidad):
+                sql.sentencia(f"GRANT SELECT ON [esq].[t{i}] TO [usr_bench];", fin_lote=True)
+            return sql.render()
+        filas.append((cantidad, medir(armar, args.repeticiones), len(armar())))
+    imprimir('SqlScriptBuilder (sentencias)', filas)
+
+
+if __name__ == '__main__':
+    main()
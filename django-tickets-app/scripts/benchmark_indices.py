@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""
+Benchmark de los índices de Solicitud (Meta.indexes).
+
+Crea una base de datos de prueba con el motor configurado (SQLite en memoria
+o una base test_* en PostgreSQL), la llena con solicitudes sintéticas y, para
+cada consulta caliente de los listados, muestra el plan y el tiempo SIN los
+índices de Meta.indexes y CON ellos.
+
+Uso:
+    python scripts/benchmark_indices.py [--solicitudes 50000] [--repeticiones 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+import django
+
+# Configurar Django
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tickets_project.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from tickets.models import Proyecto, Solicitud
+
+
+def poblar(cantidad, usuarios=200, proyectos=50):
+    """Inserta usuarios, proyectos y solicitudes sintéticas con bulk_create"""
+    rnd = random.Random(42)
+    User.objects.bulk_create(User(username=f'bench_{i}') for i in range(usuarios))
+    Proyecto.objects.bulk_create(
+        Proyecto(nombre=f'Bench {i}', codigo=f'BENCH{i}') for i in range(proyectos)
+    )
+    ids_usuarios = list(User.objects.values_list('id', flat=True))
+    ids_proyectos = list(Proyecto.objects.values_list('id', flat=True))
+    tipos = [codigo for codigo, _ in Solicitud.TIPOS_SOLICITUD]
+    estados = [codigo for codigo, _ in Solicitud.ESTADOS]
+    ahora = timezone.now()
+
+    lote = []
+    for i in range(cantidad):
+        tipo = rnd.choice(tipos)
+        pendiente = tipo in Solicitud.TIPOS_BD and rnd.random() < 0.05
+        lote.append(Solicitud(
+            proyecto_id=rnd.choice(ids_proyectos),
+            tipo_solicitud=tipo,
+            tipo_archivo='excel' if pendiente or rnd.random() < 0.3 else None,
+            archivo_adjunto='solicitudes/bench.xlsx' if pendiente else None,
+            estado=rnd.choice(estados),
+            usuario_id=rnd.choice(ids_usuarios),
+            lider_proyecto_id=rnd.choice(ids_usuarios) if rnd.random() < 0.2 else None,
+            base_datos_aplicacion='bench',
+            correo_notificacion='bench@example.com',
+            script_sql_generado=None if pendiente else '-- script',
+        ))
+        if len(lote) == 5000 or i == cantidad - 1:
+            Solicitud.objects.bulk_create(lote)
+            # auto_now_add pisa la fecha en bulk_create: repartirlas en un año
+            for solicitud in lote:
+                solicitud.fecha_creacion = ahora - timedelta(minutes=rnd.randrange(365 * 24 * 60))
+            Solicitud.objects.bulk_update(lote, ['fecha_creacion'])
+            lote = []
+    return ids_usuarios, ids_proyectos
+
+
+def consultas(ids_usuarios, ids_proyectos):
+    """Consultas de los listados (dashboard por rol, proyecto, fechas y cola de scripts)"""
+    usuario = ids_usuarios[0]
+    ahora = timezone.now()
+    return {
+        'dashboard dev (usuario)':
+            Solicitud.objects.filter(usuario_id=usuario).order_by('-fecha_creacion')[:10],
+        'dashboard db (usuario OR tipos BD)':
+            Solicitud.objects.filter(
+                Q(usuario_id=usuario) | Q(tipo_solicitud__in=Solicitud.TIPOS_BD)
+            ).order_by('-fecha_creacion')[:10],
+        'dashboard lider (usuario OR lider)':
+            Solicitud.objects.filter(
+                Q(usuario_id=usuario) | Q(lider_proyecto_id=usuario)
+            ).order_by('-fecha_creacion')[:10],
+        'dashboard filtro tipo':
+            Solicitud.objects.filter(tipo_solicitud='crear_tabla').order_by('-fecha_creacion')[:10],
+        'proyecto + estado (count)':
+            Solicitud.objects.filter(proyecto_id=ids_proyectos[0], estado='registrada'),
+        'rango de fechas':
+            Solicitud.objects.filter(
+                fecha_creacion__gte=ahora - timedelta(days=7), fecha_creacion__lt=ahora
+            ).order_by('-fecha_creacion')[:10],
+        'pendientes de script':
+            Solicitud.objects.pendientes_de_script().order_by('-fecha_creacion')[:10],
+    }
+
+
+def medir(qs, repeticiones):
+    """Mediana en ms de evaluar la consulta (count() para las que no son listados)"""
+    if qs.query.is_sliced:
+        ejecutar = lambda: list(qs.all())  # .all() evita la cache de resultados del queryset
+    else:
+        ejecutar = qs.count
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        ejecutar()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def plan(qs):
+    if not qs.query.is_sliced:
+        qs = qs.order_by().values('pk')
+    return qs.explain()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--solicitudes', type=int, default=50000)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    nombre_original = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        print(f"Motor: {connection.vendor} | Solicitudes: {args.solicitudes}")
+        inicio = time.perf_counter()
+        ids_usuarios, ids_proyectos = poblar(args.solicitudes)
+        print(f"Datos generados en {time.perf_counter() - inicio:.1f}s")
+
+        indices = Solicitud._meta.indexes
+        resultados = {}
+        for con_indices in (False, True):
+            with connection.schema_editor() as editor:
+                for indice in indices:
+                    if con_indices:
+                        editor.add_index(Solicitud, indice)
+                    else:
+                        editor.remove_index(Solicitud, indice)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            etiqueta = 'CON índices' if con_indices else 'SIN índices'
+            print(f"\n{'=' * 20} {etiqueta} {'=' * 20}")
+            for nombre, qs in consultas(ids_usuarios, ids_proyectos).items():
+                ms = medir(qs, args.repeticiones)
+                resultados.setdefault(nombre, []).append(ms)
+                print(f"\n-- {nombre}: {ms:.2f} ms")
+                print(plan(qs))
+
+        print(f"\n{'=' * 20} Resumen (mediana ms) {'=' * 20}")
+        print(f"{'consulta':40} {'sin':>10} {'con':>10} {'mejora':>8}")
+        for nombre, (sin, con) in resultados.items():
+            print(f"{nombre:40} {sin:10.2f} {con:10.2f} {sin / con if con else 0:7.1f}x")
+    finally:
+        connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""
+Benchmark de la lectura de hojas de permisos (asignar_permisos / crear_usuarios).
+
+Compara, sobre libros sintéticos con cantidades crecientes de filas:
+
+  - DataFrame: ParsedWorkbook + tabla_desde_cabecera + df.iterrows(), la ruta
+    que usaba generar_script_permisos_usuarios antes de leer en streaming
+  - streaming: iterar_script_permisos_usuarios(ruta), que recorre la hoja con
+    iter_rows(values_only=True) sin armar la grilla ni un DataFrame
+
+Ambas entregan el script por tandas y se consumen sin unirlo, como una
+descarga. Para cada una informa filas/s y el pico de memoria (tracemalloc):
+con lectura en streaming el pico se mantiene plano al crecer las filas.
+
+Uso:
+    python scripts/benchmark_permisos.py [--filas 50000] [--repeticiones 3]
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import django
+
+# Configurar Django
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tickets_project.settings')
+django.setup()
+
+from openpyxl import Workbook
+from tickets.dialectos import get_dialecto
+from tickets.utils import ParsedWorkbook, SqlScriptBuilder, iterar_script_permisos_usuarios
+
+MOTOR = 'postgresql'
+
+
+def libro_permisos(ruta, filas):
+    """
+    Plantilla asignar_permisos con `filas` tablas. Se escribe en modo normal para
+    usar shared strings como Excel (write_only guarda los textos inline, que
+    openpyxl lee bastante mas lento)
+    """
+    wb = Workbook()
+    ws = wb.active
+    ws.append(['Nombre Usuario', 'usr_bench'])
+    ws.append(['base de datos', 'bench'])
+    ws.append(['Es usuario Nuevo', 'Si'])
+    ws.append([])
+    ws.append(['Esquema', 'Nombre Tabla', 'Select', 'Insert', 'Update', 'Delete'])
+    for i in range(filas):
+        ws.append([f'esq_{i % 20}', f't{i}', 'Si', 'Si' if i % 2 else 'No', 'No', 'Si' if i % 5 == 0 else 'No'])
+    wb.save(ruta)
+
+
+def con_dataframe(ruta):
+    """Ruta anterior: grilla completa en memoria, DataFrame y un Series por fila"""
+    libro = ParsedWorkbook(ruta)
+    _, df = libro.tabla_desde_cabecera('esquema')
+    dialecto = get_dialecto(MOTOR)
+    sql = SqlScriptBuilder(dialecto)
+    for _, row in df.iterrows():
+        permisos = [permiso for permiso, columna in
+                    (('SELECT', 'Select'), ('INSERT', 'Insert'), ('UPDATE', 'Update'), ('DELETE', 'Delete'))
+                    if str(row[columna]).strip().lower() == 'si']
+        if permisos:
+            sql.sentencia(dialecto.grant(", ".join(permisos), row['Esquema'], row['Nombre Tabla'], 'usr_bench'))
+            yield from sql.vaciar(SqlScriptBuilder.TANDA)
+    yield from sql.vaciar()
+
+
+def en_streaming(ruta):
+    return iterar_script_permisos_usuarios(ruta, MOTOR)
+
+
+def consumir(partes):
+    for _ in partes:
+        pass
+
+
+def medir(funcion, ruta, repeticiones):
+    """(mediana en segundos, pico de memoria en MB); la salida por consola se descarta"""
+    tiempos = []
+    for _ in range(repeticiones):
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            consumir(funcion(ruta))
+            tiempos.append(time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        consumir(funcion(ruta))
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(tiempos), pico / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=50000)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'filas':>8} {'DataFrame filas/s':>18} {'MB':>7} {'streaming filas/s':>18} {'MB':>7} {'mejora':>7}")
+    with tempfile.TemporaryDirectory() as directorio:
+        for cantidad in (args.filas // 8, args.filas // 4, args.filas // 2, args.filas):
+            ruta = os.path.join(directorio, f'permisos_{cantidad}.xlsx')
+            libro_permisos(ruta, cantidad)
+            seg_df, mb_df = medir(con_dataframe, ruta, args.repeticiones)
+            seg_st, mb_st = medir(en_streaming, ruta, args.repeticiones)
+            print(f"{cantidad:8} {cantidad / seg_df:18.0f} {mb_df:7.1f} {cantidad / seg_st:18.0f} {mb_st:7.1f} "
+                  f"{seg_df / seg_st:6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Benchmark del costo por columna de la resolución de tipos (Dialecto.tipo_dato).
+
+Mide la resolución de tipos con una mezcla realista (tipos simples y con
+parámetros como varchar(20) o numeric(10,2)) en tres escenarios:
+
+  - sin cache: cada llamada resuelve el tipo (tabla del dialecto + regex)
+  - con cache: las llamadas repetidas salen del lru_cache
+  - extracción: _extraer_columnas_tabla completo sobre una hoja de N columnas
+
+Uso:
+    python scripts/benchmark_tipos_dato.py [--columnas 10000] [--repeticiones 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import django
+
+# Configurar Django
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tickets_project.settings')
+django.setup()
+
+import pandas as pd
+from tickets.dialectos import DIALECTOS
+from tickets.utils import _extraer_columnas_tabla, encontrar_headers_en_contenido
+
+TIPOS = ['varchar(20)', 'int', 'bigint', 'numeric(10,2)', 'date', 'timestamp', 'boolean', 'text',
+         'character varying(255)', 'decimal(18, 4)', 'datetime', 'float', 'smallint', 'VARCHAR(50)']
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def hoja_tabla(columnas):
+    """DataFrame con el formato de la plantilla crear_tabla (sin pasar por Excel)"""
+    filas = [['Nombre Tabla', 'bench', None], [None, None, None],
+             ['Nombre de la columna', 'Tipo de dato', 'Tamaño']]
+    for i in range(columnas):
+        tipo = TIPOS[i % len(TIPOS)]
+        filas.append([f'col_{i}', tipo, 30 if '(' not in tipo and i % 2 else None])
+    return pd.DataFrame(filas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--columnas', type=int, default=10000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    tipos = [TIPOS[i % len(TIPOS)] for i in range(args.columnas)]
+    df = hoja_tabla(args.columnas)
+    fila_headers, columnas_headers = encontrar_headers_en_contenido(df)
+
+    print(f"Columnas: {args.columnas} | tipos distintos: {len(TIPOS)}")
+    print(f"{'motor':12} {'sin cache':>14} {'con cache':>14} {'extracción':>14}   (ns/columna)")
+    for motor, dialecto in DIALECTOS.items():
+        sin_cache = dialecto.tipo_dato.__wrapped__
+        frio = medir(lambda: [sin_cache(t) for t in tipos], args.repeticiones)
+        dialecto.tipo_dato.cache_clear()
+        caliente = medir(lambda: [dialecto.tipo_dato(t) for t in tipos], args.repeticiones)
+        extraccion = medir(lambda: _extraer_columnas_tabla(df, fila_headers, columnas_headers, dialecto),
+                           args.repeticiones)
+        print(f"{motor:12} {frio * 1e9 / args.columnas:14.0f} {caliente * 1e9 / args.columnas:14.0f} "
+              f"{extraccion * 1e9 / args.columnas:14.0f}   {dialecto.tipo_dato.cache_info()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -41,7 +41,7 @@ def debug_template_variables():
         print(f"\n📋 Solicitud: #{solicitud.id}")
         print(f"📁 Archivo: {solicitud.archivo_adjunto.name}")
         print(f"📊 Tipo archivo: {solicitud.tipo_archivo}")
-        print(f"💾 Script generado: {'Sí' if solicitud.script_sql_generado else 'No'}")
+        print(f"💾 Script generado: {'Sí' if solicitud.tiene_script else 'No'}")
         
         # Simular variables del contexto (como en la vista)
         puede_generar_script = solicitud.puede_generar_script(user_db)
@@ -57,14 +57,14 @@ def debug_template_variables():
         print(f"\n🎯 CONDICIONES DEL TEMPLATE:")
         
         # Condición 1: Script ya generado
-        condicion1 = mostrar_script and solicitud.script_sql_generado
+        condicion1 = mostrar_script and solicitud.tiene_script
         print(f"   1. Mostrar script generado: {condicion1}")
-        print(f"      (mostrar_script={mostrar_script} AND script_generado={bool(solicitud.script_sql_generado)})")
+        print(f"      (mostrar_script={mostrar_script} AND script_generado={bool(solicitud.tiene_script)})")
         
         # Condición 2: Botón generar script
-        condicion2 = puede_generar_script and solicitud.archivo_adjunto and not solicitud.script_sql_generado
+        condicion2 = puede_generar_script and solicitud.archivo_adjunto and not solicitud.tiene_script
         print(f"   2. Mostrar botón generar: {condicion2}")
-        print(f"      (puede_generar={puede_generar_script} AND tiene_archivo={bool(solicitud.archivo_adjunto)} AND no_script={not bool(solicitud.script_sql_generado)})")
+        print(f"      (puede_generar={puede_generar_script} AND tiene_archivo={bool(solicitud.archivo_adjunto)} AND no_script={not bool(solicitud.tiene_script)})")
         
         # Condición 3: Mensaje para usuarios sin permisos
         condicion3 = solicitud.archivo_adjunto and solicitud.tipo_archivo == 'excel' and not puede_generar_script
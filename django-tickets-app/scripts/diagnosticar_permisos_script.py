@@ -81,7 +81,7 @@ def diagnosticar_permisos():
             print(f"      Tipo: {solicitud.get_tipo_solicitud_display()}")
             print(f"      Usuario: {solicitud.usuario.username}")
             print(f"      Archivo: {solicitud.archivo_adjunto.name if solicitud.archivo_adjunto else 'Sin archivo'}")
-            print(f"      Script generado: {'Sí' if solicitud.script_sql_generado else 'No'}")
+            print(f"      Script generado: {'Sí' if solicitud.tiene_script else 'No'}")
             print()
         
         # 4. Verificar configuración de roles
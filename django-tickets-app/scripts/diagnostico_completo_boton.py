@@ -33,9 +33,8 @@ def diagnostico_completo_boton():
         
         # 2. Buscar solicitud específica para probar
         solicitud_test = Solicitud.objects.filter(
-            tipo_archivo='excel',
+            Solicitud.CONDICION_SIN_SCRIPT,
             archivo_adjunto__isnull=False,
-            script_sql_generado__isnull=True
         ).first()
         
         if not solicitud_test:
@@ -47,7 +46,7 @@ def diagnostico_completo_boton():
         print(f"   Usuario: {solicitud_test.usuario.username}")
         print(f"   Archivo: {solicitud_test.archivo_adjunto.name}")
         print(f"   Tipo archivo: {solicitud_test.tipo_archivo}")
-        print(f"   Script generado: {bool(solicitud_test.script_sql_generado)}")
+        print(f"   Script generado: {bool(solicitud_test.tiene_script)}")
         
         # 3. Probar métodos del modelo
         print(f"\n🧪 PROBANDO MÉTODOS DEL MODELO:")
@@ -80,14 +79,14 @@ def diagnostico_completo_boton():
         print(f"\n🎯 CONDICIONES DEL TEMPLATE:")
         
         # Condición 1: Script ya generado
-        condicion1 = mostrar_script and solicitud_test.script_sql_generado
+        condicion1 = mostrar_script and solicitud_test.tiene_script
         print(f"   1. Mostrar script existente: {condicion1}")
-        print(f"      (mostrar_script={mostrar_script} AND script_generado={bool(solicitud_test.script_sql_generado)})")
+        print(f"      (mostrar_script={mostrar_script} AND script_generado={bool(solicitud_test.tiene_script)})")
         
         # Condición 2: Botón generar (LA IMPORTANTE)
-        condicion2 = puede_generar_script and solicitud_test.archivo_adjunto and not solicitud_test.script_sql_generado
+        condicion2 = puede_generar_script and solicitud_test.archivo_adjunto and not solicitud_test.tiene_script
         print(f"   2. Mostrar botón generar: {condicion2}")
-        print(f"      (puede_generar={puede_generar_script} AND tiene_archivo={bool(solicitud_test.archivo_adjunto)} AND no_script={not bool(solicitud_test.script_sql_generado)})")
+        print(f"      (puede_generar={puede_generar_script} AND tiene_archivo={bool(solicitud_test.archivo_adjunto)} AND no_script={not bool(solicitud_test.tiene_script)})")
         
         # Condición 3: Mensaje de espera
         condicion3 = solicitud_test.archivo_adjunto and solicitud_test.tipo_archivo == 'excel' and not puede_generar_script
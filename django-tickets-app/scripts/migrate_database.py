@@ -22,6 +22,9 @@ def run_migrations():
     
     # Aplicar migraciones
     execute_from_command_line(['manage.py', 'migrate'])
+
+    # Tabla de la cache de scripts generados (CACHES['scripts_sql'])
+    execute_from_command_line(['manage.py', 'createcachetable'])
     
     print("Migraciones completadas!")
 
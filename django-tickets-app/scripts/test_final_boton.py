@@ -32,7 +32,7 @@ def test_final_boton():
         puede_generar_script = solicitud.puede_generar_script(user_db)
         mostrar_script = solicitud.puede_ver_script(user_db)
         tiene_archivo = bool(solicitud.archivo_adjunto)
-        ya_tiene_script = bool(solicitud.script_sql_generado)
+        ya_tiene_script = bool(solicitud.tiene_script)
         
         print(f"\n🔍 VARIABLES DEL CONTEXTO:")
         print(f"   puede_generar_script: {puede_generar_script}")
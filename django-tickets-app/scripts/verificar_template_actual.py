@@ -28,7 +28,7 @@ def verificar_template_actual():
         print(f"\n🔍 BUSCANDO SECCIONES RELEVANTES:")
         
         # Buscar condiciones del botón
-        if 'puede_generar_script and solicitud.archivo_adjunto and not solicitud.script_sql_generado' in contenido:
+        if 'puede_generar_script and solicitud.archivo_adjunto and not solicitud.tiene_script' in contenido:
             print("✅ Condición correcta del botón encontrada")
         else:
             print("❌ Condición correcta del botón NO encontrada")
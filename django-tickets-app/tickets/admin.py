@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import UserProfile, Solicitud, HistorialEstado, Comentario
+from .models import UserProfile, Solicitud, HistorialEstado, Comentario, CorreoPendiente, ScriptGenerado, GeneracionJob
 
 class UserProfileInline(admin.StackedInline):
     model = UserProfile
@@ -31,3 +31,25 @@ class HistorialEstadoAdmin(admin.ModelAdmin):
 class ComentarioAdmin(admin.ModelAdmin):
     list_display = ['solicitud', 'usuario', 'fecha_creacion']
     list_filter = ['fecha_creacion']
+
+@admin.register(CorreoPendiente)
+class CorreoPendienteAdmin(admin.ModelAdmin):
+    list_display = ['asunto', 'tipo', 'estado', 'intentos', 'proximo_intento', 'fecha_envio']
+    list_filter = ['estado', 'tipo']
+    search_fields = ['asunto', 'ultimo_error']
+    # El cuerpo de las credenciales lleva la contraseña
+    exclude = ['cuerpo']
+
+@admin.register(ScriptGenerado)
+class ScriptGeneradoAdmin(admin.ModelAdmin):
+    list_display = ['solicitud', 'version', 'tamano', 'generado_por', 'fecha_creacion']
+    search_fields = ['solicitud__id', 'hash_contenido']
+    exclude = ['contenido']
+    readonly_fields = ['solicitud', 'version', 'hash_contenido', 'tamano', 'generado_por', 'fecha_creacion']
+
+@admin.register(GeneracionJob)
+class GeneracionJobAdmin(admin.ModelAdmin):
+    list_display = ['solicitud', 'estado', 'solicitado_por', 'duracion', 'fecha_creacion', 'fecha_fin']
+    list_filter = ['estado']
+    search_fields = ['solicitud__id', 'error']
+    readonly_fields = ['script', 'fecha_creacion', 'fecha_inicio', 'fecha_fin']
@@ -0,0 +1,388 @@
+"""
+Dialectos SQL de los motores soportados por los generadores de scripts.
+
+Cada motor es una subclase de Dialecto con sus plantillas de sentencias,
+su forma de citar identificadores y su tabla de tipos. El dialecto se
+resuelve una sola vez por script con get_dialecto(motor_bd) y los
+generadores llaman a sus métodos, sin volver a comparar el nombre del motor
+en cada sentencia.
+
+Para agregar un motor basta con registrar una subclase:
+
+    @registrar_dialecto
+    class DialectoMariaDB(DialectoMySQL):
+        nombre = 'mariadb'
+        ENCABEZADO = "-- MariaDB Script\\n-- Generado automaticamente\\n"
+"""
+import re
+from functools import lru_cache
+from types import MappingProxyType
+
+# =========================
+# Tipos genericos -> tipo de cada motor
+# =========================
+# Tablas inmutables de modulo: se consultan una vez por columna y no deben
+# modificarse en tiempo de ejecucion.
+TIPOS_POSTGRESQL = MappingProxyType({
+    'varchar': 'character varying',
+    'int': 'integer',
+    'bigint': 'bigint',
+    'smallint': 'smallint',
+    'float': 'double precision',
+    'double': 'double precision',
+    'decimal': 'numeric',
+    'boolean': 'boolean',
+    'bool': 'boolean',
+    'date': 'date',
+    'datetime': 'timestamp',
+    'timestamp': 'timestamp',
+    'text': 'text',
+    'blob': 'bytea',
+    'serial': 'serial',
+    'bigserial': 'bigserial',
+})
+
+TIPOS_MYSQL = MappingProxyType({
+    'character varying': 'varchar',
+    'integer': 'int',
+    'bigint': 'bigint',
+    'smallint': 'smallint',
+    'double precision': 'double',
+    'numeric': 'decimal',
+    'boolean': 'tinyint(1)',
+    'bool': 'tinyint(1)',
+    'date': 'date',
+    'timestamp': 'datetime',
+    'text': 'text',
+    'bytea': 'blob',
+    'serial': 'int auto_increment',
+    'bigserial': 'bigint auto_increment',
+})
+
+TIPOS_SQLSERVER = MappingProxyType({
+    'character varying': 'nvarchar',
+    'varchar': 'nvarchar',
+    'integer': 'int',
+    'bigint': 'bigint',
+    'smallint': 'smallint',
+    'double precision': 'float',
+    'numeric': 'decimal',
+    'boolean': 'bit',
+    'bool': 'bit',
+    'date': 'date',
+    'timestamp': 'datetime2',
+    'datetime': 'datetime2',
+    'text': 'nvarchar(max)',
+    'bytea': 'varbinary(max)',
+    'serial': 'int identity(1,1)',
+    'bigserial': 'bigint identity(1,1)',
+})
+
+TIPOS_ORACLE = MappingProxyType({
+    'character varying': 'varchar2',
+    'varchar': 'varchar2',
+    'integer': 'number(10)',
+    'int': 'number(10)',
+    'bigint': 'number(19)',
+    'smallint': 'number(5)',
+    'double precision': 'binary_double',
+    'float': 'binary_float',
+    'numeric': 'number',
+    'decimal': 'number',
+    'boolean': 'number(1)',
+    'bool': 'number(1)',
+    'date': 'date',
+    'timestamp': 'timestamp',
+    'datetime': 'timestamp',
+    'text': 'clob',
+    'bytea': 'blob',
+    'serial': 'number generated by default as identity',
+    'bigserial': 'number generated by default as identity',
+})
+
+TIPOS_SQLITE = MappingProxyType({
+    'character varying': 'text',
+    'varchar': 'text',
+    'integer': 'integer',
+    'int': 'integer',
+    'bigint': 'integer',
+    'smallint': 'integer',
+    'double precision': 'real',
+    'float': 'real',
+    'numeric': 'numeric',
+    'decimal': 'numeric',
+    'boolean': 'integer',
+    'bool': 'integer',
+    'date': 'text',
+    'timestamp': 'text',
+    'datetime': 'text',
+    'text': 'text',
+    'bytea': 'blob',
+    'serial': 'integer primary key autoincrement',
+    'bigserial': 'integer primary key autoincrement',
+})
+# Tipos (de cualquier motor) que aceptan tamano/precision entre parentesis
+TIPOS_CON_TAMANO = ('character varying', 'varchar', 'character', 'char', 'numeric', 'decimal',
+                    'nvarchar', 'varchar2', 'number', 'float', 'timestamp', 'datetime2')
+
+# Tipo con parametros: base, (parametros) y resto opcional (ej. 'numeric(10, 2) unsigned')
+_RE_TIPO_PARAMETRIZADO = re.compile(r'^\s*([^()]*?)\s*\(\s*([^()]*?)\s*\)\s*(.*)$')
+
+
+# =========================
+# Dialectos
+# =========================
+class Dialecto:
+    """
+    Dialecto generico: se usa para motores no registrados. Las subclases
+    cambian las plantillas (atributos en mayusculas) y las comillas de los
+    identificadores; los metodos arman cada sentencia con str.format.
+    """
+    nombre = 'generico'
+
+    # Comillas de identificadores (apertura, cierre)
+    COMILLAS = ('', '')
+    # Separador de lotes de sentencias (GO en SQL Server); None si no aplica
+    SEPARADOR_LOTE = None
+    TIPOS = TIPOS_POSTGRESQL
+
+    ENCABEZADO = "-- SQL Script\n"
+    USE_DB = "USE {bd};"
+    CREATE_TABLE = "CREATE TABLE {tabla}"
+    ALTER_TABLE = "ALTER TABLE {tabla}"
+    ADD_COLUMN = "ADD COLUMN {columna} {tipo}"
+    DROP_COLUMN = "DROP COLUMN {columna}"
+    MODIFY_COLUMN = "MODIFY COLUMN {columna} {tipo}"
+    PRIMARY_KEY = "PRIMARY KEY ({columnas})"
+    FOREIGN_KEY = "FOREIGN KEY ({columna}) REFERENCES {referencia}"
+    COMMENT_TABLE = "-- Comentario: {comentario}"
+    COMMENT_COLUMN = "-- Comentario {nombre_columna}: {comentario}"
+    CREATE_USER = "CREATE USER {usuario} IDENTIFIED BY 'password';"
+    GRANT = "GRANT {permisos} ON {tabla} TO {usuario};"
+    # GRANT sobre todas las tablas de un esquema; None si el motor no lo tiene
+    GRANT_ESQUEMA = None
+    # Tablas por GRANT cuando el motor acepta una lista de objetos (1 = una por sentencia)
+    GRANT_MAX_OBJETOS = 1
+    CREATE_DATABASE = "CREATE DATABASE {bd} CHARACTER SET {charset} COLLATE {collation};"
+    CREATE_SCHEMA = "CREATE SCHEMA {esquema} AUTHORIZATION {propietario};"
+
+    def __init__(self):
+        apertura, cierre = self.COMILLAS
+        # Funciones precalculadas: citar un identificador es un str.format ligado
+        self.citar = f"{apertura}{{}}{cierre}".format
+        self._tabla = f"{apertura}{{}}{cierre}.{apertura}{{}}{cierre}".format
+        self.tipo_dato = lru_cache(maxsize=4096)(self._resolver_tipo_dato)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} '{self.nombre}'>"
+
+    # ---- Identificadores ----
+    def tabla(self, esquema, nombre_tabla):
+        """Nombre calificado y citado de la tabla"""
+        return self._tabla(esquema, nombre_tabla)
+
+    def usuario(self, nombre_usuario):
+        return self.citar(nombre_usuario)
+
+    # ---- Tipos ----
+    def _resolver_tipo_dato(self, tipo_dato):
+        """
+        Convierte un tipo generico al tipo del motor. Los tipos con parametros
+        se resuelven por su tipo base conservando el tamano: varchar(20) ->
+        nvarchar(20) en SQL Server. Si el tipo del motor no acepta tamano
+        (integer, text) o ya trae parentesis (tinyint(1), nvarchar(max)) el
+        tamano se descarta. Los tipos desconocidos se retornan sin cambios.
+        tipo_dato() es la version memorizada de este metodo.
+        """
+        tipo_dato_lower = tipo_dato.lower().strip()
+        if tipo_dato_lower in self.TIPOS:
+            return self.TIPOS[tipo_dato_lower]
+
+        coincidencia = _RE_TIPO_PARAMETRIZADO.match(tipo_dato_lower)
+        if coincidencia is None:
+            return tipo_dato
+        base, parametros, resto = coincidencia.groups()
+        tipo_motor = self.TIPOS.get(base)
+        if tipo_motor is None:
+            return tipo_dato
+        if parametros and tipo_motor in TIPOS_CON_TAMANO:
+            tipo_motor = f"{tipo_motor}({parametros.replace(' ', '')})"
+        return f"{tipo_motor} {resto}" if resto else tipo_motor
+
+    # ---- Sentencias ----
+    def use_db(self, base_datos):
+        return self.USE_DB.format(bd=self.citar(base_datos))
+
+    def create_table(self, esquema, nombre_tabla):
+        return self.CREATE_TABLE.format(tabla=self.tabla(esquema, nombre_tabla))
+
+    def alter_table(self, esquema, nombre_tabla):
+        return self.ALTER_TABLE.format(tabla=self.tabla(esquema, nombre_tabla))
+
+    def add_column(self, nombre_col, tipo_dato):
+        return self.ADD_COLUMN.format(columna=self.citar(nombre_col), tipo=tipo_dato)
+
+    def drop_column(self, nombre_col):
+        return self.DROP_COLUMN.format(columna=self.citar(nombre_col))
+
+    def modify_column(self, nombre_col, tipo_dato):
+        return self.MODIFY_COLUMN.format(columna=self.citar(nombre_col), tipo=tipo_dato)
+
+    def primary_key(self, columnas, nombre_pk=None):
+        return self.PRIMARY_KEY.format(
+            columnas=', '.join(columnas),
+            nombre=self.citar(nombre_pk or f"pk_{'_'.join(columnas)}"),
+        )
+
+    def foreign_key(self, columna, tabla_ref):
+        return self.FOREIGN_KEY.format(columna=self.citar(columna), referencia=tabla_ref)
+
+    def comment_table(self, esquema, nombre_tabla, comentario):
+        return self.COMMENT_TABLE.format(tabla=self.tabla(esquema, nombre_tabla), esquema=esquema,
+                                         nombre_tabla=nombre_tabla, comentario=comentario)
+
+    def comment_column(self, esquema, nombre_tabla, nombre_col, comentario):
+        return self.COMMENT_COLUMN.format(tabla=self.tabla(esquema, nombre_tabla), esquema=esquema,
+                                          nombre_tabla=nombre_tabla, columna=self.citar(nombre_col),
+                                          nombre_columna=nombre_col, comentario=comentario)
+
+    def create_user(self, nombre_usuario):
+        return self.CREATE_USER.format(usuario=self.usuario(nombre_usuario))
+
+    def grant(self, permisos, esquema, tabla, nombre_usuario):
+        return self.GRANT.format(permisos=permisos, tabla=self.tabla(esquema, tabla),
+                                 usuario=self.usuario(nombre_usuario))
+
+    def grants(self, permisos, esquema, tablas, nombre_usuario):
+        """
+        GRANT de los mismos permisos sobre varias tablas del esquema: una
+        sentencia por cada GRANT_MAX_OBJETOS tablas
+        """
+        usuario = self.usuario(nombre_usuario)
+        objetos = [self.tabla(esquema, tabla) for tabla in tablas]
+        paso = self.GRANT_MAX_OBJETOS
+        return [self.GRANT.format(permisos=permisos, tabla=", ".join(objetos[i:i + paso]), usuario=usuario)
+                for i in range(0, len(objetos), paso)]
+
+    def grant_esquema(self, permisos, esquema, nombre_usuario):
+        """GRANT sobre todas las tablas del esquema, o None si el motor no lo soporta"""
+        if self.GRANT_ESQUEMA is None:
+            return None
+        return self.GRANT_ESQUEMA.format(permisos=permisos, esquema=self.citar(esquema),
+                                         usuario=self.usuario(nombre_usuario))
+
+    def create_database(self, nombre_bd, charset, collation):
+        return self.CREATE_DATABASE.format(bd=self.citar(nombre_bd), charset=charset, collation=collation)
+
+    def create_schema(self, nombre_esquema, propietario):
+        return self.CREATE_SCHEMA.format(esquema=self.citar(nombre_esquema), propietario=self.citar(propietario))
+
+
+# Motores registrados: nombre (Proyecto.motor_bd) -> instancia del dialecto
+DIALECTOS = {}
+
+
+def registrar_dialecto(clase):
+    """Decorador: registra (o reemplaza) el dialecto de clase.nombre"""
+    DIALECTOS[clase.nombre] = clase()
+    return clase
+
+
+_GENERICO = Dialecto()
+
+
+def get_dialecto(motor_bd):
+    """Dialecto registrado para motor_bd, o el generico si el motor no existe"""
+    return DIALECTOS.get(motor_bd, _GENERICO)
+
+
+@registrar_dialecto
+class DialectoPostgreSQL(Dialecto):
+    nombre = 'postgresql'
+    TIPOS = TIPOS_POSTGRESQL
+
+    ENCABEZADO = "-- PostgreSQL Script\n-- Generado automaticamente\n"
+    USE_DB = "\\c {bd};"
+    MODIFY_COLUMN = "ALTER COLUMN {columna} TYPE {tipo}"
+    PRIMARY_KEY = "CONSTRAINT {nombre} PRIMARY KEY ({columnas})"
+    COMMENT_TABLE = "COMMENT ON TABLE {tabla} IS '{comentario}';"
+    COMMENT_COLUMN = "COMMENT ON COLUMN {tabla}.{columna} IS '{comentario}';"
+    CREATE_USER = "CREATE USER {usuario} WITH PASSWORD 'password';"
+    GRANT_ESQUEMA = "GRANT {permisos} ON ALL TABLES IN SCHEMA {esquema} TO {usuario};"
+    GRANT_MAX_OBJETOS = 50
+    CREATE_DATABASE = "CREATE DATABASE {bd} ENCODING '{charset}' LC_COLLATE '{collation}';"
+
+
+@registrar_dialecto
+class DialectoMySQL(Dialecto):
+    nombre = 'mysql'
+    COMILLAS = ('`', '`')
+    TIPOS = TIPOS_MYSQL
+
+    ENCABEZADO = "-- MySQL Script\n-- Generado automaticamente\nSET NAMES utf8mb4;\nSET FOREIGN_KEY_CHECKS = 0;\n"
+    COMMENT_TABLE = "ALTER TABLE {tabla} COMMENT = '{comentario}';"
+    COMMENT_COLUMN = "-- MySQL: comentario de columna agregado en definicion"
+    GRANT_ESQUEMA = "GRANT {permisos} ON {esquema}.* TO {usuario};"
+    CREATE_SCHEMA = "CREATE DATABASE {esquema}; -- MySQL usa DATABASE en lugar de SCHEMA"
+
+    def usuario(self, nombre_usuario):
+        return f"'{nombre_usuario}'@'%'"
+
+
+@registrar_dialecto
+class DialectoSQLServer(Dialecto):
+    nombre = 'sqlserver'
+    COMILLAS = ('[', ']')
+    SEPARADOR_LOTE = 'GO'
+    TIPOS = TIPOS_SQLSERVER
+
+    ENCABEZADO = ("-- SQL Server Script\n-- Generado automaticamente\n"
+                  "SET ANSI_NULLS ON;\nGO\nSET QUOTED_IDENTIFIER ON;\nGO\n")
+    ADD_COLUMN = "ADD {columna} {tipo}"
+    MODIFY_COLUMN = "ALTER COLUMN {columna} {tipo}"
+    PRIMARY_KEY = "CONSTRAINT {nombre} PRIMARY KEY ({columnas})"
+    COMMENT_TABLE = ("EXEC sp_addextendedproperty 'MS_Description', '{comentario}', "
+                     "'SCHEMA', '{esquema}', 'TABLE', '{nombre_tabla}';")
+    COMMENT_COLUMN = ("EXEC sp_addextendedproperty 'MS_Description', '{comentario}', "
+                      "'SCHEMA', '{esquema}', 'TABLE', '{nombre_tabla}', 'COLUMN', '{nombre_columna}';")
+    CREATE_USER = "CREATE LOGIN {usuario} WITH PASSWORD = 'password';\nCREATE USER {usuario} FOR LOGIN {usuario};"
+    GRANT_ESQUEMA = "GRANT {permisos} ON SCHEMA::{esquema} TO {usuario};"
+    CREATE_DATABASE = "CREATE DATABASE {bd} COLLATE {collation};"
+
+
+@registrar_dialecto
+class DialectoOracle(Dialecto):
+    nombre = 'oracle'
+    TIPOS = TIPOS_ORACLE
+
+    ENCABEZADO = "-- Oracle Script\n-- Generado automaticamente\nSET DEFINE OFF;\n"
+    USE_DB = "-- Conectar a: {bd}"
+    ADD_COLUMN = "ADD ({columna} {tipo})"
+    DROP_COLUMN = "DROP ({columna})"
+    MODIFY_COLUMN = "MODIFY ({columna} {tipo})"
+    PRIMARY_KEY = "CONSTRAINT {nombre} PRIMARY KEY ({columnas})"
+    COMMENT_TABLE = "COMMENT ON TABLE {tabla} IS '{comentario}';"
+    COMMENT_COLUMN = "COMMENT ON COLUMN {tabla}.{columna} IS '{comentario}';"
+    CREATE_USER = "CREATE USER {usuario} IDENTIFIED BY password;"
+    CREATE_DATABASE = "-- Oracle: CREATE TABLESPACE o conectar a {bd}"
+    CREATE_SCHEMA = "CREATE USER {esquema} IDENTIFIED BY password DEFAULT TABLESPACE users;"
+
+
+@registrar_dialecto
+class DialectoSQLite(Dialecto):
+    nombre = 'sqlite'
+    TIPOS = TIPOS_SQLITE
+
+    ENCABEZADO = "-- SQLite Script\n-- Generado automaticamente\nPRAGMA foreign_keys = ON;\n"
+    USE_DB = "-- Base de datos: {bd}"
+    MODIFY_COLUMN = "-- SQLite no soporta MODIFY COLUMN directamente para {columna}"
+    COMMENT_TABLE = "-- Comentario tabla: {comentario}"
+    COMMENT_COLUMN = "-- Comentario columna {nombre_columna}: {comentario}"
+    CREATE_USER = "-- SQLite no soporta CREATE USER"
+    GRANT = "-- SQLite no soporta GRANT"
+    CREATE_DATABASE = "-- SQLite: La base de datos es el archivo {bd}.db"
+    CREATE_SCHEMA = "-- SQLite no soporta esquemas"
+
+    def tabla(self, esquema, nombre_tabla):
+        # SQLite no tiene esquemas
+        return self.citar(nombre_tabla)
@@ -0,0 +1,109 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from tickets.models import CorreoPendiente
+from tickets.utils import DespachadorCorreos
+
+# Segundos que un correo queda reservado por un worker. Si el proceso muere
+# en medio del envio, el correo vuelve a estar disponible al vencer el plazo.
+TIEMPO_RESERVA = 300
+
+
+def enviar_lote(mensajes):
+    """
+    Envia una lista de (id, EmailMessage) por una sola conexion.
+    Corre en un hilo del pool y no toca la base de datos.
+    """
+    despachador = DespachadorCorreos()
+    for pk, email in mensajes:
+        despachador.agregar(email, referencia=pk)
+    return despachador.enviar()
+
+
+class Command(BaseCommand):
+    help = "Envia los correos encolados en la bandeja de salida (CorreoPendiente)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Hilos de envio (cada uno usa su propia conexion SMTP)')
+        parser.add_argument('--lote', type=int, default=100,
+                            help='Cantidad maxima de correos a tomar por vuelta')
+        parser.add_argument('--intervalo', type=float, default=10,
+                            help='Segundos de espera cuando la bandeja esta vacia')
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Enviar lo pendiente y terminar')
+
+    def handle(self, *args, **options):
+        max_intentos = getattr(settings, 'CORREOS_MAX_INTENTOS', 5)
+        backoff = getattr(settings, 'CORREOS_BACKOFF_SEGUNDOS', 60)
+
+        # Correos sensibles que ya no se van a enviar (fallidos de versiones
+        # anteriores, que no los vaciaban): no conservar la contraseña
+        (CorreoPendiente.objects
+         .filter(estado__in=['enviado', 'fallido'], tipo__in=CorreoPendiente.TIPOS_SENSIBLES)
+         .exclude(cuerpo='').update(cuerpo=''))
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                correos = self.reservar(options['lote'])
+                if not correos:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+
+                enviados, fallidos = self.procesar(pool, options['workers'], correos, max_intentos, backoff)
+                self.stdout.write(f"Correos enviados: {enviados}, con error: {fallidos}")
+
+    def reservar(self, lote):
+        """Toma los correos vencidos y los marca como 'enviando' por TIEMPO_RESERVA segundos"""
+        ahora = timezone.now()
+        with transaction.atomic():
+            correos = list(
+                CorreoPendiente.objects.select_for_update(skip_locked=True)
+                .filter(Q(estado='pendiente') | Q(estado='enviando'), proximo_intento__lte=ahora)
+                .order_by('proximo_intento')[:lote]
+            )
+            CorreoPendiente.objects.filter(pk__in=[c.pk for c in correos]).update(
+                estado='enviando', proximo_intento=ahora + timedelta(seconds=TIEMPO_RESERVA)
+            )
+        return correos
+
+    def procesar(self, pool, workers, correos, max_intentos, backoff):
+        """Reparte los correos entre los hilos y registra el resultado de cada uno"""
+        por_id = {correo.pk: correo for correo in correos}
+        mensajes = []
+        enviados = fallidos = 0
+        for correo in correos:
+            try:
+                mensajes.append((correo.pk, correo.construir_mensaje()))
+            except Exception as e:
+                # Adjunto que ya no existe (p. ej. el script de una solicitud borrada)
+                correo.registrar_fallo(e, max_intentos, backoff)
+                fallidos += 1
+                self.stderr.write(f"Correo #{correo.pk}: {e}")
+        if not mensajes:
+            return enviados, fallidos
+
+        grupos = [[] for _ in range(min(workers, len(mensajes)))]
+        for i, mensaje in enumerate(mensajes):
+            grupos[i % len(grupos)].append(mensaje)
+
+        for resultados in pool.map(enviar_lote, grupos):
+            for resultado in resultados:
+                correo = por_id[resultado.referencia]
+                if resultado.enviado:
+                    correo.registrar_envio()
+                    enviados += 1
+                else:
+                    correo.registrar_fallo(resultado.error, max_intentos, backoff)
+                    fallidos += 1
+                    self.stderr.write(f"Correo #{correo.pk} a {', '.join(resultado.destinatarios)}: {resultado.error}")
+        return enviados, fallidos
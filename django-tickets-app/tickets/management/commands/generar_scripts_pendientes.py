@@ -0,0 +1,131 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.db.models import Count, Max
+
+from tickets.models import ScriptGenerado, Solicitud
+from tickets.utils import argumentos_generacion, ejecutar_generacion
+
+
+class Command(BaseCommand):
+    help = ("Genera en un pool de procesos los scripts SQL de las solicitudes pendientes de script "
+            "(las de la vista solicitudes_pendientes_script) y los guarda por lotes")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2,
+                            help='Procesos que leen los Excel y generan los scripts')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Cantidad maxima de solicitudes a procesar')
+        parser.add_argument('--lote', type=int, default=100,
+                            help='Scripts a guardar por transacción (bulk_create/bulk_update)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Solo informar cuántas solicitudes se procesarían')
+
+    def handle(self, *args, **options):
+        pendientes = Solicitud.objects.pendientes_de_script().order_by('pk')
+        if options['limit']:
+            pendientes = pendientes[:options['limit']]
+
+        if options['dry_run']:
+            ids = list(pendientes.values_list('pk', flat=True))
+            self.stdout.write(f"Solicitudes pendientes de script: {len(ids)}")
+            por_tipo = (Solicitud.objects.filter(pk__in=ids).values('tipo_solicitud')
+                        .annotate(total=Count('pk')).order_by('tipo_solicitud'))
+            for fila in por_tipo:
+                self.stdout.write(f"  {fila['tipo_solicitud']}: {fila['total']}")
+            return
+
+        solicitudes = {
+            solicitud.pk: solicitud
+            for solicitud in pendientes.select_related('proyecto').only(
+                'pk', 'tipo_solicitud', 'archivo_adjunto', 'base_datos_aplicacion', 'proyecto__motor_bd'
+            )
+        }
+        total = len(solicitudes)
+        self.guardadas = self.errores = self.bytes_script = self.bytes_comprimidos = 0
+        self.segundos_generacion = 0.0
+        inicio = time.perf_counter()
+
+        # Que los procesos del pool no hereden conexiones abiertas (no usan la base)
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as pool:
+            futuros = []
+            for solicitud in solicitudes.values():
+                try:
+                    argumentos = argumentos_generacion(solicitud)
+                except Exception as e:
+                    # Adjunto fuera del storage local
+                    self.registrar_error(solicitud.pk, e)
+                    continue
+                futuros.append(pool.submit(ejecutar_generacion, solicitud.pk, *argumentos))
+
+            lote = []
+            for futuro in as_completed(futuros):
+                resultado = futuro.result()
+                self.segundos_generacion += resultado.segundos
+                if resultado.error:
+                    self.registrar_error(resultado.referencia, resultado.error)
+                    continue
+                lote.append((solicitudes.pop(resultado.referencia), resultado.comprimido))
+                if len(lote) >= options['lote']:
+                    self.guardar_lote(lote)
+                    lote = []
+                    self.stdout.write(f"  {self.guardadas}/{total}")
+            if lote:
+                self.guardar_lote(lote)
+
+        self.informar(total, time.perf_counter() - inicio, options['workers'])
+
+    def registrar_error(self, solicitud_id, error):
+        self.errores += 1
+        self.stderr.write(f"Solicitud #{solicitud_id}: {error}")
+
+    def guardar_lote(self, lote):
+        """
+        Crea las versiones de un lote con un bulk_create y apunta las solicitudes
+        a ellas con un bulk_update, en una sola transacción. Las solicitudes que
+        recibieron un script mientras se generaba el lote se omiten.
+        """
+        with transaction.atomic():
+            siguen = set(
+                Solicitud.objects.pendientes_de_script()
+                .filter(pk__in=[solicitud.pk for solicitud, _ in lote])
+                .select_for_update().values_list('pk', flat=True)
+            )
+            lote = [(solicitud, comprimido) for solicitud, comprimido in lote if solicitud.pk in siguen]
+            # Las versiones descartadas se conservan: continuar su numeración
+            ultimas = dict(
+                ScriptGenerado.objects.filter(solicitud_id__in=siguen).order_by()
+                .values_list('solicitud_id').annotate(Max('version'))
+            )
+            scripts = ScriptGenerado.objects.bulk_create([
+                ScriptGenerado(solicitud=solicitud, version=ultimas.get(solicitud.pk, 0) + 1,
+                               contenido=contenido, hash_contenido=hash_contenido, tamano=tamano)
+                for solicitud, (contenido, hash_contenido, tamano) in lote
+            ])
+            for (solicitud, _), script in zip(lote, scripts):
+                solicitud.script_vigente = script
+                self.bytes_script += script.tamano
+                self.bytes_comprimidos += len(script.contenido)
+            Solicitud.objects.bulk_update([solicitud for solicitud, _ in lote], ['script_vigente'])
+        self.guardadas += len(lote)
+
+    def informar(self, total, segundos, workers):
+        """Reporte de rendimiento: solicitudes/s, MB/s y aprovechamiento del pool"""
+        procesadas = self.guardadas + self.errores
+        self.stdout.write(self.style.SUCCESS(
+            f"Scripts guardados: {self.guardadas}, con error: {self.errores} (de {total} pendientes)"
+        ))
+        if not procesadas or not segundos:
+            return
+        mb = self.bytes_script / (1024 * 1024)
+        self.stdout.write(
+            f"Tiempo total: {segundos:.2f}s | {procesadas / segundos:.1f} solicitudes/s | "
+            f"{mb:.1f} MB de SQL ({mb / segundos:.1f} MB/s, {self.bytes_comprimidos / (1024 * 1024):.1f} MB gzip)\n"
+            f"Generación por solicitud: {self.segundos_generacion / procesadas * 1000:.1f} ms en promedio | "
+            f"uso del pool: {self.segundos_generacion / (segundos * workers):.0%} de {workers} workers"
+        )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tickets.models import Solicitud
+
+
+class Command(BaseCommand):
+    help = ("Mueve los scripts guardados en Solicitud.script_sql_generado a ScriptGenerado "
+            "(comprimidos) y vacía la columna original")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=100,
+                            help='Solicitudes a mover por transacción')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Solo informar cuántas solicitudes se moverían')
+
+    def handle(self, *args, **options):
+        pendientes = Solicitud.objects.filter(script_sql_generado__isnull=False)
+        ids = list(pendientes.order_by('pk').values_list('pk', flat=True))
+        if options['dry_run']:
+            self.stdout.write(f"Solicitudes con script por mover: {len(ids)}")
+            return
+
+        movidas = bytes_originales = bytes_comprimidos = 0
+        for inicio in range(0, len(ids), options['lote']):
+            with transaction.atomic():
+                lote = Solicitud.objects.filter(pk__in=ids[inicio:inicio + options['lote']]).select_related('script_vigente')
+                for solicitud in lote:
+                    if not solicitud.script_sql_generado:
+                        # Texto vacío: no hay script que conservar
+                        Solicitud.objects.filter(pk=solicitud.pk).update(script_sql_generado=None)
+                        continue
+                    script = solicitud.guardar_script(solicitud.script_sql_generado)
+                    movidas += 1
+                    bytes_originales += script.tamano
+                    bytes_comprimidos += len(script.contenido)
+            self.stdout.write(f"  {movidas}/{len(ids)}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Scripts movidos: {movidas} ({bytes_originales} bytes -> {bytes_comprimidos} comprimidos)"
+        ))
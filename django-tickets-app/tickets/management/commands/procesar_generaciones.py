@@ -0,0 +1,106 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from tickets.models import GeneracionJob
+from tickets.utils import argumentos_generacion, ejecutar_generacion
+
+# Segundos que una generacion queda reservada por un worker. Si el proceso
+# muere a mitad de camino, la generacion vuelve a la cola al vencer el plazo.
+TIEMPO_RESERVA = 600
+
+
+class Command(BaseCommand):
+    help = ("Ejecuta las generaciones de scripts SQL encoladas (GeneracionJob) en un pool "
+            "de procesos y guarda cada script en su solicitud")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2,
+                            help='Procesos que leen los Excel y generan los scripts')
+        parser.add_argument('--lote', type=int, default=20,
+                            help='Cantidad maxima de generaciones a tomar por vuelta')
+        parser.add_argument('--intervalo', type=float, default=5,
+                            help='Segundos de espera cuando la cola esta vacia')
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Procesar lo pendiente y terminar')
+
+    def handle(self, *args, **options):
+        # Que los procesos del pool no hereden conexiones abiertas (no usan la base)
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as pool:
+            while True:
+                jobs = self.reservar(options['lote'])
+                if not jobs:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+
+                completados, fallidos = self.procesar(pool, jobs)
+                self.stdout.write(f"Generaciones completadas: {completados}, con error: {fallidos}")
+
+    def reservar(self, lote):
+        """
+        Toma las generaciones pendientes (o con la reserva vencida) y las marca
+        'procesando'. Cada una se reserva con un UPDATE condicional, así dos
+        workers nunca toman la misma aunque la base no soporte skip_locked.
+        """
+        ahora = timezone.now()
+        disponibles = Q(estado='pendiente') | Q(estado='procesando', reservado_hasta__lte=ahora)
+        candidatas = list(
+            GeneracionJob.objects.filter(disponibles)
+            .select_related('solicitud__proyecto')
+            .order_by('fecha_creacion')[:lote]
+        )
+        reservadas = []
+        for job in candidatas:
+            tomada = GeneracionJob.objects.filter(disponibles, pk=job.pk).update(
+                estado='procesando', fecha_inicio=ahora,
+                reservado_hasta=ahora + timedelta(seconds=TIEMPO_RESERVA),
+            )
+            if tomada:
+                reservadas.append(job)
+        return reservadas
+
+    def procesar(self, pool, jobs):
+        """Reparte las generaciones entre los procesos y guarda el resultado de cada una"""
+        por_id = {}
+        futuros = []
+        fallidos = 0
+        for job in jobs:
+            try:
+                argumentos = argumentos_generacion(job.solicitud)
+            except Exception as e:
+                # Sin adjunto o con el archivo fuera del storage local
+                job.registrar_fallo(e)
+                fallidos += 1
+                continue
+            por_id[job.pk] = job
+            futuros.append(pool.submit(ejecutar_generacion, job.pk, *argumentos))
+
+        completados = 0
+        for futuro in as_completed(futuros):
+            resultado = futuro.result()
+            job = por_id[resultado.referencia]
+            if resultado.error:
+                job.registrar_fallo(resultado.error, resultado.segundos)
+                fallidos += 1
+                self.stderr.write(f"Generacion #{job.pk} (solicitud #{job.solicitud_id}): {resultado.error}")
+                continue
+            try:
+                job.completar(resultado.comprimido, resultado.segundos)
+            except Exception as e:
+                job.registrar_fallo(e, resultado.segundos)
+                fallidos += 1
+                self.stderr.write(f"Generacion #{job.pk} (solicitud #{job.solicitud_id}): {e}")
+                continue
+            completados += 1
+            self.stdout.write(f"  Solicitud #{job.solicitud_id}: {resultado.segundos:.2f}s")
+        return completados, fallidos
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tickets.models import ContadorSolicitudes
+
+
+class Command(BaseCommand):
+    help = "Reconstruye (o verifica) los contadores de solicitudes por proyecto, estado y tipo"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verificar', action='store_true',
+                            help='Solo comparar contra el conteo real, sin modificar nada')
+
+    def handle(self, *args, **options):
+        if not options['verificar']:
+            ContadorSolicitudes.reconstruir()
+            self.stdout.write(self.style.SUCCESS(
+                f"Contadores reconstruidos: {ContadorSolicitudes.objects.count()}"
+            ))
+            return
+
+        real = ContadorSolicitudes.conteo_real()
+        guardado = ContadorSolicitudes.conteo_guardado()
+        diferencias = sorted(
+            (clave, guardado.get(clave, 0), real.get(clave, 0))
+            for clave in real.keys() | guardado.keys()
+            if guardado.get(clave, 0) != real.get(clave, 0)
+        )
+        for (proyecto_id, estado, tipo), actual, esperado in diferencias:
+            self.stderr.write(f"Proyecto {proyecto_id} / {estado} / {tipo}: {actual} (real: {esperado})")
+
+        if diferencias:
+            raise CommandError(f"{len(diferencias)} contadores desactualizados; ejecuta recalcular_contadores")
+        self.stdout.write(self.style.SUCCESS(f"Contadores correctos ({len(real)} combinaciones)"))
@@ -0,0 +1,20 @@
+from django.utils.functional import SimpleLazyObject
+
+from .models import UserProfile
+
+
+class PerfilUsuarioMiddleware:
+    """
+    Expone request.user_profile: el perfil del usuario (rol y proyectos
+    asignados) resuelto una sola vez por request y solo si la vista lo usa.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.user.is_authenticated:
+            request.user_profile = SimpleLazyObject(lambda: UserProfile.para_usuario(request.user))
+        else:
+            request.user_profile = None
+        return self.get_response(request)
@@ -1,7 +1,17 @@
-from django.db import models
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed, pre_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.core.exceptions import ValidationError
+from collections import namedtuple
+from datetime import timedelta
+import gzip
+import hashlib
+import io
 import json
 
 class Proyecto(models.Model):
@@ -60,11 +70,12 @@ class Proyecto(models.Model):
     
     def get_solicitudes_activas(self):
         """Retorna el número de solicitudes activas del proyecto"""
-        return self.solicitudes.exclude(estado__in=['finalizada', 'cancelada']).count()
+        return sum(c.total for c in self.contadores.all()
+                   if c.estado not in ContadorSolicitudes.ESTADOS_CERRADOS)
     
     def get_solicitudes_total(self):
         """Retorna el número total de solicitudes del proyecto"""
-        return self.solicitudes.count()
+        return sum(c.total for c in self.contadores.all())
     
     def get_miembros_equipo(self):
         """Retorna los miembros del equipo asignados al proyecto"""
@@ -96,14 +107,41 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.get_role_display()}"
     
+    @classmethod
+    def para_usuario(cls, user):
+        """
+        Retorna el perfil del usuario resolviendolo una sola vez por instancia
+        de User. Queda guardado en la cache de la relacion, por lo que
+        user.profile tampoco vuelve a consultar.
+        """
+        relacion = User.profile.related
+        if relacion.is_cached(user):
+            perfil = relacion.get_cached_value(user)
+            if perfil is not None:
+                return perfil
+
+        perfil = cls.objects.get_or_create(user=user)[0]
+        relacion.set_cached_value(user, perfil)
+        cls.user.field.set_cached_value(perfil, user)
+        return perfil
+
     def puede_gestionar_proyecto(self, proyecto):
         """Verifica si el usuario puede gestionar un proyecto específico"""
         if self.role == 'admin':
             return True
-        if self.role == 'lider' and proyecto.lider_proyecto == self.user:
+        if self.role == 'lider' and proyecto.lider_proyecto_id == self.user_id:
             return True
-        return proyecto in self.proyectos_asignados.all()
-    
+        return proyecto.pk in self.ids_proyectos_asignados
+
+    @cached_property
+    def ids_proyectos_asignados(self):
+        """
+        frozenset con los ids de los proyectos asignados. Se calcula una vez por
+        instancia: el perfil de request.user_profile vive un solo request, asi
+        que un proyecto revocado deja de contar en el request siguiente.
+        """
+        return frozenset(self.proyectos_asignados.values_list('id', flat=True))
+
     def get_proyectos_disponibles(self):
         """Retorna los proyectos que el usuario puede ver/gestionar"""
         if self.role == 'admin':
@@ -112,7 +150,7 @@ class UserProfile(models.Model):
             # Líder puede ver proyectos que lidera + proyectos asignados
             return Proyecto.objects.filter(
                 models.Q(lider_proyecto=self.user) | 
-                models.Q(miembros_equipo=self.user),
+                models.Q(miembros_equipo=self),
                 activo=True
             ).distinct()
         else:
@@ -146,6 +184,22 @@ class ConfiguracionEstructuraExcel(models.Model):
         proyecto_str = f"{self.proyecto.codigo} - " if self.proyecto else "Global - "
         return f"{proyecto_str}{self.tipo_solicitud} - {self.nombre}"
 
+class SolicitudQuerySet(models.QuerySet):
+    # Columnas de texto que pueden ser muy grandes y los listados no muestran
+    CAMPOS_PESADOS = ('script_sql_generado', 'descripcion', 'password_generado')
+
+    def for_listing(self):
+        """Queryset para listados: difiere los textos pesados y trae usuario, proyecto y líder en el mismo SELECT"""
+        return self.defer(*self.CAMPOS_PESADOS).select_related('usuario', 'proyecto', 'lider_proyecto')
+
+    def pendientes_de_script(self):
+        """Solicitudes de BD con Excel adjunto que aún no tienen script generado"""
+        return self.filter(
+            Solicitud.CONDICION_SIN_SCRIPT,
+            tipo_solicitud__in=Solicitud.TIPOS_BD,
+            archivo_adjunto__isnull=False,
+        )
+
 class Solicitud(models.Model):
     TIPOS_SOLICITUD = [
         ('crear_tabla', 'Creación de tablas base de datos'),
@@ -215,7 +269,10 @@ class Solicitud(models.Model):
     nombre_branch = models.CharField(max_length=100, blank=True, null=True)
     entorno = models.CharField(max_length=50, blank=True, null=True)
     
-    # Script SQL generado
+    # Script SQL generado: versión vigente en ScriptGenerado (comprimida, fuera de esta tabla).
+    # script_sql_generado es el almacenamiento anterior; migrar_scripts_generados lo vacía.
+    script_vigente = models.ForeignKey('ScriptGenerado', on_delete=models.SET_NULL, null=True, blank=True,
+                                       related_name='+', editable=False)
     script_sql_generado = models.TextField(blank=True, null=True)
     estructura_validada = models.BooleanField(default=False, help_text="Si la estructura del archivo fue validada")
     
@@ -229,6 +286,11 @@ class Solicitud(models.Model):
                                           verbose_name="Ticket de Referencia",
                                           help_text="Solicitud original en desarrollo de la cual se compilan los scripts")
     
+    objects = SolicitudQuerySet.as_manager()
+    
+    CONDICION_SIN_SCRIPT = models.Q(tipo_archivo='excel', script_vigente__isnull=True,
+                                    script_sql_generado__isnull=True)
+    
     def save(self, *args, **kwargs):
         # Auto-asignar líder de proyecto si no está asignado
         if not self.lider_proyecto and self.proyecto and self.proyecto.lider_proyecto:
@@ -237,16 +299,149 @@ class Solicitud(models.Model):
         # Auto-asignar base de datos principal del proyecto si no está especificada
         if not self.base_datos_aplicacion and self.proyecto and self.proyecto.base_datos_principal:
             self.base_datos_aplicacion = self.proyecto.base_datos_principal
-            
-        super().save(*args, **kwargs)
+        
+        # Contadores del proyecto e historial de estado en la misma transacción
+        with transaction.atomic():
+            contadores = True
+            if self._clave_contador is self.CLAVE_DESCONOCIDA:
+                # Cargada con only()/defer() sin proyecto, estado o tipo. Si este
+                # save no los escribe no cambia de contador; si los escribe hace
+                # falta la clave previa, que no se cargó
+                contadores = self._escribe_campos_contador(kwargs.get('update_fields'))
+                if contadores:
+                    self._clave_contador = Solicitud.objects.filter(pk=self.pk).values_list(
+                        *self.CAMPOS_CONTADOR).first()
+            estado_anterior = self.estado_guardado
+            super().save(*args, **kwargs)
+            if contadores:
+                self._actualizar_contadores(kwargs.get('update_fields'))
+            self._registrar_cambio_estado(estado_anterior)
+            self._guardar_script_pendiente()
+    
+    @property
+    def script_sql(self):
+        """Texto del script SQL vigente (o None)"""
+        if self.script_vigente_id:
+            return self.script_vigente.texto
+        return self.script_sql_generado or None
+    
+    @property
+    def tiene_script(self):
+        return bool(self.script_vigente_id or self.script_sql_generado)
+    
+    @property
+    def se_puede_generar_al_vuelo(self):
+        """True si el script puede generarse desde el Excel adjunto (ver GeneracionJob)"""
+        return bool(self.archivo_adjunto and self.tipo_archivo == 'excel'
+                    and self.tipo_solicitud in self.TIPOS_BD)
+    
+    def asignar_script(self, texto, usuario=None):
+        """Al guardar, registra `texto` como nueva versión vigente del script"""
+        self._script_pendiente = (texto, usuario)
+    
+    def descartar_script(self):
+        """Deja la solicitud sin script vigente; las versiones anteriores se conservan"""
+        self.__dict__.pop('_script_pendiente', None)
+        self.script_vigente = None
+        self.script_sql_generado = None
+    
+    def guardar_script(self, texto, usuario=None):
+        """
+        Registra `texto` (str, iterable de partes o ScriptComprimido) como versión vigente; de la
+        solicitud solo se actualiza el puntero
+        """
+        script = ScriptGenerado.registrar(self, texto, usuario)
+        if script.pk != self.script_vigente_id or self.script_sql_generado is not None:
+            Solicitud.objects.filter(pk=self.pk).update(script_vigente=script, script_sql_generado=None)
+        self.script_vigente = script
+        self.script_sql_generado = None
+        return script
+    
+    def _guardar_script_pendiente(self):
+        pendiente = self.__dict__.pop('_script_pendiente', None)
+        if pendiente is not None:
+            self.guardar_script(*pendiente)
+    
+    def cambiar_estado(self, nuevo_estado, usuario, comentario=None):
+        """
+        Cambia el estado. Al guardar se crea el HistorialEstado con el estado que
+        tenía la fila al cargarse, sin volver a leerla.
+        """
+        self.estado = nuevo_estado
+        self._cambio_estado = (usuario, comentario)
+    
+    @property
+    def estado_guardado(self):
+        """Estado tal como está en la base de datos (None si la solicitud es nueva)"""
+        if self._clave_contador is None or self._clave_contador is self.CLAVE_DESCONOCIDA:
+            return None
+        return self._clave_contador[1]
+    
+    def _registrar_cambio_estado(self, estado_anterior):
+        cambio = self.__dict__.pop('_cambio_estado', None)
+        if cambio is None:
+            return
+        usuario, comentario = cambio
+        HistorialEstado.objects.create(
+            solicitud=self,
+            estado_anterior=estado_anterior or self.estado,
+            estado_nuevo=self.estado,
+            usuario_cambio=usuario,
+            comentario=comentario,
+        )
+    
+    # Campos que definen en qué contador de ContadorSolicitudes cae la solicitud.
+    # _clave_contador guarda sus valores tal como están en la base de datos
+    # (None si la solicitud aún no existe).
+    CAMPOS_CONTADOR = ('proyecto_id', 'estado', 'tipo_solicitud')
+    CLAVE_DESCONOCIDA = object()
+    _clave_contador = None
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if all(campo in instance.__dict__ for campo in cls.CAMPOS_CONTADOR):
+            instance._clave_contador = instance._calcular_clave_contador()
+        else:
+            instance._clave_contador = cls.CLAVE_DESCONOCIDA
+        return instance
+    
+    def _calcular_clave_contador(self):
+        return tuple(getattr(self, campo) for campo in self.CAMPOS_CONTADOR)
+    
+    def _escribe_campos_contador(self, update_fields=None):
+        """True si el save va a escribir alguno de CAMPOS_CONTADOR"""
+        if update_fields is None:
+            if not self.get_deferred_fields():
+                return True
+            # Model.save() de una instancia con campos diferidos solo escribe los cargados
+            return any(campo in self.__dict__ for campo in self.CAMPOS_CONTADOR)
+        return any(campo in update_fields or campo.removesuffix('_id') in update_fields
+                   for campo in self.CAMPOS_CONTADOR)
+    
+    def _actualizar_contadores(self, update_fields=None):
+        """Mueve esta solicitud de contador si cambió su proyecto, estado o tipo"""
+        anterior = self._clave_contador
+        nueva = self._calcular_clave_contador()
+        if anterior is not None and update_fields is not None:
+            # Solo se persistieron los campos indicados
+            nueva = tuple(
+                valor if campo in update_fields or campo.removesuffix('_id') in update_fields else previo
+                for campo, valor, previo in zip(self.CAMPOS_CONTADOR, nueva, anterior)
+            )
+        if anterior != nueva:
+            if anterior is not None:
+                ContadorSolicitudes.ajustar(*anterior, -1)
+            ContadorSolicitudes.ajustar(*nueva, 1)
+        self._clave_contador = nueva
     
     def __str__(self):
         proyecto_codigo = self.proyecto.codigo if self.proyecto else "SIN-PROJ"
         return f"#{self.id} - {self.get_tipo_solicitud_display()} - {self.usuario.username} - {proyecto_codigo}"
     
-    def puede_editar(self, user):
+    def puede_editar(self, user, perfil=None):
         """Verifica si un usuario puede editar esta solicitud"""
-        user_profile = UserProfile.objects.get_or_create(user=user)[0]
+        user_profile = perfil or UserProfile.para_usuario(user)
         
         # Admin puede editar todo
         if user_profile.role == 'admin':
@@ -257,14 +452,14 @@ class Solicitud(models.Model):
             return True
             
         # Solo el propietario puede editar si está en estado registrada o revision
-        if self.usuario == user and self.estado in ['registrada', 'revision']:
+        if self.usuario_id == user.pk and self.estado in ['registrada', 'revision']:
             return True
             
         return False
     
-    def puede_gestionar(self, user):
+    def puede_gestionar(self, user, perfil=None):
         """Verifica si un usuario puede gestionar (cambiar estado) esta solicitud"""
-        user_profile = UserProfile.objects.get_or_create(user=user)[0]
+        user_profile = perfil or UserProfile.para_usuario(user)
 
         # Admin puede gestionar todo
         if user_profile.role == 'admin':
@@ -279,7 +474,7 @@ class Solicitud(models.Model):
             return True
 
         # Ingeniero DB también puede gestionar SUS PROPIAS solicitudes
-        if user_profile.role == 'db' and self.usuario == user:
+        if user_profile.role == 'db' and self.usuario_id == user.pk:
             return True
 
         # Ingeniero DevOps puede gestionar solicitudes DevOps
@@ -288,16 +483,16 @@ class Solicitud(models.Model):
 
         # Líder puede aprobar creación de usuarios
         if (user_profile.role == 'lider' and self.tipo_solicitud == 'crear_usuarios' 
-            and self.lider_proyecto == user):
+            and self.lider_proyecto_id == user.pk):
             return True
 
         return False
     
-    def puede_generar_script(self, user):
+    def puede_generar_script(self, user, perfil=None):
         """
         Verifica si un usuario puede generar scripts SQL
         """
-        user_profile = UserProfile.objects.get_or_create(user=user)[0]
+        user_profile = perfil or UserProfile.para_usuario(user)
         
         # Solo ingenieros DB y admin pueden generar scripts
         if user_profile.role not in ['admin', 'db']:
@@ -309,9 +504,9 @@ class Solicitud(models.Model):
         
         return True
     
-    def puede_ver_script(self, user):
+    def puede_ver_script(self, user, perfil=None):
         """Verifica si un usuario puede ver el script SQL generado"""
-        user_profile = UserProfile.objects.get_or_create(user=user)[0]
+        user_profile = perfil or UserProfile.para_usuario(user)
         
         # Ingenieros de desarrollo NO pueden ver scripts
         if user_profile.role == 'dev':
@@ -321,9 +516,9 @@ class Solicitud(models.Model):
             
         return user_profile.role in ['admin', 'db', 'devops']
     
-    def puede_descargar_script(self, user):
+    def puede_descargar_script(self, user, perfil=None):
         """Verifica si un usuario puede descargar el script SQL"""
-        user_profile = UserProfile.objects.get_or_create(user=user)[0]
+        user_profile = perfil or UserProfile.para_usuario(user)
         
         # Ingenieros de desarrollo NO pueden descargar scripts
         if user_profile.role == 'dev':
@@ -333,17 +528,16 @@ class Solicitud(models.Model):
             
         return user_profile.role in ['admin', 'db', 'devops']
 
-    def estados_permitidos_para_usuario(self, user):
-        user_profile = UserProfile.objects.get_or_create(user=user)[0]
-        perfil = getattr(user, "userprofile", None)
-       
+    def estados_permitidos_para_usuario(self, user, perfil=None):
+        user_profile = perfil or UserProfile.para_usuario(user)
+
         if not user_profile:
             print("Sin perfil")
             return []
 
         # 🔹 Caso especial para devs
         if user_profile.role == "dev":
-            if self.usuario == user and self.estado == "registrada":
+            if self.usuario_id == user.pk and self.estado == "registrada":
                 return ["cancelada"]  # único estado permitido
             else:
                 return []  # en cualquier otro caso no puede cambiar estado
@@ -355,15 +549,15 @@ class Solicitud(models.Model):
 
         # Líder puede aprobar/rechazar creación de usuarios
         if (user_profile.role == 'lider' and self.tipo_solicitud == 'crear_usuarios' 
-            and self.lider_proyecto == user and self.estado == 'pendiente_aprobacion_lider'):
+            and self.lider_proyecto_id == user.pk and self.estado == 'pendiente_aprobacion_lider'):
             return ['aprobada', 'rechazada']
 
         # Ingenieros especializados pueden gestionar (aunque sean autores)
-        if self.puede_gestionar(user):
+        if self.puede_gestionar(user, user_profile):
             return ['revision', 'aprobada', 'rechazada', 'finalizada']
 
         # Solo propietarios pueden cancelar si no tienen otros permisos
-        if self.usuario == user and self.estado == 'registrada':
+        if self.usuario_id == user.pk and self.estado == 'registrada':
             return ['cancelada']
         
         return []
@@ -396,6 +590,282 @@ class Solicitud(models.Model):
     
     class Meta:
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Los listados siempre ordenan por -fecha_creacion, solos o tras el filtro del rol
+            models.Index(fields=['-fecha_creacion'], name='solicitud_fecha_idx'),
+            models.Index(fields=['usuario', '-fecha_creacion'], name='solicitud_usuario_fecha_idx'),
+            models.Index(fields=['lider_proyecto', '-fecha_creacion'], name='solicitud_lider_fecha_idx'),
+            models.Index(fields=['tipo_solicitud', '-fecha_creacion'], name='solicitud_tipo_fecha_idx'),
+            models.Index(fields=['proyecto', 'estado'], name='solicitud_proyecto_estado_idx'),
+            models.Index(fields=['estado'], name='solicitud_estado_idx'),
+            # Cola de solicitudes pendientes de script: índice parcial (PostgreSQL/SQLite);
+            # en motores sin soporte Django lo omite
+            models.Index(
+                fields=['-fecha_creacion'], name='solicitud_pendiente_script_idx',
+                condition=models.Q(tipo_archivo='excel', script_vigente__isnull=True,
+                                   script_sql_generado__isnull=True),
+            ),
+        ]
+
+# Script ya comprimido por ScriptGenerado.comprimir (p. ej. en un proceso del pool)
+ScriptComprimido = namedtuple('ScriptComprimido', ['contenido', 'hash_contenido', 'tamano'])
+
+
+class ScriptGenerado(models.Model):
+    """
+    Versión de un script SQL generado para una solicitud. El contenido se guarda
+    comprimido con gzip junto con su hash, y cada regeneración agrega una versión
+    nueva sin tocar la fila de Solicitud más allá del puntero script_vigente.
+    """
+    solicitud = models.ForeignKey(Solicitud, on_delete=models.CASCADE, related_name='scripts')
+    version = models.PositiveIntegerField()
+    contenido = models.BinaryField(help_text="Script comprimido con gzip")
+    hash_contenido = models.CharField(max_length=64, help_text="SHA-256 del script sin comprimir")
+    tamano = models.PositiveIntegerField(help_text="Tamaño en bytes del script sin comprimir")
+    generado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Script generado"
+        verbose_name_plural = "Scripts generados"
+        ordering = ['-version']
+        unique_together = ['solicitud', 'version']
+
+    def __str__(self):
+        return f"#{self.solicitud_id} v{self.version} ({self.tamano} bytes)"
+
+    @staticmethod
+    def comprimir(partes):
+        """
+        Comprime con gzip un script entregado por partes (cualquier iterable de
+        str, p. ej. los generadores iterar_script_* de utils) sin unirlas.
+        Retorna un ScriptComprimido.
+        """
+        sha = hashlib.sha256()
+        tamano = 0
+        buffer = io.BytesIO()
+        with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=6, mtime=0) as archivo:
+            for parte in partes:
+                datos = parte.encode('utf-8')
+                sha.update(datos)
+                archivo.write(datos)
+                tamano += len(datos)
+        return ScriptComprimido(buffer.getvalue(), sha.hexdigest(), tamano)
+
+    @classmethod
+    def registrar(cls, solicitud, texto, usuario=None):
+        """
+        Crea la siguiente versión del script de la solicitud. `texto` puede ser
+        el script completo, un iterable de partes o un ScriptComprimido. Si el
+        contenido es igual al de la versión vigente la reutiliza en vez de duplicarla.
+        """
+        if isinstance(texto, ScriptComprimido):
+            contenido, hash_contenido, tamano = texto
+        else:
+            contenido, hash_contenido, tamano = cls.comprimir([texto] if isinstance(texto, str) else texto)
+        vigente = solicitud.script_vigente
+        if vigente is not None and vigente.hash_contenido == hash_contenido:
+            return vigente
+        ultima = cls.objects.filter(solicitud=solicitud).aggregate(v=models.Max('version'))['v'] or 0
+        script = cls.objects.create(
+            solicitud=solicitud,
+            version=ultima + 1,
+            contenido=contenido,
+            hash_contenido=hash_contenido,
+            tamano=tamano,
+            generado_por=usuario,
+        )
+        if isinstance(texto, str):
+            script.__dict__['texto'] = texto
+        return script
+
+    @cached_property
+    def texto(self):
+        return gzip.decompress(bytes(self.contenido)).decode('utf-8')
+
+    def iterar_bytes(self, tamano_bloque=64 * 1024):
+        """Descomprime el script por bloques, sin armar el texto completo en memoria"""
+        with gzip.GzipFile(fileobj=io.BytesIO(self.contenido)) as archivo:
+            while bloque := archivo.read(tamano_bloque):
+                yield bloque
+
+class GeneracionJob(models.Model):
+    """
+    Generación de script SQL encolada. Las vistas solo crean el registro; el
+    comando `procesar_generaciones` la ejecuta en un pool de procesos y
+    escribe el script en la solicitud. La propia tabla es la cola.
+    """
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completado', 'Completado'),
+        ('fallido', 'Fallido'),
+    ]
+    ESTADOS_ACTIVOS = ['pendiente', 'procesando']
+
+    solicitud = models.ForeignKey(Solicitud, on_delete=models.CASCADE, related_name='generaciones')
+    solicitado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    comentario = models.TextField(blank=True, help_text="Comentario a registrar en la solicitud al terminar")
+    pasar_a_revision = models.BooleanField(default=False,
+                                           help_text="Al terminar, marcar la estructura como validada y pasar a revisión")
+
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    reservado_hasta = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    duracion = models.FloatField(null=True, blank=True, help_text="Segundos que tomó generar el script")
+    script = models.ForeignKey(ScriptGenerado, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Generación de script"
+        verbose_name_plural = "Generaciones de scripts"
+        ordering = ['fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion']),
+        ]
+        constraints = [
+            # Una sola generación activa por solicitud (índice único parcial en
+            # PostgreSQL/SQLite; en MySQL lo cubre el bloqueo de encolar)
+            models.UniqueConstraint(
+                fields=['solicitud'], name='generacion_activa_unica',
+                condition=models.Q(estado__in=['pendiente', 'procesando']),
+            ),
+        ]
+
+    def __str__(self):
+        return f"Generación #{self.pk} de la solicitud #{self.solicitud_id} ({self.get_estado_display()})"
+
+    @classmethod
+    def encolar(cls, solicitud, usuario=None, comentario='', pasar_a_revision=False):
+        """
+        Crea la generación, salvo que ya haya una pendiente o en proceso para la
+        solicitud. Retorna (generacion, creada) como get_or_create. Dos envíos
+        simultáneos no crean dos generaciones: la fila de la solicitud queda
+        bloqueada durante la consulta y el INSERT, y el constraint
+        generacion_activa_unica rechaza el segundo donde no hay bloqueo (SQLite).
+        """
+        activas = cls.objects.filter(solicitud=solicitud, estado__in=cls.ESTADOS_ACTIVOS)
+        try:
+            with transaction.atomic():
+                list(Solicitud.objects.select_for_update().filter(pk=solicitud.pk).values_list('pk', flat=True))
+                activa = activas.first()
+                if activa is not None:
+                    return activa, False
+                generacion = cls.objects.create(solicitud=solicitud, solicitado_por=usuario,
+                                                comentario=comentario or '', pasar_a_revision=pasar_a_revision)
+        except IntegrityError:
+            return activas.get(), False
+        return generacion, True
+
+    @property
+    def activa(self):
+        return self.estado in self.ESTADOS_ACTIVOS
+
+    def completar(self, script, segundos):
+        """
+        Guarda el script (el ScriptComprimido que arma ejecutar_generacion, o
+        el texto) como versión vigente de la solicitud y aplica revisión/comentario.
+        La solicitud se relee bloqueada y solo se escriben los campos que cambian
+        aquí, para no pisar lo editado mientras se generaba el script.
+        """
+        with transaction.atomic():
+            solicitud = (Solicitud.objects.select_for_update(of=('self',)).select_related('script_vigente')
+                         .get(pk=self.solicitud_id))
+            solicitud.asignar_script(script, self.solicitado_por)
+            campos = ['fecha_modificacion']
+            if self.pasar_a_revision and self.solicitado_por_id:
+                solicitud.estructura_validada = True
+                solicitud.cambiar_estado('revision', self.solicitado_por, self.comentario)
+                campos += ['estructura_validada', 'estado']
+            solicitud.save(update_fields=campos)
+            if self.comentario and self.solicitado_por_id:
+                Comentario.objects.create(solicitud=solicitud, usuario_id=self.solicitado_por_id,
+                                          texto=self.comentario)
+
+            self.estado = 'completado'
+            self.script = solicitud.script_vigente
+            self.error = ''
+            self.duracion = segundos
+            self.fecha_fin = timezone.now()
+            self.save(update_fields=['estado', 'script', 'error', 'duracion', 'fecha_fin'])
+
+    def registrar_fallo(self, error, segundos=None):
+        self.estado = 'fallido'
+        self.error = str(error)
+        self.duracion = segundos
+        self.fecha_fin = timezone.now()
+        self.save(update_fields=['estado', 'error', 'duracion', 'fecha_fin'])
+
+    def como_dict(self):
+        """Estado para el endpoint JSON que consulta la página de detalle"""
+        return {
+            'id': self.pk,
+            'estado': self.estado,
+            'estado_display': self.get_estado_display(),
+            'activa': self.activa,
+            'error': self.error,
+            'duracion': self.duracion,
+            'fecha_creacion': self.fecha_creacion.isoformat(),
+            'fecha_fin': self.fecha_fin.isoformat() if self.fecha_fin else None,
+        }
+
+class ContadorSolicitudes(models.Model):
+    """
+    Conteo desnormalizado de solicitudes por proyecto, estado y tipo.
+    Se mantiene al guardar/eliminar cada Solicitud; el comando
+    recalcular_contadores lo reconstruye o verifica contra la tabla real.
+    """
+    ESTADOS_CERRADOS = ['finalizada', 'cancelada']
+
+    proyecto = models.ForeignKey(Proyecto, on_delete=models.CASCADE, related_name='contadores')
+    estado = models.CharField(max_length=30, choices=Solicitud.ESTADOS)
+    tipo_solicitud = models.CharField(max_length=30, choices=Solicitud.TIPOS_SOLICITUD)
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Contador de solicitudes"
+        verbose_name_plural = "Contadores de solicitudes"
+        unique_together = ['proyecto', 'estado', 'tipo_solicitud']
+
+    def __str__(self):
+        return f"{self.proyecto_id} - {self.estado} - {self.tipo_solicitud}: {self.total}"
+
+    @classmethod
+    def ajustar(cls, proyecto_id, estado, tipo_solicitud, delta):
+        """Suma delta al contador (lo crea si no existe). Sin proyecto no se cuenta."""
+        if proyecto_id is None:
+            return
+        contador, creado = cls.objects.get_or_create(
+            proyecto_id=proyecto_id, estado=estado, tipo_solicitud=tipo_solicitud,
+            defaults={'total': max(delta, 0)},
+        )
+        if not creado:
+            cls.objects.filter(pk=contador.pk).update(total=Greatest(models.F('total') + delta, 0))
+
+    @classmethod
+    def conteo_real(cls):
+        """{(proyecto_id, estado, tipo_solicitud): total} calculado sobre Solicitud"""
+        filas = (Solicitud.objects.filter(proyecto__isnull=False).order_by()
+                 .values_list('proyecto_id', 'estado', 'tipo_solicitud')
+                 .annotate(total=models.Count('id')))
+        return {(p, e, t): total for p, e, t, total in filas}
+
+    @classmethod
+    def conteo_guardado(cls):
+        filas = cls.objects.filter(total__gt=0).values_list('proyecto_id', 'estado', 'tipo_solicitud', 'total')
+        return {(p, e, t): total for p, e, t, total in filas}
+
+    @classmethod
+    def reconstruir(cls):
+        """Reemplaza todos los contadores por el conteo real"""
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(
+                cls(proyecto_id=p, estado=e, tipo_solicitud=t, total=total)
+                for (p, e, t), total in cls.conteo_real().items()
+            )
 
 class HistorialEstado(models.Model):
     solicitud = models.ForeignKey(Solicitud, on_delete=models.CASCADE, related_name='historial')
@@ -419,3 +889,117 @@ class Comentario(models.Model):
     
     class Meta:
         ordering = ['-fecha_creacion']
+
+
+class CorreoPendiente(models.Model):
+    """
+    Bandeja de salida de correos. Las vistas solo encolan; el comando
+    `enviar_correos` los envia en segundo plano con reintentos.
+    """
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('enviando', 'Enviando'),
+        ('enviado', 'Enviado'),
+        ('fallido', 'Fallido'),
+    ]
+    # Tipos cuyo cuerpo lleva datos sensibles (contraseñas): se borra al enviarlo
+    # o al agotar los reintentos
+    TIPOS_SENSIBLES = {'credenciales'}
+
+    solicitud = models.ForeignKey(Solicitud, on_delete=models.SET_NULL, null=True, blank=True,
+                                  related_name='correos')
+    tipo = models.CharField(max_length=30, blank=True, help_text="Origen del correo (cambio_estado, credenciales, ...)")
+    asunto = models.CharField(max_length=255)
+    cuerpo = models.TextField(help_text="Contenido HTML")
+    remitente = models.CharField(max_length=254, blank=True)
+    destinatarios = models.JSONField(default=list)
+    adjuntos = models.JSONField(default=list, blank=True,
+                                help_text="Lista de {nombre, script_id, mimetype} (o {nombre, contenido, mimetype})")
+
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    intentos = models.PositiveIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_envio = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Correo pendiente"
+        verbose_name_plural = "Correos pendientes"
+        ordering = ['fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'proximo_intento']),
+        ]
+
+    def __str__(self):
+        return f"{self.asunto} -> {', '.join(self.destinatarios)} ({self.get_estado_display()})"
+
+    def construir_mensaje(self, connection=None):
+        """Arma el EmailMessage (HTML) a partir del registro"""
+        from django.core.mail import EmailMessage
+
+        email = EmailMessage(
+            subject=self.asunto,
+            body=self.cuerpo,
+            from_email=self.remitente or settings.DEFAULT_FROM_EMAIL,
+            to=list(self.destinatarios),
+            connection=connection,
+        )
+        email.content_subtype = 'html'
+        for adjunto in self.adjuntos:
+            if 'script_id' in adjunto:
+                # El script se lee de su versión guardada, no se copia en la bandeja
+                contenido = ScriptGenerado.objects.get(pk=adjunto['script_id']).texto
+            else:
+                contenido = adjunto['contenido']
+            email.attach(adjunto['nombre'], contenido, adjunto.get('mimetype', 'text/plain'))
+        return email
+
+    def registrar_envio(self):
+        self.estado = 'enviado'
+        self.intentos += 1
+        self.fecha_envio = timezone.now()
+        self.ultimo_error = ''
+        # Ya entregado: no dejar la contraseña guardada en la bandeja
+        self.save(update_fields=self._borrar_cuerpo_sensible(['estado', 'intentos', 'fecha_envio', 'ultimo_error']))
+
+    def registrar_fallo(self, error, max_intentos, backoff_segundos):
+        """Programa el siguiente intento con backoff exponencial o marca fallido"""
+        self.intentos += 1
+        self.ultimo_error = str(error)
+        campos = ['estado', 'intentos', 'ultimo_error', 'proximo_intento']
+        if self.intentos >= max_intentos:
+            self.estado = 'fallido'
+            # No se va a reintentar: tampoco guardar la contraseña
+            campos = self._borrar_cuerpo_sensible(campos)
+        else:
+            self.estado = 'pendiente'
+            espera = backoff_segundos * (2 ** (self.intentos - 1))
+            self.proximo_intento = timezone.now() + timedelta(seconds=espera)
+        self.save(update_fields=campos)
+
+    def _borrar_cuerpo_sensible(self, campos):
+        """Vacia el cuerpo de los TIPOS_SENSIBLES; retorna `campos` con 'cuerpo' si hace falta guardarlo"""
+        if self.tipo in self.TIPOS_SENSIBLES:
+            self.cuerpo = ''
+            return campos + ['cuerpo']
+        return campos
+
+
+@receiver(m2m_changed, sender=UserProfile.proyectos_asignados.through)
+def invalidar_proyectos_asignados(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    perfil.proyectos_asignados.add/remove/clear(...): que el mismo perfil
+    recalcule sus proyectos si se consulta despues del cambio en el request
+    """
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        instance.__dict__.pop('ids_proyectos_asignados', None)
+
+
+@receiver(pre_delete, sender=Solicitud)
+def descontar_solicitud_eliminada(sender, instance, **kwargs):
+    """Se ejecuta dentro de la transacción del delete (también en cascada)"""
+    clave = instance._clave_contador
+    if clave is None or clave is Solicitud.CLAVE_DESCONOCIDA:
+        clave = instance._calcular_clave_contador()
+    ContadorSolicitudes.ajustar(*clave, -1)
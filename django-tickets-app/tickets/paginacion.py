@@ -0,0 +1,134 @@
+"""
+Paginación por cursor (keyset) para los listados ordenados por fecha.
+
+A diferencia de django.core.paginator.Paginator no usa COUNT(*) ni OFFSET:
+cada página filtra a partir de la última fila vista sobre (campo, id), así
+que la página N cuesta lo mismo que la primera y aprovecha los índices sobre
+fecha_creacion. Los cursores son tokens firmados y opacos para el cliente.
+"""
+from django.core import signing
+from django.db.models import Q
+from django.http import QueryDict
+from django.utils.functional import cached_property
+
+SALT_CURSOR = 'tickets.paginacion.cursor'
+
+
+class PaginaCursor:
+    """Página de resultados. Expone la misma interfaz básica que Page en los templates."""
+
+    def __init__(self, object_list, paginator, cursor_siguiente, cursor_anterior, parametros):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.cursor_siguiente = cursor_siguiente
+        self.cursor_anterior = cursor_anterior
+        self._parametros = parametros
+
+    def __repr__(self):
+        return f'<PaginaCursor de {len(self.object_list)} elementos>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.cursor_siguiente is not None
+
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def _querystring(self, cursor):
+        parametros = self._parametros.copy() if self._parametros is not None else QueryDict(mutable=True)
+        parametros.pop('page', None)
+        parametros['cursor'] = cursor
+        return parametros.urlencode()
+
+    @property
+    def querystring_siguiente(self):
+        """Query string (sin '?') de la página siguiente, conservando los filtros"""
+        return self._querystring(self.cursor_siguiente) if self.has_next() else ''
+
+    @property
+    def querystring_anterior(self):
+        return self._querystring(self.cursor_anterior) if self.has_previous() else ''
+
+
+class PaginadorCursor:
+    """
+    Paginador keyset sobre (campo, id) en orden descendente.
+
+    paginador = PaginadorCursor(Solicitud.objects.filter(...), 10)
+    page_obj = paginador.page(request.GET.get('cursor'), parametros=request.GET)
+
+    Un cursor inválido o manipulado devuelve la primera página.
+    """
+
+    def __init__(self, object_list, per_page, campo='fecha_creacion'):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.campo = campo
+
+    @cached_property
+    def count(self):
+        """
+        Total de elementos. Cuesta un COUNT(*) en cada página: los templates solo
+        deben mostrarlo si la vista lo asigna desde un agregado que ya calcula.
+        """
+        return self.object_list.order_by().count()
+
+    def _codificar(self, obj, direccion):
+        valor = getattr(obj, self.campo)
+        # isoformat conserva los microsegundos (DjangoJSONEncoder los recorta)
+        datos = [valor.isoformat() if hasattr(valor, 'isoformat') else valor, obj.pk, direccion]
+        return signing.dumps(datos, salt=SALT_CURSOR, compress=True)
+
+    def _decodificar(self, cursor):
+        try:
+            valor, pk, direccion = signing.loads(cursor, salt=SALT_CURSOR)
+            valor = self.object_list.model._meta.get_field(self.campo).to_python(valor)
+        except (signing.BadSignature, ValueError, TypeError):
+            return None
+        if direccion not in ('siguiente', 'anterior'):
+            return None
+        return valor, pk, direccion
+
+    def page(self, cursor=None, parametros=None):
+        posicion = self._decodificar(cursor) if cursor else None
+        campo = self.campo
+        qs = self.object_list
+
+        if posicion is None:
+            filas = list(qs.order_by(f'-{campo}', '-pk')[:self.per_page + 1])
+            hay_mas, hay_menos = len(filas) > self.per_page, False
+            filas = filas[:self.per_page]
+        else:
+            valor, pk, direccion = posicion
+            if direccion == 'siguiente':
+                # El rango sobre el campo permite usar su índice; el OR solo desempata por id
+                filas = list(
+                    qs.filter(**{f'{campo}__lte': valor})
+                    .filter(Q(**{f'{campo}__lt': valor}) | Q(pk__lt=pk))
+                    .order_by(f'-{campo}', '-pk')[:self.per_page + 1]
+                )
+                hay_mas, hay_menos = len(filas) > self.per_page, True
+                filas = filas[:self.per_page]
+            else:
+                filas = list(
+                    qs.filter(**{f'{campo}__gte': valor})
+                    .filter(Q(**{f'{campo}__gt': valor}) | Q(pk__gt=pk))
+                    .order_by(campo, 'pk')[:self.per_page + 1]
+                )
+                hay_mas, hay_menos = True, len(filas) > self.per_page
+                filas = filas[:self.per_page][::-1]
+
+        cursor_siguiente = self._codificar(filas[-1], 'siguiente') if hay_mas and filas else None
+        cursor_anterior = self._codificar(filas[0], 'anterior') if hay_menos and filas else None
+        return PaginaCursor(filas, self, cursor_siguiente, cursor_anterior, parametros)
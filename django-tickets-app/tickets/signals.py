@@ -1,7 +1,7 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile, Solicitud, HistorialEstado
+from .models import UserProfile
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -9,14 +9,6 @@ def create_user_profile(sender, instance, created, **kwargs):
     if created:
         UserProfile.objects.get_or_create(user=instance)
 
-@receiver(pre_save, sender=Solicitud)
-def track_status_changes(sender, instance, **kwargs):
-    """Rastrear cambios de estado automáticamente"""
-    if instance.pk:  # Solo para actualizaciones, no para creaciones
-        try:
-            old_instance = Solicitud.objects.get(pk=instance.pk)
-            if old_instance.estado != instance.estado:
-                # El cambio de estado se manejará en las vistas para incluir el usuario
-                pass
-        except Solicitud.DoesNotExist:
-            pass
+# Este módulo no se importa (TicketsConfig.ready no lo conecta). Los cambios de
+# estado de Solicitud se registran en Solicitud.save() comparando contra el
+# estado cargado en from_db (ver Solicitud.cambiar_estado).
@@ -0,0 +1,443 @@
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from openpyxl import Workbook
+
+from .dialectos import get_dialecto
+from .management.commands.procesar_generaciones import Command as ProcesarGeneraciones
+from .models import (Comentario, ContadorSolicitudes, GeneracionJob, HistorialEstado, Proyecto, ScriptGenerado,
+                     Solicitud)
+from .paginacion import PaginadorCursor
+from .utils import (AgrupadorGrants, DefinicionTabla, dataframes_por_hoja, generar_script_permisos_usuarios,
+                    generar_script_tabla, ordenar_por_dependencias, validar_estructura_excel)
+
+HEADERS = ['Nombre de la columna', 'Tipo de dato', 'Es nullable', 'Es llave primaria']
+
+
+def _bloque(nombre, columnas):
+    """Filas de un bloque 'nombre tabla' de la plantilla de tablas"""
+    filas = [['Nombre tabla', nombre], ['Esquema', 'public'], [], HEADERS]
+    filas += [[columna, 'integer', 'No', 'No'] for columna in columnas]
+    return filas + [[]]
+
+
+class LibroExcelMixin:
+    """Arma un .xlsx temporal (primera hoja) con las filas dadas"""
+
+    def _libro(self, filas):
+        wb = Workbook()
+        for fila in filas:
+            wb.active.append(fila)
+        fd, ruta = tempfile.mkstemp(suffix='.xlsx')
+        os.close(fd)
+        self.addCleanup(os.remove, ruta)
+        wb.save(ruta)
+        return ruta
+
+
+class BloquesTablaTests(LibroExcelMixin, SimpleTestCase):
+    """Varias tablas en una hoja, con la primera etiqueta en la fila 1"""
+
+    def test_tres_bloques_desde_fila_1(self):
+        ruta = self._libro(_bloque('pedidos', ['id', 'total'])
+                           + _bloque('clientes', ['id'])
+                           + _bloque('productos', ['id', 'precio']))
+
+        with open(ruta, 'rb') as archivo:
+            valido, mensaje = validar_estructura_excel(archivo, 'crear_tabla')
+        self.assertTrue(valido, mensaje)
+        self.assertIn('3 tablas con 5 definiciones', mensaje)
+
+        script = generar_script_tabla(dataframes_por_hoja(ruta), 'crear_tabla', 'app', 'postgresql')
+        for tabla in ('pedidos', 'clientes', 'productos'):
+            self.assertIn(f'CREATE TABLE public.{tabla}', script)
+
+    def test_dos_bloques_desde_fila_1(self):
+        ruta = self._libro(_bloque('pedidos', ['id', 'total']) + _bloque('clientes', ['id', 'nombre']))
+
+        script = generar_script_tabla(dataframes_por_hoja(ruta), 'crear_tabla', 'app', 'postgresql')
+        pedidos, clientes = script.split('CREATE TABLE public.clientes')
+        self.assertIn('CREATE TABLE public.pedidos', pedidos)
+        self.assertNotIn('nombre', pedidos)
+        self.assertIn('nombre', clientes)
+
+    def test_etiqueta_sin_headers_se_rechaza(self):
+        ruta = self._libro([['Nombre tabla', 'pedidos'], ['Esquema', 'public'], []]
+                           + _bloque('clientes', ['id']))
+
+        with open(ruta, 'rb') as archivo:
+            valido, mensaje = validar_estructura_excel(archivo, 'crear_tabla')
+        self.assertFalse(valido)
+        self.assertIn('Tabla 1', mensaje)
+
+
+class OrdenDependenciasTests(SimpleTestCase):
+
+    def _tabla(self, nombre, *referencias):
+        return DefinicionTabla('public', nombre, '', list(referencias))
+
+    def test_referenciadas_primero(self):
+        ordenadas, ciclicas = ordenar_por_dependencias(
+            [self._tabla('pedidos', 'clientes(id)'), self._tabla('clientes')])
+        self.assertEqual([tabla.nombre for tabla in ordenadas], ['clientes', 'pedidos'])
+        self.assertEqual(ciclicas, [])
+
+    def test_solo_miembros_del_ciclo(self):
+        # a <-> b forman el ciclo; c solo depende de a
+        ordenadas, ciclicas = ordenar_por_dependencias([
+            self._tabla('c', 'a'), self._tabla('a', 'b'), self._tabla('b', 'a'), self._tabla('d'),
+        ])
+        self.assertEqual([tabla.nombre for tabla in ordenadas], ['d', 'c', 'a', 'b'])
+        self.assertEqual([tabla.nombre for tabla in ciclicas], ['a', 'b'])
+
+
+class AgrupadorGrantsTests(LibroExcelMixin, SimpleTestCase):
+    """GRANT agrupados de la hoja de permisos (iterar_script_permisos_usuarios)"""
+
+    SELECT, INSERT, UPDATE = 1, 2, 4
+
+    def _script(self, permisos, motor='postgresql'):
+        """`permisos` son filas (esquema, tabla, select, insert, update, delete)"""
+        ruta = self._libro([
+            ['Nombre Usuario', 'app_user'], ['base de datos', 'bd'], ['Es usuario Nuevo', 'No'], [],
+            ['Esquema', 'Nombre Tabla', 'Select', 'Insert', 'Update', 'Delete'],
+        ] + [list(fila) for fila in permisos])
+        return generar_script_permisos_usuarios(ruta, motor)
+
+    def _grants(self, permisos, motor='postgresql'):
+        return [linea for linea in self._script(permisos, motor).splitlines() if linea.startswith('GRANT')]
+
+    def test_filas_repetidas_se_unen(self):
+        self.assertEqual(self._grants([
+            ('ventas', 'pedidos', 'Si', 'No', 'No', 'No'),
+            ('ventas', 'pedidos', 'No', 'Si', 'No', 'No'),
+            ('ventas', 'pedidos', 'Si', 'No', 'No', 'No'),
+        ]), ["GRANT SELECT, INSERT ON ventas.pedidos TO app_user;"])
+
+    def test_esquema_completo_descuenta_permisos_de_las_tablas(self):
+        permisos = [
+            ('ventas', 'pedidos', 'Si', 'Si', 'No', 'No'),
+            ('ventas', 'clientes', 'Si', 'Si', 'No', 'No'),
+            ('ventas', '*', 'Si', 'No', 'No', 'No'),
+            ('rrhh', 'empleados', 'Si', 'No', 'No', 'No'),
+        ]
+        esperados = {
+            'postgresql': [
+                "GRANT SELECT ON ALL TABLES IN SCHEMA ventas TO app_user;",
+                "GRANT INSERT ON ventas.pedidos, ventas.clientes TO app_user;",
+                "GRANT SELECT ON rrhh.empleados TO app_user;",
+            ],
+            'mysql': [
+                "GRANT SELECT ON `ventas`.* TO 'app_user'@'%';",
+                "GRANT INSERT ON `ventas`.`pedidos` TO 'app_user'@'%';",
+                "GRANT INSERT ON `ventas`.`clientes` TO 'app_user'@'%';",
+                "GRANT SELECT ON `rrhh`.`empleados` TO 'app_user'@'%';",
+            ],
+            'sqlserver': [
+                "GRANT SELECT ON SCHEMA::[ventas] TO [app_user];",
+                "GRANT INSERT ON [ventas].[pedidos] TO [app_user];",
+                "GRANT INSERT ON [ventas].[clientes] TO [app_user];",
+                "GRANT SELECT ON [rrhh].[empleados] TO [app_user];",
+            ],
+        }
+        for motor, grants in esperados.items():
+            with self.subTest(motor=motor):
+                self.assertEqual(self._grants(permisos, motor), grants)
+
+    def test_oracle_sin_grant_de_esquema(self):
+        # Sin forma de esquema completo: '*' queda como una tabla mas y no descuenta nada
+        self.assertEqual(self._grants([
+            ('ventas', 'pedidos', 'Si', 'Si', 'No', 'No'),
+            ('ventas', '*', 'Si', 'No', 'No', 'No'),
+        ], 'oracle'), [
+            "GRANT SELECT, INSERT ON ventas.pedidos TO app_user;",
+            "GRANT SELECT ON ventas.* TO app_user;",
+        ])
+
+    def test_divide_en_grant_max_objetos(self):
+        tablas = [f't{i}' for i in range(120)]
+        grants = self._grants([('ventas', tabla, 'Si', 'No', 'No', 'No') for tabla in tablas])
+
+        maximo = get_dialecto('postgresql').GRANT_MAX_OBJETOS
+        self.assertEqual(len(grants), 3)
+        self.assertEqual([grant.count('ventas.') for grant in grants], [maximo, maximo, 120 - 2 * maximo])
+        self.assertEqual(grants[0], "GRANT SELECT ON " + ", ".join(f"ventas.{t}" for t in tablas[:maximo])
+                         + " TO app_user;")
+
+    def test_vacia_por_tandas_de_max_tablas(self):
+        with mock.patch.object(AgrupadorGrants, 'MAX_TABLAS', 2):
+            script = self._script([('ventas', tabla, 'Si', 'No', 'No', 'No') for tabla in 'abcde'])
+
+        grants = [linea for linea in script.splitlines() if linea.startswith('GRANT')]
+        self.assertEqual(grants, [
+            "GRANT SELECT ON ventas.a, ventas.b TO app_user;",
+            "GRANT SELECT ON ventas.c, ventas.d TO app_user;",
+            "GRANT SELECT ON ventas.e TO app_user;",
+        ])
+        self.assertIn("-- GRANT: 5 filas con permisos -> 3 sentencias (2 ahorradas)", script)
+
+    def test_esquema_completo_entre_tandas(self):
+        agrupador = AgrupadorGrants(get_dialecto('postgresql'), 'app_user')
+        agrupador.agregar('ventas', '*', self.SELECT)
+        self.assertEqual(list(agrupador.sentencias()), ["GRANT SELECT ON ALL TABLES IN SCHEMA ventas TO app_user;"])
+
+        # Solo los permisos de esquema nuevos; la tabla recibe lo que no cubre el esquema
+        agrupador.agregar('ventas', '*', self.SELECT | self.INSERT)
+        agrupador.agregar('ventas', 'pedidos', self.SELECT | self.INSERT | self.UPDATE)
+        self.assertEqual(list(agrupador.sentencias()), [
+            "GRANT INSERT ON ALL TABLES IN SCHEMA ventas TO app_user;",
+            "GRANT UPDATE ON ventas.pedidos TO app_user;",
+        ])
+        self.assertEqual(list(agrupador.sentencias()), [])
+        self.assertEqual((agrupador.filas, agrupador.sentencias_emitidas, agrupador.ahorradas), (3, 3, 0))
+
+    def test_linea_de_resumen(self):
+        script = self._script([
+            ('ventas', 'pedidos', 'Si', 'No', 'No', 'No'),
+            ('ventas', 'clientes', 'Si', 'No', 'No', 'No'),
+            ('ventas', 'productos', 'No', 'No', 'No', 'No'),
+        ])
+        self.assertIn("-- GRANT: 2 filas con permisos -> 1 sentencias (1 ahorradas)", script)
+        self.assertNotIn("-- GRANT:", self._script([('ventas', 'pedidos', 'No', 'No', 'No', 'No')]))
+
+
+class SolicitudesMixin:
+    """Usuario y proyectos para crear solicitudes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('dev', 'dev@example.com', 'clave')
+        cls.proyecto = Proyecto.objects.create(nombre='Ventas', codigo='VEN')
+        cls.otro_proyecto = Proyecto.objects.create(nombre='RRHH', codigo='RRHH')
+
+    def _solicitud(self, **campos):
+        datos = {'proyecto': self.proyecto, 'tipo_solicitud': 'crear_tabla', 'usuario': self.usuario,
+                 'base_datos_aplicacion': 'app', 'correo_notificacion': 'dev@example.com'}
+        datos.update(campos)
+        return Solicitud.objects.create(**datos)
+
+
+class ContadorSolicitudesTests(SolicitudesMixin, TestCase):
+    """Los contadores materializados coinciden con el conteo real"""
+
+    def assertContadoresAlDia(self):
+        self.assertEqual(ContadorSolicitudes.conteo_guardado(), ContadorSolicitudes.conteo_real())
+
+    def test_crear(self):
+        self._solicitud()
+        self._solicitud(tipo_solicitud='crear_usuarios')
+        self._solicitud(proyecto=self.otro_proyecto)
+        self._solicitud(proyecto=None)
+        self.assertContadoresAlDia()
+        self.assertEqual(ContadorSolicitudes.conteo_guardado()[self.proyecto.pk, 'registrada', 'crear_tabla'], 1)
+
+    def test_cambiar_estado(self):
+        solicitud = self._solicitud()
+        solicitud.cambiar_estado('revision', self.usuario, 'listo')
+        solicitud.save()
+
+        self.assertContadoresAlDia()
+        self.assertNotIn((self.proyecto.pk, 'registrada', 'crear_tabla'), ContadorSolicitudes.conteo_guardado())
+        historial = HistorialEstado.objects.get(solicitud=solicitud)
+        self.assertEqual((historial.estado_anterior, historial.estado_nuevo), ('registrada', 'revision'))
+
+    def test_save_update_fields(self):
+        solicitud = self._solicitud()
+        solicitud.estado = 'aprobada'
+        solicitud.tipo_solicitud = 'crear_usuarios'
+        # Solo se persiste el estado: el tipo sigue siendo crear_tabla en la base
+        solicitud.save(update_fields=['estado'])
+        self.assertContadoresAlDia()
+
+        solicitud.proyecto = self.otro_proyecto
+        solicitud.save(update_fields=['proyecto'])
+        self.assertContadoresAlDia()
+
+        solicitud.save(update_fields=['descripcion'])
+        self.assertContadoresAlDia()
+
+    def test_save_con_campos_diferidos(self):
+        pk = self._solicitud().pk
+
+        solicitud = Solicitud.objects.only('descripcion').get(pk=pk)
+        solicitud.estado = 'aprobada'
+        solicitud.save()
+        self.assertContadoresAlDia()
+
+        solicitud = Solicitud.objects.defer('estado', 'proyecto').get(pk=pk)
+        solicitud.descripcion = 'sin cambio de contador'
+        solicitud.save()
+        self.assertContadoresAlDia()
+
+        solicitud = Solicitud.objects.only('pk').get(pk=pk)
+        solicitud.tipo_solicitud = 'crear_bd'
+        solicitud.save(update_fields=['tipo_solicitud'])
+        self.assertContadoresAlDia()
+        self.assertEqual(ContadorSolicitudes.conteo_guardado(), {(self.proyecto.pk, 'aprobada', 'crear_bd'): 1})
+
+    def test_delete_de_queryset(self):
+        for estado in ('registrada', 'revision', 'revision'):
+            self._solicitud(estado=estado)
+        self._solicitud(proyecto=self.otro_proyecto)
+
+        Solicitud.objects.filter(proyecto=self.proyecto, estado='revision').delete()
+        self.assertContadoresAlDia()
+        Solicitud.objects.only('pk').filter(proyecto=self.otro_proyecto).delete()
+        self.assertContadoresAlDia()
+
+    def test_delete_en_cascada_de_proyecto(self):
+        self._solicitud()
+        self._solicitud(proyecto=self.otro_proyecto)
+
+        self.proyecto.delete()
+        self.assertContadoresAlDia()
+        self.assertEqual(len(ContadorSolicitudes.conteo_guardado()), 1)
+
+    def test_delete_en_cascada_de_usuario(self):
+        otro = User.objects.create_user('otro', 'otro@example.com', 'clave')
+        self._solicitud(usuario=otro)
+        self._solicitud(usuario=otro, proyecto=self.otro_proyecto, estado='revision')
+        self._solicitud()
+
+        otro.delete()
+        self.assertContadoresAlDia()
+        self.assertEqual(ContadorSolicitudes.conteo_guardado(), {(self.proyecto.pk, 'registrada', 'crear_tabla'): 1})
+
+
+class PaginadorCursorTests(SolicitudesMixin, TestCase):
+
+    def setUp(self):
+        self.pks = [self._solicitud().pk for _ in range(7)]
+        self.paginador = PaginadorCursor(Solicitud.objects.all(), 3)
+
+    def _pks(self, pagina):
+        return [solicitud.pk for solicitud in pagina]
+
+    def test_empates_en_fecha_creacion(self):
+        # Misma fecha en todas: el orden y los cortes de página dependen del id
+        Solicitud.objects.update(fecha_creacion=timezone.now())
+        vistos = []
+        pagina = self.paginador.page()
+        while True:
+            vistos += self._pks(pagina)
+            if not pagina.has_next():
+                break
+            pagina = self.paginador.page(pagina.cursor_siguiente)
+        self.assertEqual(vistos, sorted(self.pks, reverse=True))
+
+    def test_siguiente_y_anterior_vuelven_a_la_misma_pagina(self):
+        Solicitud.objects.filter(pk__in=self.pks[:4]).update(fecha_creacion=timezone.now())
+        primera = self.paginador.page()
+        segunda = self.paginador.page(primera.cursor_siguiente)
+        tercera = self.paginador.page(segunda.cursor_siguiente)
+        self.assertEqual(len(tercera), 1)
+        self.assertFalse(tercera.has_next())
+
+        self.assertEqual(self._pks(self.paginador.page(tercera.cursor_anterior)), self._pks(segunda))
+        de_vuelta = self.paginador.page(segunda.cursor_anterior)
+        self.assertEqual(self._pks(de_vuelta), self._pks(primera))
+        self.assertFalse(de_vuelta.has_previous())
+        self.assertTrue(de_vuelta.has_next())
+
+    def test_cursor_manipulado_da_la_primera_pagina(self):
+        primera = self._pks(self.paginador.page())
+        cursor = self.paginador.page().cursor_siguiente
+        for manipulado in (cursor[:-2] + 'xx', 'no-es-un-cursor', cursor.replace(':', '.', 1)):
+            with self.subTest(cursor=manipulado):
+                pagina = self.paginador.page(manipulado)
+                self.assertEqual(self._pks(pagina), primera)
+                self.assertFalse(pagina.has_previous())
+
+    def test_querystring_conserva_filtros(self):
+        parametros = QueryDict('estado=registrada&proyecto=3&page=4&cursor=viejo')
+        pagina = self.paginador.page(parametros=parametros)
+
+        siguiente = QueryDict(pagina.querystring_siguiente)
+        self.assertEqual(siguiente['estado'], 'registrada')
+        self.assertEqual(siguiente['proyecto'], '3')
+        self.assertNotIn('page', siguiente)
+        self.assertEqual(siguiente['cursor'], pagina.cursor_siguiente)
+        self.assertEqual(pagina.querystring_anterior, '')
+        # El QueryDict de la request no se modifica
+        self.assertEqual(parametros['cursor'], 'viejo')
+
+
+class GeneracionJobTests(SolicitudesMixin, TestCase):
+    """Cola de generaciones: encolar, completar y reservar (procesar_generaciones)"""
+
+    def setUp(self):
+        self.solicitud = self._solicitud(tipo_archivo='excel')
+
+    def _completar(self, job, texto='CREATE TABLE t (id int);\n'):
+        job.completar(ScriptGenerado.comprimir([texto]), 0.5)
+
+    def test_encolar_reutiliza_la_generacion_activa(self):
+        job, creada = GeneracionJob.encolar(self.solicitud, self.usuario)
+        otra, otra_creada = GeneracionJob.encolar(self.solicitud, self.usuario, 'otra vez')
+        self.assertTrue(creada)
+        self.assertFalse(otra_creada)
+        self.assertEqual(otra.pk, job.pk)
+
+        GeneracionJob.objects.filter(pk=job.pk).update(estado='procesando')
+        self.assertEqual(GeneracionJob.encolar(self.solicitud)[0].pk, job.pk)
+
+        # Terminada la anterior se puede encolar otra
+        self._completar(GeneracionJob.objects.get(pk=job.pk))
+        nueva, nueva_creada = GeneracionJob.encolar(self.solicitud, self.usuario)
+        self.assertTrue(nueva_creada)
+        self.assertNotEqual(nueva.pk, job.pk)
+
+    def test_completar_pasa_a_revision(self):
+        job, _ = GeneracionJob.encolar(self.solicitud, self.usuario, 'Script generado', pasar_a_revision=True)
+        self._completar(job)
+
+        solicitud = Solicitud.objects.get(pk=self.solicitud.pk)
+        self.assertEqual(solicitud.estado, 'revision')
+        self.assertTrue(solicitud.estructura_validada)
+        self.assertEqual(solicitud.script_sql, 'CREATE TABLE t (id int);\n')
+        historial = HistorialEstado.objects.get(solicitud=solicitud)
+        self.assertEqual((historial.estado_anterior, historial.estado_nuevo), ('registrada', 'revision'))
+        self.assertEqual(Comentario.objects.get(solicitud=solicitud).texto, 'Script generado')
+
+        job.refresh_from_db()
+        self.assertEqual(job.estado, 'completado')
+        self.assertEqual(job.script_id, solicitud.script_vigente_id)
+        self.assertEqual(ContadorSolicitudes.conteo_guardado(), ContadorSolicitudes.conteo_real())
+
+    def test_completar_no_pisa_lo_editado_durante_la_generacion(self):
+        job, _ = GeneracionJob.encolar(self.solicitud, self.usuario, pasar_a_revision=True)
+        job = GeneracionJob.objects.select_related('solicitud').get(pk=job.pk)
+
+        # Mientras el pool genera, alguien edita la solicitud
+        editada = Solicitud.objects.get(pk=self.solicitud.pk)
+        editada.descripcion = 'editada'
+        editada.base_datos_aplicacion = 'otra_bd'
+        editada.save()
+
+        self._completar(job)
+        solicitud = Solicitud.objects.get(pk=self.solicitud.pk)
+        self.assertEqual((solicitud.descripcion, solicitud.base_datos_aplicacion), ('editada', 'otra_bd'))
+        self.assertEqual(solicitud.estado, 'revision')
+        self.assertIsNotNone(solicitud.script_vigente_id)
+
+    def test_reservar_recupera_reservas_vencidas(self):
+        job, _ = GeneracionJob.encolar(self.solicitud, self.usuario)
+        comando = ProcesarGeneraciones()
+
+        self.assertEqual([j.pk for j in comando.reservar(10)], [job.pk])
+        job.refresh_from_db()
+        self.assertEqual(job.estado, 'procesando')
+        # Reservada por otro worker: no se vuelve a tomar
+        self.assertEqual(comando.reservar(10), [])
+
+        # El worker murio y la reserva vencio
+        GeneracionJob.objects.filter(pk=job.pk).update(reservado_hasta=timezone.now() - timedelta(seconds=1))
+        self.assertEqual([j.pk for j in comando.reservar(10)], [job.pk])
+        job.refresh_from_db()
+        self.assertGreater(job.reservado_hasta, timezone.now())
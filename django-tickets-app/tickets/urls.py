@@ -13,6 +13,7 @@ urlpatterns = [
     path('solicitud/<int:pk>/', views.detalle_solicitud, name='detalle_solicitud'),
     path('solicitud/<int:pk>/editar/', views.editar_solicitud, name='editar_solicitud'),
     path('solicitud/<int:pk>/descargar-sql/', views.descargar_script_sql, name='descargar_script_sql'),
+    path('solicitud/<int:pk>/generacion/', views.estado_generacion, name='estado_generacion'),
     
     # Proyectos
     path('proyectos/', views.lista_proyectos, name='lista_proyectos'),
@@ -1,392 +1,469 @@
 
 import pandas as pd
+from pandas.io.parsers import TextParser
 import openpyxl
 # =========================
 # Generador de plantillas Excel
 # =========================
 from openpyxl import Workbook
+from openpyxl.cell.cell import ERROR_CODES
 from openpyxl.styles import Font, Alignment, Border, Side, PatternFill
 
 from django.core.files.storage import default_storage
-from django.core.mail import EmailMessage
 from django.conf import settings
+from django.core.cache import caches
+from django.core.mail import get_connection
+from django.db import DatabaseError
 from django.template.loader import render_to_string
-from .models import ConfiguracionEstructuraExcel
+from .dialectos import Dialecto, TIPOS_CON_TAMANO, get_dialecto
+from .models import ConfiguracionEstructuraExcel, CorreoPendiente, ScriptGenerado
+from collections import namedtuple
+import logging
 import os
 import json
+import hashlib
+import heapq
 import secrets
 import string
 import re
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Alias de la cache donde se guardan los scripts generados (ver CACHES en settings)
+CACHE_SCRIPTS_SQL = 'scripts_sql'
 
 
 # =========================
-# Mapeo de sintaxis por motor de BD
+# Armado de scripts
 # =========================
-def get_tipo_dato_por_motor(tipo_dato, motor_bd):
+class SqlScriptBuilder:
     """
-    Convierte tipos de datos genericos a la sintaxis especifica del motor
+    Buffer de un script SQL respaldado por una lista. Las partes se agregan con
+    encabezado/seccion/sentencia/definicion y se unen una sola vez: render()
+    para el texto completo o vaciar() para entregarlas por tandas a los
+    generadores iterar_script_*.
+
+    Las sentencias que deben cerrar un lote (USE, CREATE USER, GRANT, CREATE
+    SCHEMA...) se marcan con fin_lote=True y el builder agrega el separador
+    del dialecto (GO en SQL Server).
     """
-    tipo_dato_lower = tipo_dato.lower().strip()
-    
-    mapeo = {
-        'postgresql': {
-            'varchar': 'character varying',
-            'int': 'integer',
-            'bigint': 'bigint',
-            'smallint': 'smallint',
-            'float': 'double precision',
-            'double': 'double precision',
-            'decimal': 'numeric',
-            'boolean': 'boolean',
-            'bool': 'boolean',
-            'date': 'date',
-            'datetime': 'timestamp',
-            'timestamp': 'timestamp',
-            'text': 'text',
-            'blob': 'bytea',
-            'serial': 'serial',
-            'bigserial': 'bigserial',
-        },
-        'mysql': {
-            'character varying': 'varchar',
-            'integer': 'int',
-            'bigint': 'bigint',
-            'smallint': 'smallint',
-            'double precision': 'double',
-            'numeric': 'decimal',
-            'boolean': 'tinyint(1)',
-            'bool': 'tinyint(1)',
-            'date': 'date',
-            'timestamp': 'datetime',
-            'text': 'text',
-            'bytea': 'blob',
-            'serial': 'int auto_increment',
-            'bigserial': 'bigint auto_increment',
-        },
-        'sqlserver': {
-            'character varying': 'nvarchar',
-            'varchar': 'nvarchar',
-            'integer': 'int',
-            'bigint': 'bigint',
-            'smallint': 'smallint',
-            'double precision': 'float',
-            'numeric': 'decimal',
-            'boolean': 'bit',
-            'bool': 'bit',
-            'date': 'date',
-            'timestamp': 'datetime2',
-            'datetime': 'datetime2',
-            'text': 'nvarchar(max)',
-            'bytea': 'varbinary(max)',
-            'serial': 'int identity(1,1)',
-            'bigserial': 'bigint identity(1,1)',
-        },
-        'oracle': {
-            'character varying': 'varchar2',
-            'varchar': 'varchar2',
-            'integer': 'number(10)',
-            'int': 'number(10)',
-            'bigint': 'number(19)',
-            'smallint': 'number(5)',
-            'double precision': 'binary_double',
-            'float': 'binary_float',
-            'numeric': 'number',
-            'decimal': 'number',
-            'boolean': 'number(1)',
-            'bool': 'number(1)',
-            'date': 'date',
-            'timestamp': 'timestamp',
-            'datetime': 'timestamp',
-            'text': 'clob',
-            'bytea': 'blob',
-            'serial': 'number generated by default as identity',
-            'bigserial': 'number generated by default as identity',
-        },
-        'sqlite': {
-            'character varying': 'text',
-            'varchar': 'text',
-            'integer': 'integer',
-            'int': 'integer',
-            'bigint': 'integer',
-            'smallint': 'integer',
-            'double precision': 'real',
-            'float': 'real',
-            'numeric': 'numeric',
-            'decimal': 'numeric',
-            'boolean': 'integer',
-            'bool': 'integer',
-            'date': 'text',
-            'timestamp': 'text',
-            'datetime': 'text',
-            'text': 'text',
-            'bytea': 'blob',
-            'serial': 'integer primary key autoincrement',
-            'bigserial': 'integer primary key autoincrement',
-        }
-    }
-    
-    motor_mapeo = mapeo.get(motor_bd, mapeo['postgresql'])
-    return motor_mapeo.get(tipo_dato_lower, tipo_dato)
-
-
-def get_sintaxis_use_db(base_datos, motor_bd):
-    """Retorna la sintaxis USE para cada motor"""
-    if motor_bd == 'postgresql':
-        return f"\\c {base_datos};"
-    elif motor_bd == 'mysql':
-        return f"USE `{base_datos}`;"
-    elif motor_bd == 'sqlserver':
-        return f"USE [{base_datos}];\nGO"
-    elif motor_bd == 'oracle':
-        return f"-- Conectar a: {base_datos}"
-    elif motor_bd == 'sqlite':
-        return f"-- Base de datos: {base_datos}"
-    return f"USE {base_datos};"
-
-
-def get_sintaxis_create_table(esquema, nombre_tabla, motor_bd):
-    """Retorna la sintaxis CREATE TABLE para cada motor"""
-    if motor_bd == 'postgresql':
-        return f"CREATE TABLE {esquema}.{nombre_tabla}"
-    elif motor_bd == 'mysql':
-        return f"CREATE TABLE `{esquema}`.`{nombre_tabla}`"
-    elif motor_bd == 'sqlserver':
-        return f"CREATE TABLE [{esquema}].[{nombre_tabla}]"
-    elif motor_bd == 'oracle':
-        return f"CREATE TABLE {esquema}.{nombre_tabla}"
-    elif motor_bd == 'sqlite':
-        return f"CREATE TABLE {nombre_tabla}"
-    return f"CREATE TABLE {esquema}.{nombre_tabla}"
-
-
-def get_sintaxis_alter_table(esquema, nombre_tabla, motor_bd):
-    """Retorna la sintaxis ALTER TABLE para cada motor"""
-    if motor_bd == 'postgresql':
-        return f"ALTER TABLE {esquema}.{nombre_tabla}"
-    elif motor_bd == 'mysql':
-        return f"ALTER TABLE `{esquema}`.`{nombre_tabla}`"
-    elif motor_bd == 'sqlserver':
-        return f"ALTER TABLE [{esquema}].[{nombre_tabla}]"
-    elif motor_bd == 'oracle':
-        return f"ALTER TABLE {esquema}.{nombre_tabla}"
-    elif motor_bd == 'sqlite':
-        return f"ALTER TABLE {nombre_tabla}"
-    return f"ALTER TABLE {esquema}.{nombre_tabla}"
-
-
-def get_sintaxis_add_column(nombre_col, tipo_dato, motor_bd):
-    """Retorna la sintaxis ADD COLUMN para cada motor"""
-    if motor_bd == 'postgresql':
-        return f"ADD COLUMN {nombre_col} {tipo_dato}"
-    elif motor_bd == 'mysql':
-        return f"ADD COLUMN `{nombre_col}` {tipo_dato}"
-    elif motor_bd == 'sqlserver':
-        return f"ADD [{nombre_col}] {tipo_dato}"
-    elif motor_bd == 'oracle':
-        return f"ADD ({nombre_col} {tipo_dato})"
-    elif motor_bd == 'sqlite':
-        return f"ADD COLUMN {nombre_col} {tipo_dato}"
-    return f"ADD COLUMN {nombre_col} {tipo_dato}"
-
-
-def get_sintaxis_drop_column(nombre_col, motor_bd):
-    """Retorna la sintaxis DROP COLUMN para cada motor"""
-    if motor_bd == 'postgresql':
-        return f"DROP COLUMN {nombre_col}"
-    elif motor_bd == 'mysql':
-        return f"DROP COLUMN `{nombre_col}`"
-    elif motor_bd == 'sqlserver':
-        return f"DROP COLUMN [{nombre_col}]"
-    elif motor_bd == 'oracle':
-        return f"DROP ({nombre_col})"
-    elif motor_bd == 'sqlite':
-        return f"DROP COLUMN {nombre_col}"
-    return f"DROP COLUMN {nombre_col}"
-
-
-def get_sintaxis_modify_column(nombre_col, tipo_dato, motor_bd):
-    """Retorna la sintaxis MODIFY COLUMN para cada motor"""
-    if motor_bd == 'postgresql':
-        return f"ALTER COLUMN {nombre_col} TYPE {tipo_dato}"
-    elif motor_bd == 'mysql':
-        return f"MODIFY COLUMN `{nombre_col}` {tipo_dato}"
-    elif motor_bd == 'sqlserver':
-        return f"ALTER COLUMN [{nombre_col}] {tipo_dato}"
-    elif motor_bd == 'oracle':
-        return f"MODIFY ({nombre_col} {tipo_dato})"
-    elif motor_bd == 'sqlite':
-        return f"-- SQLite no soporta MODIFY COLUMN directamente para {nombre_col}"
-    return f"MODIFY COLUMN {nombre_col} {tipo_dato}"
-
-
-def get_sintaxis_primary_key(columnas, nombre_pk, motor_bd):
-    """Retorna la sintaxis PRIMARY KEY para cada motor"""
-    cols_str = ', '.join(columnas)
-    constraint_name = nombre_pk or f"pk_{'_'.join(columnas)}"
-    
-    if motor_bd == 'postgresql':
-        return f"CONSTRAINT {constraint_name} PRIMARY KEY ({cols_str})"
-    elif motor_bd == 'mysql':
-        return f"PRIMARY KEY ({cols_str})"
-    elif motor_bd == 'sqlserver':
-        return f"CONSTRAINT [{constraint_name}] PRIMARY KEY ({cols_str})"
-    elif motor_bd == 'oracle':
-        return f"CONSTRAINT {constraint_name} PRIMARY KEY ({cols_str})"
-    elif motor_bd == 'sqlite':
-        return f"PRIMARY KEY ({cols_str})"
-    return f"PRIMARY KEY ({cols_str})"
-
-
-def get_sintaxis_foreign_key(columna, tabla_ref, motor_bd):
-    """Retorna la sintaxis FOREIGN KEY para cada motor"""
-    if motor_bd == 'postgresql':
-        return f"FOREIGN KEY ({columna}) REFERENCES {tabla_ref}"
-    elif motor_bd == 'mysql':
-        return f"FOREIGN KEY (`{columna}`) REFERENCES {tabla_ref}"
-    elif motor_bd == 'sqlserver':
-        return f"FOREIGN KEY ([{columna}]) REFERENCES {tabla_ref}"
-    elif motor_bd == 'oracle':
-        return f"FOREIGN KEY ({columna}) REFERENCES {tabla_ref}"
-    elif motor_bd == 'sqlite':
-        return f"FOREIGN KEY ({columna}) REFERENCES {tabla_ref}"
-    return f"FOREIGN KEY ({columna}) REFERENCES {tabla_ref}"
-
-
-def get_sintaxis_comment_table(esquema, nombre_tabla, comentario, motor_bd):
-    """Retorna la sintaxis COMMENT para tablas"""
-    if motor_bd == 'postgresql':
-        return f"COMMENT ON TABLE {esquema}.{nombre_tabla} IS '{comentario}';"
-    elif motor_bd == 'mysql':
-        return f"ALTER TABLE `{esquema}`.`{nombre_tabla}` COMMENT = '{comentario}';"
-    elif motor_bd == 'sqlserver':
-        return f"EXEC sp_addextendedproperty 'MS_Description', '{comentario}', 'SCHEMA', '{esquema}', 'TABLE', '{nombre_tabla}';"
-    elif motor_bd == 'oracle':
-        return f"COMMENT ON TABLE {esquema}.{nombre_tabla} IS '{comentario}';"
-    elif motor_bd == 'sqlite':
-        return f"-- Comentario tabla: {comentario}"
-    return f"-- Comentario: {comentario}"
-
-
-def get_sintaxis_comment_column(esquema, nombre_tabla, nombre_col, comentario, motor_bd):
-    """Retorna la sintaxis COMMENT para columnas"""
-    if motor_bd == 'postgresql':
-        return f"COMMENT ON COLUMN {esquema}.{nombre_tabla}.{nombre_col} IS '{comentario}';"
-    elif motor_bd == 'mysql':
-        return f"-- MySQL: comentario de columna agregado en definicion"
-    elif motor_bd == 'sqlserver':
-        return f"EXEC sp_addextendedproperty 'MS_Description', '{comentario}', 'SCHEMA', '{esquema}', 'TABLE', '{nombre_tabla}', 'COLUMN', '{nombre_col}';"
-    elif motor_bd == 'oracle':
-        return f"COMMENT ON COLUMN {esquema}.{nombre_tabla}.{nombre_col} IS '{comentario}';"
-    elif motor_bd == 'sqlite':
-        return f"-- Comentario columna {nombre_col}: {comentario}"
-    return f"-- Comentario {nombre_col}: {comentario}"
-
-
-def get_encabezado_script(motor_bd):
-    """Retorna encabezado del script segun el motor"""
-    headers = {
-        'postgresql': "-- PostgreSQL Script\n-- Generado automaticamente\n",
-        'mysql': "-- MySQL Script\n-- Generado automaticamente\nSET NAMES utf8mb4;\nSET FOREIGN_KEY_CHECKS = 0;\n",
-        'sqlserver': "-- SQL Server Script\n-- Generado automaticamente\nSET ANSI_NULLS ON;\nGO\nSET QUOTED_IDENTIFIER ON;\nGO\n",
-        'oracle': "-- Oracle Script\n-- Generado automaticamente\nSET DEFINE OFF;\n",
-        'sqlite': "-- SQLite Script\n-- Generado automaticamente\nPRAGMA foreign_keys = ON;\n"
-    }
-    return headers.get(motor_bd, "-- SQL Script\n")
-
-
-def get_sintaxis_create_user(nombre_usuario, motor_bd):
-    """Retorna la sintaxis CREATE USER para cada motor"""
-    if motor_bd == 'postgresql':
-        return f"CREATE USER {nombre_usuario} WITH PASSWORD 'password';"
-    elif motor_bd == 'mysql':
-        return f"CREATE USER '{nombre_usuario}'@'%' IDENTIFIED BY 'password';"
-    elif motor_bd == 'sqlserver':
-        return f"CREATE LOGIN [{nombre_usuario}] WITH PASSWORD = 'password';\nCREATE USER [{nombre_usuario}] FOR LOGIN [{nombre_usuario}];\nGO"
-    elif motor_bd == 'oracle':
-        return f"CREATE USER {nombre_usuario} IDENTIFIED BY password;"
-    elif motor_bd == 'sqlite':
-        return f"-- SQLite no soporta CREATE USER"
-    return f"CREATE USER {nombre_usuario} IDENTIFIED BY 'password';"
-
-
-def get_sintaxis_grant(permisos, esquema, tabla, nombre_usuario, motor_bd):
-    """Retorna la sintaxis GRANT para cada motor"""
-    if motor_bd == 'postgresql':
-        return f"GRANT {permisos} ON {esquema}.{tabla} TO {nombre_usuario};"
-    elif motor_bd == 'mysql':
-        return f"GRANT {permisos} ON `{esquema}`.`{tabla}` TO '{nombre_usuario}'@'%';"
-    elif motor_bd == 'sqlserver':
-        return f"GRANT {permisos} ON [{esquema}].[{tabla}] TO [{nombre_usuario}];\nGO"
-    elif motor_bd == 'oracle':
-        return f"GRANT {permisos} ON {esquema}.{tabla} TO {nombre_usuario};"
-    elif motor_bd == 'sqlite':
-        return f"-- SQLite no soporta GRANT"
-    return f"GRANT {permisos} ON {esquema}.{tabla} TO {nombre_usuario};"
-
-
-def get_sintaxis_create_database(nombre_bd, charset, collation, motor_bd):
-    """Retorna la sintaxis CREATE DATABASE para cada motor"""
-    if motor_bd == 'postgresql':
-        return f"CREATE DATABASE {nombre_bd} ENCODING '{charset}' LC_COLLATE '{collation}';"
-    elif motor_bd == 'mysql':
-        return f"CREATE DATABASE `{nombre_bd}` CHARACTER SET {charset} COLLATE {collation};"
-    elif motor_bd == 'sqlserver':
-        return f"CREATE DATABASE [{nombre_bd}] COLLATE {collation};\nGO"
-    elif motor_bd == 'oracle':
-        return f"-- Oracle: CREATE TABLESPACE o conectar a {nombre_bd}"
-    elif motor_bd == 'sqlite':
-        return f"-- SQLite: La base de datos es el archivo {nombre_bd}.db"
-    return f"CREATE DATABASE {nombre_bd} CHARACTER SET {charset} COLLATE {collation};"
-
-
-def get_sintaxis_create_schema(nombre_esquema, propietario, motor_bd):
-    """Retorna la sintaxis CREATE SCHEMA para cada motor"""
-    if motor_bd == 'postgresql':
-        return f"CREATE SCHEMA {nombre_esquema} AUTHORIZATION {propietario};"
-    elif motor_bd == 'mysql':
-        return f"CREATE DATABASE `{nombre_esquema}`; -- MySQL usa DATABASE en lugar de SCHEMA"
-    elif motor_bd == 'sqlserver':
-        return f"CREATE SCHEMA [{nombre_esquema}] AUTHORIZATION [{propietario}];\nGO"
-    elif motor_bd == 'oracle':
-        return f"CREATE USER {nombre_esquema} IDENTIFIED BY password DEFAULT TABLESPACE users;"
-    elif motor_bd == 'sqlite':
-        return f"-- SQLite no soporta esquemas"
-    return f"CREATE SCHEMA {nombre_esquema} AUTHORIZATION {propietario};"
+    # Partes acumuladas antes de entregar una tanda en vaciar(TANDA)
+    TANDA = 1000
+
+    def __init__(self, dialecto='postgresql'):
+        """`dialecto` es un Dialecto o el nombre del motor (ver dialectos.get_dialecto)"""
+        self.dialecto = dialecto if isinstance(dialecto, Dialecto) else get_dialecto(dialecto)
+        self.separador_lote = self.dialecto.SEPARADOR_LOTE
+        self._partes = []
+
+    def __len__(self):
+        return len(self._partes)
+
+    def agregar(self, texto):
+        """Agrega texto tal cual (sin salto de linea)"""
+        self._partes.append(texto)
+        return self
+
+    def linea(self, texto=''):
+        self._partes.append(texto + "\n")
+        return self
+
+    def comentario(self, texto):
+        self._partes.append(f"-- {texto}\n")
+        return self
+
+    def encabezado(self, *metadatos):
+        """Encabezado del motor seguido de una linea '-- Clave: valor' por cada par y una linea en blanco"""
+        self._partes.append(self.dialecto.ENCABEZADO)
+        for clave, valor in metadatos:
+            self._partes.append(f"-- {clave}: {valor}\n")
+        self._partes.append("\n")
+        return self
+
+    def seccion(self, titulo):
+        """Comentario de titulo seguido de una linea en blanco"""
+        self._partes.append(f"-- {titulo}\n\n")
+        return self
+
+    def sentencia(self, sql, fin_lote=False):
+        """Agrega una sentencia completa; con fin_lote agrega el separador de lote del motor"""
+        self._partes.append(sql)
+        if fin_lote and self.separador_lote:
+            self._partes.append(f"\n{self.separador_lote}")
+        self._partes.append("\n")
+        return self
+
+    def definicion(self, cabecera, elementos):
+        """
+        Sentencia con lista de elementos entre parentesis (columnas y constraints
+        de un CREATE TABLE), uno por linea.
+        """
+        self._partes.append(cabecera + " (\n")
+        self._partes.append(",\n".join(elementos))
+        self._partes.append("\n);\n")
+        return self
+
+    def render(self):
+        return ''.join(self._partes)
+
+    def vaciar(self, minimo=0):
+        """
+        Entrega lo acumulado como un solo texto y lo descarta del buffer, solo si
+        ya hay al menos `minimo` partes. Pensado para `yield from` en los generadores.
+        """
+        if self._partes and len(self._partes) >= minimo:
+            texto = self.render()
+            self._partes = []
+            yield texto
 
 
 # =========================
 # Lectura del Excel
 # =========================
-def procesar_archivo_excel(solicitud):
-    
+def _convertir_celda(cell):
     """
-    Procesa archivos Excel segun el tipo de solicitud y genera scripts SQL
+    Convierte una celda de openpyxl igual que lo hace pandas al leer Excel
+    (vacias -> '', errores -> NaN, numeros enteros -> int)
     """
-    if not solicitud.archivo_adjunto:
+    if cell.value is None:
+        return ""
+    if cell.data_type == 'e':
+        return float('nan')
+    if cell.data_type == 'n':
+        val = int(cell.value)
+        if val == cell.value:
+            return val
+        return float(cell.value)
+    return cell.value
+
+
+def _normalizar_filas(filas):
+    """
+    Quita filas vacias al final y completa las filas al ancho maximo,
+    replicando el recorte que hace pandas antes de construir el DataFrame
+    """
+    ultima_con_datos = -1
+    for idx, fila in enumerate(filas):
+        if fila:
+            ultima_con_datos = idx
+    filas = filas[:ultima_con_datos + 1]
+
+    if filas:
+        ancho = max(len(fila) for fila in filas)
+        if min(len(fila) for fila in filas) < ancho:
+            filas = [fila + [""] * (ancho - len(fila)) for fila in filas]
+    return filas
+
+
+class ParsedWorkbook:
+    """
+    Libro Excel leido una sola vez con openpyxl en modo solo lectura.
+    Sirve todas las vistas que necesitan la validacion y los generadores:
+    grilla cruda, bloque de metadatos y tabla a partir de una cabecera.
+    """
+
+    def __init__(self, archivo, hoja=0):
+        if hasattr(archivo, 'seek'):
+            archivo.seek(0)
+
+        wb = openpyxl.load_workbook(archivo, read_only=True, data_only=True, keep_links=False)
+        try:
+            self._leer_hoja(wb.worksheets[hoja])
+        finally:
+            wb.close()
+
+    @classmethod
+    def hojas(cls, archivo):
+        """
+        Todas las hojas del libro con una sola apertura del archivo, como
+        pd.read_excel(sheet_name=None). Retorna {nombre de hoja: ParsedWorkbook}.
+        """
+        if hasattr(archivo, 'seek'):
+            archivo.seek(0)
+
+        wb = openpyxl.load_workbook(archivo, read_only=True, data_only=True, keep_links=False)
+        try:
+            hojas = {}
+            for ws in wb.worksheets:
+                libro = cls.__new__(cls)
+                libro._leer_hoja(ws)
+                hojas[ws.title] = libro
+            return hojas
+        finally:
+            wb.close()
+
+    def _leer_hoja(self, ws):
+        ws.reset_dimensions()
+        filas = []
+        for row in ws.rows:
+            fila = [_convertir_celda(cell) for cell in row]
+            # quitar celdas vacias al final de la fila
+            while fila and fila[-1] == "":
+                fila.pop()
+            filas.append(fila)
+
+        self._filas = filas
+        self._dataframes = {}
+
+    @property
+    def filas(self):
+        """Grilla cruda de la hoja (sin filas vacias al final)"""
+        return _normalizar_filas(self._filas)
+
+    def dataframe(self, header=0, skiprows=None, nrows=None):
+        """
+        Equivalente a pd.read_excel(archivo, header=..., skiprows=..., nrows=...)
+        sin volver a leer el archivo. Cada vista se construye una sola vez.
+        """
+        clave = (header, skiprows, nrows)
+        if clave not in self._dataframes:
+            filas = self._filas
+            if nrows is not None:
+                # mismas filas que pandas lee del archivo cuando se limita nrows
+                filas = filas[:(1 if header is None else header + 1) + (skiprows or 0) + nrows]
+            filas = _normalizar_filas(filas)
+
+            if not filas:
+                df = pd.DataFrame()
+            else:
+                df = TextParser(
+                    [list(fila) for fila in filas],
+                    header=header,
+                    skiprows=skiprows,
+                    nrows=nrows,
+                    skip_blank_lines=False,
+                ).read()
+            self._dataframes[clave] = df
+
+        # copia superficial: los generadores pueden renombrar columnas
+        return self._dataframes[clave].copy(deep=False)
+
+    def metadatos(self, nrows):
+        """Bloque de metadatos de las primeras filas, sin cabecera"""
+        return self.dataframe(header=None, nrows=nrows)
+
+    def buscar_fila(self, etiqueta, columna=0):
+        """
+        Retorna el indice de la primera fila cuya celda en `columna` coincide
+        con la etiqueta (sin importar mayusculas/espacios), o None
+        """
+        etiqueta = etiqueta.strip().lower()
+        for idx, fila in enumerate(self._filas):
+            if len(fila) > columna and isinstance(fila[columna], str) and fila[columna].strip().lower() == etiqueta:
+                return idx
         return None
 
+    def tabla_desde_cabecera(self, etiqueta, columna=0):
+        """
+        Retorna (indice_fila, DataFrame) usando como cabecera la fila que
+        contiene la etiqueta. Si no existe retorna (None, None)
+        """
+        idx = self.buscar_fila(etiqueta, columna)
+        if idx is None:
+            return None, None
+        return idx, self.dataframe(header=0, skiprows=idx)
+
+
+def dataframes_por_hoja(archivo):
+    """
+    {nombre de hoja: DataFrame} de todo el libro, como
+    pd.read_excel(sheet_name=None, header=None): grilla cruda, sin usar la
+    fila 1 como cabecera (puede traer una etiqueta 'nombre tabla')
+    """
+    return {nombre: libro.dataframe(header=None) for nombre, libro in ParsedWorkbook.hojas(archivo).items()}
+
+
+def _valor_como_pandas(valor):
+    """
+    Valor de iter_rows(values_only=True) (o de ParsedWorkbook.filas) tal como
+    queda en un DataFrame: vacias y errores -> NaN, numeros enteros -> int
+    """
+    if valor is None or valor == "":
+        return float('nan')
+    if isinstance(valor, bool):
+        return valor
+    if isinstance(valor, float):
+        return int(valor) if valor.is_integer() else valor
+    if isinstance(valor, str) and valor in ERROR_CODES:
+        return float('nan')
+    return valor
+
+
+def iterar_filas_excel(archivo, hoja=0):
+    """
+    Recorre las filas de la hoja en modo solo lectura (tuplas de valores, sin
+    armar la grilla completa ni un DataFrame). El libro se cierra al agotar o
+    descartar el generador.
+    """
+    if hasattr(archivo, 'seek'):
+        archivo.seek(0)
+
+    wb = openpyxl.load_workbook(archivo, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.worksheets[hoja]
+        ws.reset_dimensions()
+        yield from ws.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+# Version de los generadores: incrementar cuando cambie la salida de los
+# scripts para que no se sirvan resultados viejos desde la cache.
+#   4: GRANT agrupados por esquema y permisos; celdas numericas enteras de las
+#      hojas de permisos sin '.0' (lectura en streaming)
+#   5: crear_tabla/modificar_tabla con varias tablas por libro
+#   6: bloques de tablas sobre la grilla cruda (etiqueta en la fila 1)
+VERSION_GENERADOR_SQL = 6
+
+
+def calcular_hash_archivo(file_path, tamano_bloque=1024 * 1024):
+    """
+    Retorna el SHA-256 (hex) del contenido del archivo, leyendo por bloques
+    """
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for bloque in iter(lambda: f.read(tamano_bloque), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def clave_cache_script(hash_archivo, tipo_solicitud, motor_bd, base_datos):
+    """
+    Clave de cache para un script generado. Se resume con SHA-256 para que
+    sea segura en cualquier backend de cache (sin espacios ni largo variable)
+    """
+    partes = '|'.join([hash_archivo, tipo_solicitud or '', motor_bd or '', base_datos or '', str(VERSION_GENERADOR_SQL)])
+    return 'script_sql:' + hashlib.sha256(partes.encode('utf-8')).hexdigest()
+
+
+def generar_script_desde_excel(file_path, tipo_solicitud, base_datos, motor_bd):
+    """
+    Lee el archivo Excel y genera el script SQL segun el tipo de solicitud.
+    No usa la base de datos ni la cache.
+    """
+    if tipo_solicitud in ['asignar_permisos', 'crear_usuarios']:
+        # Se lee en streaming, sin cargar la hoja completa
+        return generar_script_permisos_usuarios(file_path, motor_bd)
+
+    if tipo_solicitud in ['crear_tabla', 'modificar_tabla']:
+        # Todas las hojas: el libro puede traer una tabla por hoja o varios bloques
+        return generar_script_tabla(dataframes_por_hoja(file_path), tipo_solicitud, base_datos, motor_bd)
+
+    libro = ParsedWorkbook(file_path)
+
+    if tipo_solicitud in ['crear_bd', 'crear_esquemas']:
+        return generar_script_bd_esquemas(libro.dataframe(), tipo_solicitud, base_datos, motor_bd)
+    return None
+
+
+def iterar_script_desde_excel(file_path, tipo_solicitud, base_datos, motor_bd):
+    """
+    Igual que generar_script_desde_excel pero entrega el script por partes,
+    para comprimirlo sin armar el texto completo (ver ejecutar_generacion).
+    Los errores de estructura se propagan como excepciones.
+    """
+    if tipo_solicitud in ['asignar_permisos', 'crear_usuarios']:
+        yield from iterar_script_permisos_usuarios(file_path, motor_bd)
+        return
+
+    if tipo_solicitud in ['crear_tabla', 'modificar_tabla']:
+        yield from iterar_script_tabla(dataframes_por_hoja(file_path), tipo_solicitud, base_datos, motor_bd)
+        return
+
+    libro = ParsedWorkbook(file_path)
+
+    if tipo_solicitud in ['crear_bd', 'crear_esquemas']:
+        yield from iterar_script_bd_esquemas(libro.dataframe(), tipo_solicitud, base_datos, motor_bd)
+
+
+def motor_bd_solicitud(solicitud):
+    """Motor de BD del proyecto de la solicitud (postgresql por defecto)"""
+    if solicitud.proyecto and solicitud.proyecto.motor_bd:
+        return solicitud.proyecto.motor_bd
+    return 'postgresql'
+
+
+def generar_script_archivo(file_path, tipo_solicitud, base_datos, motor_bd):
+    """
+    Genera el script de un archivo Excel, usando la cache compartida por hash
+    del archivo, tipo, motor y base de datos. Si la cache no responde (tabla
+    faltante o bloqueada) se genera igual y el script no se guarda en ella.
+    """
+    cache = caches[CACHE_SCRIPTS_SQL]
+    clave = clave_cache_script(calcular_hash_archivo(file_path), tipo_solicitud, motor_bd, base_datos)
     try:
-        file_path = solicitud.archivo_adjunto.path
-        df = pd.read_excel(file_path)
+        script = cache.get(clave)
+    except DatabaseError as e:
+        logger.warning("Cache de scripts no disponible (falta createcachetable?): %s", e)
+        script = cache = None
+    if script is not None:
+        return script
 
-        # Obtener motor de BD del proyecto
-        motor_bd = 'postgresql'  # default
-        if solicitud.proyecto and solicitud.proyecto.motor_bd:
-            motor_bd = solicitud.proyecto.motor_bd
+    script = generar_script_desde_excel(file_path, tipo_solicitud, base_datos, motor_bd)
 
-        if solicitud.tipo_solicitud in ['crear_tabla', 'modificar_tabla']:
-            return generar_script_tabla(df, solicitud.tipo_solicitud, solicitud.base_datos_aplicacion, motor_bd)
-        elif solicitud.tipo_solicitud in ['asignar_permisos', 'crear_usuarios']:
-            return generar_script_permisos_usuarios(file_path, motor_bd)
-        elif solicitud.tipo_solicitud in ['crear_bd', 'crear_esquemas']:
-            return generar_script_bd_esquemas(df, solicitud.tipo_solicitud, solicitud.base_datos_aplicacion, motor_bd)
+    # No guardar errores (el archivo o el generador pueden corregirse) ni
+    # scripts enormes: su version vigente ya esta en ScriptGenerado
+    limite = getattr(settings, 'SCRIPTS_SQL_CACHE_MAX_CARACTERES', 256 * 1024)
+    if cache is not None and script and not script.startswith('-- Error') and len(script) <= limite:
+        try:
+            cache.set(clave, script)
+        except DatabaseError as e:
+            logger.warning("No se pudo guardar el script en la cache: %s", e)
+    return script
+
+
+def procesar_archivo_excel(solicitud):
+
+    """
+    Procesa archivos Excel segun el tipo de solicitud y genera scripts SQL.
+    Los scripts se guardan en cache por hash del archivo, tipo, motor y base
+    de datos: regenerar sin cambios en el adjunto solo cuesta el hash.
+    """
+    if not solicitud.archivo_adjunto:
+        return None
+
+    try:
+        return generar_script_archivo(*argumentos_generacion(solicitud))
 
     except Exception as e:
         import traceback
         traceback.print_exc()
         return f"-- Error procesando archivo: {str(e)}"
 
-    return None
+
+ResultadoGeneracion = namedtuple('ResultadoGeneracion', ['referencia', 'comprimido', 'error', 'segundos'])
+
+
+def argumentos_generacion(solicitud):
+    """(ruta del adjunto, tipo, base de datos, motor) para generar_script_archivo/ejecutar_generacion"""
+    return (solicitud.archivo_adjunto.path, solicitud.tipo_solicitud,
+            solicitud.base_datos_aplicacion, motor_bd_solicitud(solicitud))
+
+
+def ejecutar_generacion(referencia, file_path, tipo_solicitud, base_datos, motor_bd):
+    """
+    Tarea para un proceso del pool: comprime el script a medida que se genera
+    (ScriptGenerado.comprimir sobre iterar_script_desde_excel), sin armar el
+    texto completo, y retorna un ResultadoGeneracion con el ScriptComprimido:
+    al proceso principal solo vuelven los bytes gzip. Solo lee el Excel, no
+    usa la base de datos (ni la cache de scripts). Los errores del archivo
+    quedan en `error`, no se propagan.
+    """
+    inicio = time.perf_counter()
+    comprimido = error = None
+    try:
+        comprimido = ScriptGenerado.comprimir(
+            iterar_script_desde_excel(file_path, tipo_solicitud, base_datos, motor_bd)
+        )
+        if not comprimido.tamano:
+            comprimido = None
+            error = f"El tipo de solicitud '{tipo_solicitud}' no genera script desde Excel"
+    except Exception as e:
+        logger.exception("Error generando el script de %s", referencia)
+        error = str(e)
+    return ResultadoGeneracion(referencia, comprimido, error, time.perf_counter() - inicio)
 
 def validar_estructura_excel(archivo, tipo_solicitud):
     """
@@ -395,12 +472,33 @@ def validar_estructura_excel(archivo, tipo_solicitud):
     """
     try:
         if tipo_solicitud == 'crear_tabla':
-            df = pd.read_excel(archivo)
-            return validar_estructura_crear_tabla(df)
-
-        elif tipo_solicitud == 'crear_usuarios':
+            hojas = dataframes_por_hoja(archivo)
+            bloques = bloques_tabla(hojas)
+            for numero, bloque in enumerate(bloques, start=1):
+                if bloque.fila_headers is None:
+                    # Etiqueta 'nombre tabla' que no se puede asociar a columnas
+                    return False, (f"Tabla {numero} (hoja '{bloque.hoja}'): la etiqueta 'Nombre tabla' "
+                                   f"no tiene debajo una fila de headers de columnas")
+            if len(bloques) == 1:
+                return validar_estructura_crear_tabla(bloques[0].df, bloques[0].headers)
+            if not bloques:
+                return validar_estructura_crear_tabla(next(iter(hojas.values()), pd.DataFrame()))
+
+            # Varias tablas (una por hoja o varios bloques): validar cada una
+            total_columnas = 0
+            for numero, bloque in enumerate(bloques, start=1):
+                valido, mensaje = validar_estructura_crear_tabla(bloque.df, bloque.headers)
+                if not valido:
+                    return False, f"Tabla {numero} (hoja '{bloque.hoja}'): {mensaje}"
+                total_columnas += contar_filas_validas(bloque.df, *bloque.headers)
+            return True, (f"Estructura valida. Se encontraron {len(bloques)} tablas "
+                          f"con {total_columnas} definiciones de columnas.")
+
+        libro = ParsedWorkbook(archivo)
+
+        if tipo_solicitud == 'crear_usuarios':
             # Leer los metadatos (primeras 3 filas)
-            metadata = pd.read_excel(archivo, nrows=3, header=None)
+            metadata = libro.metadatos(nrows=3)
 
             # Verificar contenido de los metadatos
             campos_esperados = ['Nombre Usuario', 'base de datos', 'Es usuario Nuevo']
@@ -415,7 +513,7 @@ def validar_estructura_excel(archivo, tipo_solicitud):
                     return False, f"El valor de '{campos_esperados[i]}' no puede estar vacio"
 
             # Leer tabla de permisos (a partir de la fila 5, es decir, indice 4)
-            df_permisos = pd.read_excel(archivo, skiprows=4)
+            df_permisos = libro.dataframe(skiprows=4)
 
             columnas_requeridas = ['Esquema', 'Nombre Tabla', 'Select', 'Insert', 'Update', 'Delete']
             columnas_df = [str(col).strip().lower() for col in df_permisos.columns]
@@ -431,7 +529,7 @@ def validar_estructura_excel(archivo, tipo_solicitud):
 
         else:
             # Para otros tipos, usar la configuracion del modelo
-            df = pd.read_excel(archivo)
+            df = libro.dataframe()
 
             try:
                 config = ConfiguracionEstructuraExcel.objects.get(tipo_solicitud=tipo_solicitud)
@@ -516,9 +614,10 @@ def buscar_columnas_flexibles(df, columnas_requeridas):
     
     return columnas_encontradas
 
-def validar_estructura_crear_tabla(df):
+def validar_estructura_crear_tabla(df, headers=None):
     """
-    Valida la estructura especifica para creacion de tablas - para buscar en contenido
+    Valida la estructura especifica para creacion de tablas - para buscar en contenido.
+    `headers` es (fila_headers, columnas_headers) si ya se buscaron (ver BloqueTabla)
     """
     try:
         # Verificar que tenga datos
@@ -526,7 +625,7 @@ def validar_estructura_crear_tabla(df):
             return False, "El archivo esta vacio"
         
         # Buscar headers en el contenido del DataFrame
-        fila_headers, columnas_headers = encontrar_headers_en_contenido(df)
+        fila_headers, columnas_headers = headers or encontrar_headers_en_contenido(df)
         
         # Verificar columnas minimas
         if 'nombre_columna' not in columnas_headers:
@@ -551,49 +650,68 @@ def validar_estructura_crear_tabla(df):
 # =========================
 # Busqueda de headers en el contenido
 # =========================
-def encontrar_headers_en_contenido(df):
+# Mapeo de sinonimos -> clave
+SINONIMOS_HEADERS = {
+    "nombre_columna": {"nombre de la columna", "nombre_columna", "columna", "campo"},
+    "accion": {"accion", "accion", "operacion", "operacion", "action"},
+    "tipo_dato": {"tipo de dato", "tipo_dato", "tipo dato", "tipo", "data type"},
+    "tamano": {"tamano", "tamano", "tamanio", "longitud", "largo", "size", "length"},
+    "nullable": {"es nullable", "nullable", "acepta null", "null", "permite null"},
+    "primaria": {"es llave primaria", "Es llave primaria", "llave primaria", "clave primaria", "primary key", "pk"},
+    "nombre_pk": {"nombre pk", "nombre de la pk", "pk name"},
+    "default": {"por defecto", "default", "valor defecto", "por por defecto", "defecto", "valor por defecto"},
+    "foranea": {"es foranea", "Es foranea", "foranea", "foreign key", "fk", "foranea", "es foranea"},
+    "referencia": {"tabla referencia", "referencia", "tabla_referencia", "tabla ref", "ref"},
+    "comentario": {"comentario de campo", "comentario campo", "comentario", "descripcion", "descripcion"}
+}
+
+
+def _normalizar_header(valor):
+    return str(valor).strip().lower()
+
+
+def _construir_indice_headers(sinonimos):
+    """
+    Indice invertido: sinonimo normalizado -> claves a las que corresponde
+    """
+    indice = {}
+    for clave, palabras in sinonimos.items():
+        for palabra in palabras:
+            normalizada = _normalizar_header(palabra)
+            if clave not in indice.get(normalizada, ()):
+                indice[normalizada] = indice.get(normalizada, ()) + (clave,)
+    return indice
+
+
+_INDICE_HEADERS = _construir_indice_headers(SINONIMOS_HEADERS)
+
+
+def encontrar_headers_en_contenido(df, max_filas=None):
     """
     Busca los headers dentro del contenido del DataFrame, no en los nombres de columnas.
     Detecta sinonimos y soporta 'tamano'/'tamano'/'tamanio'/'longitud'/'largo'/'size'.
+    Solo revisa las primeras `max_filas` filas (settings.EXCEL_MAX_FILAS_HEADERS).
+    El resultado no se guarda en el DataFrame: quien lo usa varias veces lo
+    recibe ya calculado (ver BloqueTabla).
     """
+    if max_filas is None:
+        max_filas = getattr(settings, 'EXCEL_MAX_FILAS_HEADERS', 50)
+
     columnas_headers = {}
     fila_headers = None
 
-    # Mapeo de sinonimos -> clave
-    synonyms = {
-        "nombre_columna": {"nombre de la columna", "nombre_columna", "columna", "campo"},
-        "accion": {"accion", "accion", "operacion", "operacion", "action"},
-        "tipo_dato": {"tipo de dato", "tipo_dato", "tipo dato", "tipo", "data type"},
-        "tamano": {"tamano", "tamano", "tamanio", "longitud", "largo", "size", "length"},
-        "nullable": {"es nullable", "nullable", "acepta null", "null", "permite null"},
-        "primaria": {"es llave primaria", "Es llave primaria", "llave primaria", "clave primaria", "primary key", "pk"},
-        "nombre_pk": {"nombre pk", "nombre de la pk", "pk name"},
-        "default": {"por defecto", "default", "valor defecto", "por por defecto", "defecto", "valor por defecto"},
-        "foranea": {"es foranea", "Es foranea", "foranea", "foreign key", "fk", "foranea", "es foranea"},
-        "referencia": {"tabla referencia", "referencia", "tabla_referencia", "tabla ref", "ref"},
-        "comentario": {"comentario de campo", "comentario campo", "comentario", "descripcion", "descripcion"}
-    }
-
-    def normalize(s):
-        return str(s).strip().lower()
-
-    for i in range(len(df)):
+    for i, fila in enumerate(df.iloc[:max_filas].itertuples(index=False, name=None)):
         headers_temp = {}
-        for j in range(len(df.columns)):
-            val = df.iloc[i, j]
+        for j, val in enumerate(fila):
             if pd.isna(val):
                 continue
-            vs = normalize(val)
-            # probar cada clave y sus sinonimos
-            for key, words in synonyms.items():
-                if vs in words:
-                    headers_temp[key] = j
+            for key in _INDICE_HEADERS.get(_normalizar_header(val), ()):
+                headers_temp[key] = j
 
         # condicion minima: nombre_columna + (tipo_dato o accion)
         if ("nombre_columna" in headers_temp) and ("tipo_dato" in headers_temp or "accion" in headers_temp):
             fila_headers = i
             columnas_headers = headers_temp
-            print(f"DEBUG: Fila de headers confirmada: {i} -> {columnas_headers}")
             break
 
     return fila_headers, columnas_headers
@@ -614,8 +732,7 @@ def contar_filas_validas(df, fila_headers, columnas_headers):
     
     for idx in range(inicio_datos, len(df)):
         valor_nombre = df.iloc[idx, col_nombre]
-        print(f"DEBUG: Fila {idx}, valor nombre: '{valor_nombre}', tipo: {type(valor_nombre)}")
-        
+
         if pd.notna(valor_nombre):
             valor_str = str(valor_nombre).strip()
             # Excluir valores vacios y headers repetidos
@@ -624,7 +741,6 @@ def contar_filas_validas(df, fila_headers, columnas_headers):
                 not valor_str.startswith('Unnamed') and
                 len(valor_str) > 1):  # Al menos 2 caracteres
                 filas_validas += 1
-                print(f"DEBUG: Fila valida encontrada: {valor_str}")
     
     return filas_validas
 
@@ -717,388 +833,651 @@ def validar_tipo_columna(serie, tipo_esperado):
     
     return True
 
+# Valores que se interpretan como afirmativos / NOT NULL en la plantilla
+_VALORES_SI = {'si', 'yes', '1', 'true', 'y'}
+_VALORES_NOT_NULL = {'no', 'false', '0', 'n'}
+
+# Campo de salida -> clave de header detectada por encontrar_headers_en_contenido
+_CAMPOS_DEFINICION_COLUMNA = {
+    'nombre': 'nombre_columna',
+    'accion': 'accion',
+    'tipo': 'tipo_dato',
+    'tamano': 'tamano',
+    'nullable': 'nullable',
+    'default': 'default',
+    'comentario': 'comentario',
+    'primaria': 'primaria',
+    'foranea': 'foranea',
+    'referencia': 'referencia',
+}
+
+
+def _extraer_columnas_tabla(df, fila_headers, columnas_headers, dialecto):
+    """
+    Extrae por columnas (no celda a celda) las definiciones que siguen a la
+    fila de headers. Retorna un DataFrame alineado con las filas de datos con
+    el texto limpio (str(valor).strip()) de cada campo, una marca 'hay_<campo>'
+    si la celda tenia valor, y el tipo de dato ya convertido segun el dialecto.
+    """
+    datos = df.iloc[fila_headers + 1:]
+    cols = pd.DataFrame(index=datos.index)
+    tamanos = [None] * len(datos)
+
+    for campo, clave in _CAMPOS_DEFINICION_COLUMNA.items():
+        if clave in columnas_headers:
+            serie = datos.iloc[:, columnas_headers[clave]]
+            presente = serie.notna()
+            cols[campo] = serie.astype(object).where(presente, '').map(str).str.strip()
+            cols['hay_' + campo] = presente
+            if campo == 'tamano':
+                tamanos = [_parse_tamano(v) if p else None for v, p in zip(serie.tolist(), presente.tolist())]
+        else:
+            cols[campo] = ''
+            cols['hay_' + campo] = False
+
+    # Tipo (varchar por defecto) + tamano, convertido segun el motor
+    tipos = cols['tipo'].where(cols['hay_tipo'] & cols['tipo'].ne(''), 'varchar').tolist()
+    cols['tipo'] = [
+        dialecto.tipo_dato(_tipo_con_tamano(tipo, tamano))
+        for tipo, tamano in zip(tipos, tamanos)
+    ]
+    return cols
+
+
 # =========================
 # Generador del script de tablas
 # =========================
-def generar_script_tabla(df, tipo_solicitud, base_datos, motor_bd='postgresql'):
+_ETIQUETAS_NOMBRE_TABLA = {'nombre tabla', 'nombre_tabla'}
+
+# Definicion ya generada de una tabla del libro: `script` es su parte del script
+# y `referencias` las tablas que apunta con llaves foraneas (texto de la plantilla)
+DefinicionTabla = namedtuple('DefinicionTabla', ['esquema', 'nombre', 'script', 'referencias'])
+
+
+class BloqueTabla(namedtuple('BloqueTabla', ['hoja', 'df', 'fila_headers', 'columnas_headers'])):
+    """
+    Tabla del libro (ver bloques_tabla) con su fila de headers ya buscada, para
+    que validacion y generacion no repitan encontrar_headers_en_contenido
     """
-    Genera script SQL para creacion o modificacion de tablas.
+    __slots__ = ()
+
+    @property
+    def headers(self):
+        return self.fila_headers, self.columnas_headers
+
+
+def _filas_nombre_tabla(df):
+    """Posiciones de las filas que tienen la etiqueta 'nombre tabla' en alguna celda"""
+    ancho = len(df.columns) or 1
+    filas = set()
+    for posicion, valor in enumerate(df.to_numpy(dtype=object).ravel()):
+        if isinstance(valor, str) and valor.strip().lower() in _ETIQUETAS_NOMBRE_TABLA:
+            filas.add(posicion // ancho)
+    return sorted(filas)
+
+
+def bloques_tabla(hojas):
+    """
+    Separa las tablas definidas en un libro. `hojas` es un DataFrame o un dict
+    {nombre de hoja: DataFrame} con la grilla cruda (ver dataframes_por_hoja).
+    Cada hoja puede tener una tabla o varios bloques, cada uno desde una fila
+    con la etiqueta 'nombre tabla' hasta la siguiente; las filas antes de la
+    primera etiqueta son otro bloque si traen headers de columnas.
+
+    Retorna los BloqueTabla en el orden del libro. Los bloques sin etiqueta
+    ni headers (hojas auxiliares como listas de valores, titulos) se
+    descartan; un bloque con etiqueta y sin headers se retorna con
+    fila_headers None para que la validacion lo rechace.
+    """
+    if isinstance(hojas, pd.DataFrame):
+        hojas = {None: hojas}
+
+    bloques = []
+    for nombre_hoja, df in hojas.items():
+        inicios = _filas_nombre_tabla(df)
+        limites = [0] + inicios if not inicios or inicios[0] else inicios
+        for inicio, fin in zip(limites, limites[1:] + [len(df)]):
+            bloque = df.iloc[inicio:fin]
+            fila_headers, columnas_headers = encontrar_headers_en_contenido(bloque)
+            if fila_headers is not None or inicio in inicios:
+                bloques.append(BloqueTabla(nombre_hoja, bloque, fila_headers, columnas_headers))
+    return bloques
+
+
+def _metadatos_tabla(df):
+    """Nombre de tabla, esquema y comentario de las primeras filas (nombre None si no esta)"""
+    nombre_tabla = None
+    comentario_tabla = None
+    esquema = "public"  # default
+
+    for i in range(min(6, len(df))):
+        for j in range(len(df.columns)):
+            valor = df.iloc[i, j]
+            if pd.isna(valor):
+                continue
+            v = str(valor).strip().lower()
+            
+            if v in _ETIQUETAS_NOMBRE_TABLA:
+                # siguiente celda (derecha) o siguiente fila misma columna
+                if j + 1 < len(df.columns) and pd.notna(df.iloc[i, j+1]):
+                    nombre_tabla = str(df.iloc[i, j+1]).strip()
+                elif i + 1 < len(df) and pd.notna(df.iloc[i+1, j]):
+                    nombre_tabla = str(df.iloc[i+1, j]).strip()
+            elif v in {'esquema', 'schema'}:
+                if j + 1 < len(df.columns) and pd.notna(df.iloc[i, j+1]):
+                    esquema = str(df.iloc[i, j+1]).strip() or esquema
+                elif i + 1 < len(df) and pd.notna(df.iloc[i+1, j]):
+                    esquema = str(df.iloc[i+1, j]).strip() or esquema
+            elif 'comentario' in v:
+                if j + 1 < len(df.columns) and pd.notna(df.iloc[i, j+1]):
+                    comentario_tabla = str(df.iloc[i, j+1]).strip()
+                elif i + 1 < len(df) and pd.notna(df.iloc[i+1, j]):
+                    comentario_tabla = str(df.iloc[i+1, j]).strip()
+
+    return nombre_tabla, esquema, comentario_tabla
+
+
+def _definir_crear_tabla(bloque, nombre_tabla, esquema, comentario_tabla, dialecto):
+    """CREATE TABLE (y comentario) de un BloqueTabla de la plantilla"""
+    sql = SqlScriptBuilder(dialecto)
+    df, fila_headers, columnas_headers = bloque.df, bloque.fila_headers, bloque.columnas_headers
+
+    sql.comentario(f"Tabla: {esquema}.{nombre_tabla}")
+    if comentario_tabla:
+        sql.comentario(f"Comentario: {comentario_tabla}")
+
+    columnas_sql = []
+    claves_primarias = []
+    claves_foraneas = []  # (col, tabla_ref)
+
+    if fila_headers is not None and 'nombre_columna' in columnas_headers:
+        cols = _extraer_columnas_tabla(df, fila_headers, columnas_headers, dialecto)
+
+        # Filas con nombre de columna valido
+        validas = cols['hay_nombre'] & cols['nombre'].ne('') & ~cols['nombre'].str.lower().str.startswith('unnamed')
+
+        # Nullable
+        nullable = cols['nullable'].str.lower().isin(_VALORES_NOT_NULL) & cols['hay_nullable']
+        nullable = nullable.map({True: "NOT NULL", False: ""})
+
+        # Default (funciones conocidas sin comillas)
+        d = cols['default']
+        hay_default = cols['hay_default'] & d.ne('') & ~d.str.lower().isin({'null', 'none', 'nan'})
+        es_funcion = (d.str.contains('(', regex=False) | d.str.contains(')', regex=False)
+                      | d.str.upper().isin({'CURRENT_TIMESTAMP', 'NOW()', 'UUID()'}))
+        default_val = ("DEFAULT " + d).where(es_funcion, "DEFAULT '" + d + "'").where(hay_default, "")
+
+        # Comentario inline
+        c = cols['comentario']
+        hay_comentario = cols['hay_comentario'] & c.ne('') & ~c.str.lower().isin({'comentario de campo', 'nan'})
+        comentario = ("COMMENT '" + c + "'").where(hay_comentario, "")
+
+        lineas = ("    " + cols['nombre'] + " " + cols['tipo'] + " " + nullable + " "
+                  + default_val + " " + comentario).str.strip()
+        columnas_sql = lineas[validas].tolist()
+
+        # PK
+        es_pk = validas & cols['hay_primaria'] & cols['primaria'].str.lower().isin(_VALORES_SI)
+        claves_primarias = cols['nombre'][es_pk].tolist()
+
+        # FK
+        es_fk = (validas & cols['hay_foranea'] & cols['foranea'].str.lower().isin(_VALORES_SI)
+                 & cols['hay_referencia'] & cols['referencia'].ne(''))
+        claves_foraneas = list(zip(cols['nombre'][es_fk].tolist(), cols['referencia'][es_fk].tolist()))
+
+    # Definicion de columnas
+    elementos = columnas_sql or ["    -- No se encontraron definiciones de columnas validas"]
+
+    # Constraints PK
+    if claves_primarias:
+        pk_constraint = dialecto.primary_key(claves_primarias, f"pk_{nombre_tabla}")
+        elementos.append(f"    {pk_constraint}")
+
+    # FK
+    for col_fk, tabla_ref in claves_foraneas:
+        fk_constraint = dialecto.foreign_key(col_fk, f"{tabla_ref}(id)")
+        elementos.append(f"    CONSTRAINT fk_{col_fk} {fk_constraint}\n"
+                         f"        ON UPDATE NO ACTION\n"
+                         f"        ON DELETE NO ACTION")
+
+    sql.definicion(dialecto.create_table(esquema, nombre_tabla), elementos).linea()
+
+    # Comentario de tabla
+    if comentario_tabla:
+        sql.sentencia(dialecto.comment_table(esquema, nombre_tabla, comentario_tabla))
+
+    return sql.render(), [tabla_ref for _, tabla_ref in claves_foraneas]
+
+
+def _definir_modificar_tabla(bloque, nombre_tabla, esquema, dialecto):
+    """ALTER TABLE de un BloqueTabla de la plantilla con columna 'Accion'"""
+    sql = SqlScriptBuilder(dialecto)
+    df, fila_headers, columnas_headers = bloque.df, bloque.fila_headers, bloque.columnas_headers
+    sql.seccion(f"Modificaciones para tabla: {esquema}.{nombre_tabla}")
+
+    if fila_headers is not None and 'nombre_columna' in columnas_headers:
+        cols = _extraer_columnas_tabla(df, fila_headers, columnas_headers, dialecto)
+
+        validas = cols['hay_nombre'] & cols['nombre'].ne('')
+        # Accion ('ADD' si no hay columna o celda vacia)
+        acciones = cols['accion'].str.upper().where(cols['hay_accion'], 'ADD')
+
+        filas = zip(cols['nombre'][validas].tolist(), acciones[validas].tolist(), cols['tipo'][validas].tolist())
+        alter_table = dialecto.alter_table(esquema, nombre_tabla)
+        for nombre_col, accion, tipo_dato in filas:
+            # Generar SQL segun la accion usando sintaxis del motor
+            if accion in ['ADD', 'AGREGAR']:
+                add_col = dialecto.add_column(nombre_col, tipo_dato)
+                sql.sentencia(f"{alter_table} {add_col};")
+            elif accion in ['DROP', 'ELIMINAR', 'DELETE']:
+                drop_col = dialecto.drop_column(nombre_col)
+                sql.sentencia(f"{alter_table} {drop_col};")
+            elif accion in ['MODIFY', 'MODIFICAR', 'ALTER']:
+                modify_col = dialecto.modify_column(nombre_col, tipo_dato)
+                sql.sentencia(f"{alter_table} {modify_col};")
+            else:
+                sql.comentario(f"Accion desconocida '{accion}' para columna {nombre_col}")
+
+    return sql.render(), []
+
+
+def definir_tablas(bloques, tipo_solicitud, base_datos, dialecto):
+    """
+    Genera la DefinicionTabla de cada bloque (ver bloques_tabla), en el orden
+    del libro. Corre en serie: el trabajo por tabla es pandas atado al GIL (un
+    pool de hilos no acelera) y los scripts ya se generan en paralelo, uno por
+    proceso, en procesar_generaciones y generar_scripts_pendientes.
+    """
+    varias = len(bloques) > 1
+    tablas = []
+    for bloque in bloques:
+        nombre_tabla, esquema, comentario_tabla = _metadatos_tabla(bloque.df)
+        if not nombre_tabla:
+            if varias and bloque.hoja:
+                # Una tabla por hoja: la hoja lleva el nombre de la tabla
+                nombre_tabla = bloque.hoja.strip()
+            else:
+                nombre_tabla = f"tabla_{base_datos.lower().replace(' ', '_')}"
+        if tipo_solicitud == 'crear_tabla':
+            script, referencias = _definir_crear_tabla(bloque, nombre_tabla, esquema, comentario_tabla, dialecto)
+        else:
+            script, referencias = _definir_modificar_tabla(bloque, nombre_tabla, esquema, dialecto)
+        tablas.append(DefinicionTabla(esquema, nombre_tabla, script, referencias))
+    return tablas
+
+
+def _clave_tabla(referencia):
+    """Referencia de FK normalizada: sin '(columna)', comillas ni mayusculas"""
+    texto = re.sub(r'\(.*\)\s*$', '', str(referencia))
+    return re.sub(r'["`\[\]]', '', texto).strip().lower()
+
+
+def ordenar_por_dependencias(tablas):
+    """
+    Ordena las DefinicionTabla para que cada tabla quede despues de las que
+    referencia por FK (orden topologico de Kahn, estable respecto del libro).
+    Las referencias a tablas que no estan en el libro se ignoran. Las que no
+    se pueden ordenar (las de un ciclo y las que dependen de ellas) van al
+    final en su orden original. Retorna (ordenadas, ciclicas), donde
+    `ciclicas` son solo las tablas que forman parte de un ciclo.
+    """
+    por_nombre = {}
+    for idx, tabla in enumerate(tablas):
+        por_nombre.setdefault(f"{tabla.esquema}.{tabla.nombre}".lower(), idx)
+        por_nombre.setdefault(tabla.nombre.lower(), idx)
+
+    dependientes = [[] for _ in tablas]
+    pendientes = [0] * len(tablas)
+    for idx, tabla in enumerate(tablas):
+        for referencia in {por_nombre.get(_clave_tabla(ref)) for ref in tabla.referencias}:
+            if referencia is not None and referencia != idx:
+                dependientes[referencia].append(idx)
+                pendientes[idx] += 1
+
+    listas = [idx for idx, cantidad in enumerate(pendientes) if cantidad == 0]
+    heapq.heapify(listas)
+    orden = []
+    while listas:
+        idx = heapq.heappop(listas)
+        orden.append(idx)
+        for dependiente in dependientes[idx]:
+            pendientes[dependiente] -= 1
+            if pendientes[dependiente] == 0:
+                heapq.heappush(listas, dependiente)
+
+    ubicadas = set(orden)
+    sin_orden = [idx for idx in range(len(tablas)) if idx not in ubicadas]
+    ciclicas = [tablas[idx] for idx in sin_orden if idx in _alcanzables(idx, dependientes)]
+    return [tablas[idx] for idx in orden + sin_orden], ciclicas
+
+
+def _alcanzables(origen, dependientes):
+    """Indices a los que se llega desde `origen` siguiendo `dependientes` (sin contar el origen)"""
+    vistos = set()
+    pila = [origen]
+    while pila:
+        for siguiente in dependientes[pila.pop()]:
+            if siguiente not in vistos:
+                vistos.add(siguiente)
+                pila.append(siguiente)
+    return vistos
+
+
+def iterar_script_tabla(df, tipo_solicitud, base_datos, motor_bd='postgresql'):
+    """
+    Genera por partes el script SQL para creacion o modificacion de tablas:
+    cada yield es una tanda de sentencias armada con SqlScriptBuilder.
+    `df` es la hoja (DataFrame) o todas las hojas del libro ({nombre: DataFrame}):
+    cada hoja puede traer una tabla o varios bloques 'nombre tabla' (ver
+    bloques_tabla). En crear_tabla las tablas se ordenan por sus llaves foraneas.
     ACTUALIZADO: Maneja 'Accion' y 'Tamano' de la nueva estructura.
     Soporta multiples motores: postgresql, mysql, sqlserver, oracle, sqlite
     """
-    try:
-        script = get_encabezado_script(motor_bd)
-        script += f"-- Tipo: {tipo_solicitud}\n"
-        script += f"-- Base de datos: {base_datos}\n"
-        script += f"-- Motor: {motor_bd.upper()}\n"
-        script += f"-- Fecha: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-
-        # Detectar nombre de tabla, esquema y comentario en primeras filas
-        nombre_tabla = None
-        comentario_tabla = None
-        esquema = "public"  # default
-
-        for i in range(min(6, len(df))):
-            for j in range(len(df.columns)):
-                valor = df.iloc[i, j]
-                if pd.isna(valor):
-                    continue
-                v = str(valor).strip().lower()
-                
-                if v in {'nombre tabla', 'nombre_tabla'}:
-                    # siguiente celda (derecha) o siguiente fila misma columna
-                    if j + 1 < len(df.columns) and pd.notna(df.iloc[i, j+1]):
-                        nombre_tabla = str(df.iloc[i, j+1]).strip()
-                    elif i + 1 < len(df) and pd.notna(df.iloc[i+1, j]):
-                        nombre_tabla = str(df.iloc[i+1, j]).strip()
-                elif v in {'esquema', 'schema'}:
-                    if j + 1 < len(df.columns) and pd.notna(df.iloc[i, j+1]):
-                        esquema = str(df.iloc[i, j+1]).strip() or esquema
-                    elif i + 1 < len(df) and pd.notna(df.iloc[i+1, j]):
-                        esquema = str(df.iloc[i+1, j]).strip() or esquema
-                elif 'comentario' in v:
-                    if j + 1 < len(df.columns) and pd.notna(df.iloc[i, j+1]):
-                        comentario_tabla = str(df.iloc[i, j+1]).strip()
-                    elif i + 1 < len(df) and pd.notna(df.iloc[i+1, j]):
-                        comentario_tabla = str(df.iloc[i+1, j]).strip()
+    dialecto = get_dialecto(motor_bd)
+    sql = SqlScriptBuilder(dialecto)
+    sql.encabezado(
+        ('Tipo', tipo_solicitud),
+        ('Base de datos', base_datos),
+        ('Motor', motor_bd.upper()),
+        ('Fecha', pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')),
+    )
+    if tipo_solicitud not in ('crear_tabla', 'modificar_tabla'):
+        yield from sql.vaciar()
+        return
 
-        if not nombre_tabla:
-            nombre_tabla = f"tabla_{base_datos.lower().replace(' ', '_')}"
+    bloques = bloques_tabla(df)
+    if not bloques:
+        # Sin fila de headers: la primera hoja como una sola tabla (sin columnas validas)
+        primera = df if isinstance(df, pd.DataFrame) else next(iter(df.values()), pd.DataFrame())
+        bloques = [BloqueTabla(None, primera, None, {})]
 
-        # Encontrar headers
-        fila_headers, columnas_headers = encontrar_headers_en_contenido(df)
+    tablas = definir_tablas(bloques, tipo_solicitud, base_datos, dialecto)
 
+    sql.sentencia(dialecto.use_db(base_datos), fin_lote=True).linea()
+    if len(tablas) > 1:
         if tipo_solicitud == 'crear_tabla':
-            script += get_sintaxis_use_db(base_datos, motor_bd) + "\n\n"
-            script += f"-- Tabla: {esquema}.{nombre_tabla}\n"
-            if comentario_tabla:
-                script += f"-- Comentario: {comentario_tabla}\n"
-            script += get_sintaxis_create_table(esquema, nombre_tabla, motor_bd) + " (\n"
-
-            columnas_sql = []
-            claves_primarias = []
-            claves_foraneas = []  # (col, tabla_ref)
-
-            if fila_headers is not None and 'nombre_columna' in columnas_headers:
-                inicio_datos = fila_headers + 1
-                for i in range(inicio_datos, len(df)):
-                    # Nombre columna
-                    val_nombre = df.iloc[i, columnas_headers['nombre_columna']]
-                    if pd.isna(val_nombre):
-                        continue
-                    nombre_col = str(val_nombre).strip()
-                    if not nombre_col or nombre_col.lower().startswith('unnamed'):
-                        continue
-
-                    # Tipo
-                    tipo_dato = 'varchar'
-                    if 'tipo_dato' in columnas_headers:
-                        tv = df.iloc[i, columnas_headers['tipo_dato']]
-                        if pd.notna(tv):
-                            tipo_dato = str(tv).strip() or 'varchar'
-
-                    # Tamano
-                    tamano_valor = None
-                    if 'tamano' in columnas_headers:
-                        tv = df.iloc[i, columnas_headers['tamano']]
-                        if pd.notna(tv):
-                            tamano_valor = tv
-                    
-                    tamano_str = _parse_tamano(tamano_valor)
-                    tipo_dato = _tipo_con_tamano(tipo_dato, tamano_str)
-                    
-                    # Convertir tipo de dato segun el motor
-                    tipo_dato = get_tipo_dato_por_motor(tipo_dato, motor_bd)
-
-                    # Nullable
-                    nullable = ""
-                    if 'nullable' in columnas_headers:
-                        nv = df.iloc[i, columnas_headers['nullable']]
-                        if pd.notna(nv) and str(nv).strip().lower() in {'no', 'false', '0', 'n'}:
-                            nullable = "NOT NULL"
-
-                    # Default
-                    default_val = ""
-                    if 'default' in columnas_headers:
-                        dv = df.iloc[i, columnas_headers['default']]
-                        if pd.notna(dv):
-                            d = str(dv).strip()
-                            if d and d.lower() not in {'null', 'none', 'nan'}:
-                                # funciones conocidas sin comillas
-                                if '(' in d or ')' in d or d.upper() in {'CURRENT_TIMESTAMP', 'NOW()', 'UUID()'}:
-                                    default_val = f"DEFAULT {d}"
-                                else:
-                                    default_val = f"DEFAULT '{d}'"
-
-                    # Comentario inline
-                    comentario = ""
-                    if 'comentario' in columnas_headers:
-                        cv = df.iloc[i, columnas_headers['comentario']]
-                        if pd.notna(cv):
-                            c = str(cv).strip()
-                            if c and c.lower() not in {'comentario de campo', 'nan'}:
-                                comentario = f"COMMENT '{c}'"
-
-                    columnas_sql.append(
-                        f"    {nombre_col} {tipo_dato} {nullable} {default_val} {comentario}".strip()
-                    )
-
-                    # PK
-                    
-                    if 'primaria' in columnas_headers:
-                        pv = df.iloc[i, columnas_headers['primaria']]
-                        if pd.notna(pv) and str(pv).strip().lower() in {'si', 'si', 'yes', '1', 'true', 'y'}:
-                            
-                            claves_primarias.append(nombre_col)
-
-                    # FK
-                    if 'foranea' in columnas_headers:
-                        fv = df.iloc[i, columnas_headers['foranea']]
-                        if pd.notna(fv) and str(fv).strip().lower() in {'si', 'si', 'yes', '1', 'true', 'y'}:
-                            tabla_ref = None
-                            if 'referencia' in columnas_headers:
-                                rv = df.iloc[i, columnas_headers['referencia']]
-                                if pd.notna(rv):
-                                    tabla_ref = str(rv).strip()
-                            if tabla_ref:
-                                claves_foraneas.append((nombre_col, tabla_ref))
-
-            # Cerrar definicion de columnas
-            if columnas_sql:
-                script += ",\n".join(columnas_sql)
-            else:
-                script += "    -- No se encontraron definiciones de columnas validas"
-
-            # Constraints PK
-            if claves_primarias:
-                pk_constraint = get_sintaxis_primary_key(claves_primarias, f"pk_{nombre_tabla}", motor_bd)
-                script += f",\n    {pk_constraint}"
-
-            # FK
-            for col_fk, tabla_ref in claves_foraneas:
-                fk_constraint = get_sintaxis_foreign_key(col_fk, f"{tabla_ref}(id)", motor_bd)
-                script += f",\n    CONSTRAINT fk_{col_fk} {fk_constraint}\n"
-                script += f"        ON UPDATE NO ACTION\n"
-                script += f"        ON DELETE NO ACTION"
-
-            script += "\n);\n\n"
-
-            # Comentario de tabla
-            if comentario_tabla:
-                script += get_sintaxis_comment_table(esquema, nombre_tabla, comentario_tabla, motor_bd) + "\n"
-
-        elif tipo_solicitud == 'modificar_tabla':
-            # Manejo de modificaciones con columna 'Accion'
-            script += get_sintaxis_use_db(base_datos, motor_bd) + "\n\n"
-            script += f"-- Modificaciones para tabla: {esquema}.{nombre_tabla}\n\n"
-
-            if fila_headers is not None and 'nombre_columna' in columnas_headers:
-                inicio_datos = fila_headers + 1
-                for i in range(inicio_datos, len(df)):
-                    # Nombre columna
-                    val_nombre = df.iloc[i, columnas_headers['nombre_columna']]
-                    if pd.isna(val_nombre):
-                        continue
-                    nombre_col = str(val_nombre).strip()
-                    if not nombre_col:
-                        continue
-
-                    # Accion
-                    accion = 'ADD'  # default
-                    if 'accion' in columnas_headers:
-                        av = df.iloc[i, columnas_headers['accion']]
-                        if pd.notna(av):
-                            accion = str(av).strip().upper()
-
-                    # Tipo
-                    tipo_dato = 'varchar'
-                    if 'tipo_dato' in columnas_headers:
-                        tv = df.iloc[i, columnas_headers['tipo_dato']]
-                        if pd.notna(tv):
-                            tipo_dato = str(tv).strip() or 'varchar'
-
-                    # Tamano
-                    tamano_valor = None
-                    if 'tamano' in columnas_headers:
-                        tv = df.iloc[i, columnas_headers['tamano']]
-                        if pd.notna(tv):
-                            tamano_valor = tv
-                    
-                    tamano_str = _parse_tamano(tamano_valor)
-                    tipo_dato = _tipo_con_tamano(tipo_dato, tamano_str)
-                    
-                    # Convertir tipo de dato segun el motor
-                    tipo_dato = get_tipo_dato_por_motor(tipo_dato, motor_bd)
-
-                    # Generar SQL segun la accion usando sintaxis del motor
-                    alter_table = get_sintaxis_alter_table(esquema, nombre_tabla, motor_bd)
-                    
-                    if accion in ['ADD', 'AGREGAR']:
-                        add_col = get_sintaxis_add_column(nombre_col, tipo_dato, motor_bd)
-                        script += f"{alter_table} {add_col};\n"
-                    elif accion in ['DROP', 'ELIMINAR', 'DELETE']:
-                        drop_col = get_sintaxis_drop_column(nombre_col, motor_bd)
-                        script += f"{alter_table} {drop_col};\n"
-                    elif accion in ['MODIFY', 'MODIFICAR', 'ALTER']:
-                        modify_col = get_sintaxis_modify_column(nombre_col, tipo_dato, motor_bd)
-                        script += f"{alter_table} {modify_col};\n"
-                    else:
-                        script += f"-- Accion desconocida '{accion}' para columna {nombre_col}\n"
+            tablas, ciclicas = ordenar_por_dependencias(tablas)
+            sql.comentario(f"Tablas: {len(tablas)} (ordenadas por dependencias de llaves foraneas)")
+            if ciclicas:
+                sql.comentario("Dependencias circulares entre: "
+                               + ", ".join(f"{tabla.esquema}.{tabla.nombre}" for tabla in ciclicas))
+        else:
+            sql.comentario(f"Tablas: {len(tablas)}")
+        sql.linea()
 
-        return script
+    for i, tabla in enumerate(tablas):
+        if i and not tablas[i - 1].script.endswith("\n\n"):
+            sql.linea()
+        sql.agregar(tabla.script)
+        yield from sql.vaciar()
 
+
+def generar_script_tabla(df, tipo_solicitud, base_datos, motor_bd='postgresql'):
+    """
+    Genera script SQL para creacion o modificacion de tablas (texto completo).
+    """
+    try:
+        return ''.join(iterar_script_tabla(df, tipo_solicitud, base_datos, motor_bd))
     except Exception as e:
         print(f"ERROR generando script de tabla: {e}")
         import traceback
         traceback.print_exc()
         return f"-- Error generando script de tabla: {str(e)}\n-- Verifique que el archivo tenga la estructura correcta"
 
-def generar_script_permisos_usuarios(ruta_archivo, motor_bd='postgresql'):
+
+class AgrupadorGrants:
+    """
+    Junta los permisos de la hoja antes de escribir los GRANT, para no emitir
+    una sentencia por fila:
+
+      - filas repetidas de una misma tabla se unen en un solo conjunto de permisos
+      - una fila con Nombre Tabla '*' da el GRANT sobre todo el esquema (si el
+        motor lo soporta) y cubre esos permisos en las tablas de ese esquema
+      - las tablas de un esquema con el mismo conjunto de permisos van en una
+        sola sentencia cuando el motor acepta varios objetos (GRANT_MAX_OBJETOS)
+
+    La memoria queda acotada: se guardan a lo sumo MAX_TABLAS tablas distintas
+    (mas una mascara por esquema). Al llegar al limite (`lleno`) se emiten con
+    sentencias() y se sigue juntando; cada tanda se agrupa por separado.
+    """
+    PERMISOS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+    MAX_TABLAS = 10000
+
+    def __init__(self, dialecto, nombre_usuario):
+        self.dialecto = dialecto
+        self.nombre_usuario = nombre_usuario
+        self.filas = 0
+        self.sentencias_emitidas = 0
+        # Conjuntos de permisos como mascara de bits sobre PERMISOS
+        self._por_tabla = {}
+        self._por_esquema = {}
+        self._esquemas_emitidos = {}
+
+    def agregar(self, esquema, tabla, mascara):
+        """Permisos de una fila; `mascara` tiene el bit i encendido por cada PERMISOS[i]"""
+        self.filas += 1
+        if tabla == '*' and self.dialecto.GRANT_ESQUEMA is not None:
+            self._por_esquema[esquema] = self._por_esquema.get(esquema, 0) | mascara
+        else:
+            self._por_tabla[esquema, tabla] = self._por_tabla.get((esquema, tabla), 0) | mascara
+
+    @property
+    def lleno(self):
+        return len(self._por_tabla) >= self.MAX_TABLAS
+
+    def _texto(self, mascara):
+        return ", ".join(permiso for bit, permiso in enumerate(self.PERMISOS) if mascara & (1 << bit))
+
+    def sentencias(self):
+        """
+        GRANT de lo juntado desde la llamada anterior: esquemas completos (solo
+        los permisos nuevos) y luego por grupo (esquema, permisos), en orden de
+        aparicion. Libera las tablas ya emitidas.
+        """
+        for esquema, mascara in self._por_esquema.items():
+            nuevos = mascara & ~self._esquemas_emitidos.get(esquema, 0)
+            if nuevos:
+                self._esquemas_emitidos[esquema] = mascara
+                self.sentencias_emitidas += 1
+                yield self.dialecto.grant_esquema(self._texto(nuevos), esquema, self.nombre_usuario)
+
+        grupos = {}
+        for (esquema, tabla), mascara in self._por_tabla.items():
+            mascara &= ~self._por_esquema.get(esquema, 0)
+            if mascara:
+                grupos.setdefault((esquema, mascara), []).append(tabla)
+        self._por_tabla = {}
+        for (esquema, mascara), tablas in grupos.items():
+            for sentencia in self.dialecto.grants(self._texto(mascara), esquema, tablas, self.nombre_usuario):
+                self.sentencias_emitidas += 1
+                yield sentencia
+
+    @property
+    def ahorradas(self):
+        return self.filas - self.sentencias_emitidas
+
+
+def _celda(fila, columna):
+    """Valor de la columna en una fila de iter_rows, como lo veria pandas"""
+    return _valor_como_pandas(fila[columna] if columna < len(fila) else None)
+
+
+def iterar_script_permisos_usuarios(archivo, motor_bd='postgresql'):
     """
-    Genera script SQL para permisos y usuarios.
+    Genera por partes el script SQL para permisos y usuarios: las sentencias
+    (CREATE USER / GRANT) se entregan por tandas armadas con SqlScriptBuilder.
+    Recibe la ruta del archivo o un ParsedWorkbook ya leido.
+
+    Con una ruta la hoja se recorre en streaming (iter_rows de openpyxl en modo
+    solo lectura), sin armar la grilla ni un DataFrame: de cada fila solo se
+    guardan esquema, tabla y permisos para agruparlos, hasta
+    AgrupadorGrants.MAX_TABLAS tablas por tanda de GRANT.
     Soporta multiples motores: postgresql, mysql, sqlserver, oracle, sqlite
     """
-    # Leer archivo sin header para analizar filas
-    df_original = pd.read_excel(ruta_archivo, header=None)
-    
-    # Buscar fila con cabecera "Esquema"
-    header_row_index = None
-    for idx, row in df_original.iterrows():
-        if isinstance(row.iloc[0], str) and row.iloc[0].strip().lower() == 'esquema':
-            header_row_index = idx
+    filas = iter(archivo.filas if isinstance(archivo, ParsedWorkbook) else iterar_filas_excel(archivo))
+
+    # Filas previas (metadatos) hasta la cabecera "Esquema"
+    previas = []
+    for fila in filas:
+        primera = fila[0] if fila else None
+        if isinstance(primera, str) and primera.strip().lower() == 'esquema':
+            cabecera = fila
             break
-    if header_row_index is None:
+        previas.append(fila)
+    else:
         raise ValueError("No se encontro la fila con la cabecera 'Esquema'")
-    
-    # Leer nuevamente con la fila cabecera detectada
-    df = pd.read_excel(ruta_archivo, skiprows=header_row_index, header=0)
-    
+
     # Validar columnas
     columnas_esperadas = ['Esquema', 'Nombre Tabla', 'Select', 'Insert', 'Update', 'Delete']
+    indices = {}
+    for idx, nombre in enumerate(cabecera):
+        indices.setdefault(nombre, idx)
     for col in columnas_esperadas:
-        if col not in df.columns:
+        if col not in indices:
             raise ValueError(f"Falta columna esperada: {col}")
-    
+    col_esquema, col_tabla, *cols_permisos = (indices[col] for col in columnas_esperadas)
+
     # Leer "Nombre Usuario" y "Es usuario Nuevo" de filas antes de la cabecera
+    metadatos = (previas + [cabecera])[:3]
+    metadatos += [()] * (3 - len(metadatos))
     nombre_usuario = None
-    es_usuario_nuevo = str(df_original.iloc[2,1]).strip().lower()
+    es_usuario_nuevo = str(_celda(metadatos[2], 1)).strip().lower()
     
     # Intentar obtener datos
     try:
-        if 'Nombre Usuario' in df_original.iloc[0, 0]:
-            nombre_usuario = str(df_original.iloc[0,1]).strip()
-        if 'Es usuario Nuevo' in df_original.iloc[1, 0]:
-            es_usuario_nuevo = str(df_original.iloc[2,1]).strip().lower()
-            print(f"DEBUG: es_usuario_nuevo: {es_usuario_nuevo}")
+        if 'Nombre Usuario' in _celda(metadatos[0], 0):
+            nombre_usuario = str(_celda(metadatos[0], 1)).strip()
+        if 'Es usuario Nuevo' in _celda(metadatos[1], 0):
+            es_usuario_nuevo = str(_celda(metadatos[2], 1)).strip().lower()
             if es_usuario_nuevo not in ['si', 'no']:
                 raise ValueError("El valor de 'Es usuario Nuevo' debe ser 'Si' o 'No'")
     except Exception:
         pass
-    print(f"DEBUG: es_usuario_nuevo: {es_usuario_nuevo}")
     if not nombre_usuario:
         raise ValueError("No se encontro el nombre de usuario en el archivo")
     if es_usuario_nuevo not in ['si', 'no']:
         raise ValueError("El valor de 'Es usuario Nuevo' debe ser 'Si' o 'NO'")
     
     # Generar scripts con encabezado del motor
-    scripts = []
-    scripts.append(get_encabezado_script(motor_bd))
-    scripts.append(f"-- Tipo: Permisos/Usuarios")
-    scripts.append(f"-- Motor: {motor_bd.upper()}")
-    scripts.append(f"-- Usuario: {nombre_usuario}")
-    scripts.append(f"-- Fecha: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    dialecto = get_dialecto(motor_bd)
+    sql = SqlScriptBuilder(dialecto)
+    sql.encabezado(
+        ('Tipo', 'Permisos/Usuarios'),
+        ('Motor', motor_bd.upper()),
+        ('Usuario', nombre_usuario),
+        ('Fecha', pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')),
+    )
     
     if es_usuario_nuevo == 'si':
         # Script para crear usuario segun motor
-        scripts.append(get_sintaxis_create_user(nombre_usuario, motor_bd))
+        sql.sentencia(dialecto.create_user(nombre_usuario), fin_lote=True)
     
-    # Asignar permisos segun filas
-    for idx, row in df.iterrows():
-        esquema = row['Esquema']
-        tabla = row['Nombre Tabla']
-        permisos = []
-        if str(row['Select']).strip().lower() == 'si':
-            permisos.append('SELECT')
-        if str(row['Insert']).strip().lower() == 'si':
-            permisos.append('INSERT')
-        if str(row['Update']).strip().lower() == 'si':
-            permisos.append('UPDATE')
-        if str(row['Delete']).strip().lower() == 'si':
-            permisos.append('DELETE')
-        
-        if permisos:
-            permisos_str = ", ".join(permisos)
-            scripts.append(get_sintaxis_grant(permisos_str, esquema, tabla, nombre_usuario, motor_bd))
-    
-    # Retornar script completo
-    return "\n".join(scripts)
+    # Juntar los permisos de las filas a medida que se leen; en hojas grandes
+    # los GRANT salen por tandas de AgrupadorGrants.MAX_TABLAS tablas
+    agrupador = AgrupadorGrants(dialecto, nombre_usuario)
+    for fila in filas:
+        mascara = 0
+        for bit, columna in enumerate(cols_permisos):
+            if columna < len(fila) and isinstance(fila[columna], str) and fila[columna].strip().lower() == 'si':
+                mascara |= 1 << bit
+        if mascara:
+            agrupador.agregar(_celda(fila, col_esquema), _celda(fila, col_tabla), mascara)
+            if agrupador.lleno:
+                for sentencia in agrupador.sentencias():
+                    sql.sentencia(sentencia, fin_lote=True)
+                yield from sql.vaciar(SqlScriptBuilder.TANDA)
+
+    for sentencia in agrupador.sentencias():
+        sql.sentencia(sentencia, fin_lote=True)
+        yield from sql.vaciar(SqlScriptBuilder.TANDA)
+
+    if agrupador.filas:
+        sql.linea()
+        sql.comentario(f"GRANT: {agrupador.filas} filas con permisos -> {agrupador.sentencias_emitidas} "
+                       f"sentencias ({agrupador.ahorradas} ahorradas)")
+        logger.info("Permisos de %s: %s filas -> %s sentencias GRANT", nombre_usuario,
+                    agrupador.filas, agrupador.sentencias_emitidas)
+    yield from sql.vaciar()
+
+
+def generar_script_permisos_usuarios(archivo, motor_bd='postgresql'):
+    """
+    Genera script SQL para permisos y usuarios (texto completo).
+    Lanza ValueError si el archivo no tiene la estructura esperada.
+    """
+    return ''.join(iterar_script_permisos_usuarios(archivo, motor_bd))
 
 
-def generar_script_bd_esquemas(df, tipo_solicitud, base_datos, motor_bd='postgresql'):
+def iterar_script_bd_esquemas(df, tipo_solicitud, base_datos, motor_bd='postgresql'):
     """
-    Genera script SQL para creacion de bases de datos y esquemas
+    Genera por partes el script SQL para creacion de bases de datos y esquemas
     Soporta multiples motores: postgresql, mysql, sqlserver, oracle, sqlite
     """
+    # Encabezado del script
+    dialecto = get_dialecto(motor_bd)
+    sql = SqlScriptBuilder(dialecto)
+    sql.encabezado(
+        ('Tipo', tipo_solicitud),
+        ('Aplicacion', base_datos),
+        ('Motor', motor_bd.upper()),
+        ('Fecha', pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')),
+    )
 
-    try:
-        # Encabezado del script
-        script = get_encabezado_script(motor_bd)
-        script += f"-- Tipo: {tipo_solicitud}\n"
-        script += f"-- Aplicacion: {base_datos}\n"
-        script += f"-- Motor: {motor_bd.upper()}\n"
-        script += f"-- Fecha: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-
-        # ===========================================
-        # CASO: CREACION DE BASES DE DATOS
-        # ===========================================
-        if tipo_solicitud == 'crear_bd':
+    # ===========================================
+    # CASO: CREACION DE BASES DE DATOS
+    # ===========================================
+    if tipo_solicitud == 'crear_bd':
 
-            # Detectar columnas que comienzan con texto tipo "Plantilla ..."
-            if df.columns[0].startswith("Plantilla"):
-                df.columns = ['Nombre BD', 'Charset', 'Collation']
-                df = df.dropna(how='all')  # quitar filas completamente vacias
+        # Detectar columnas que comienzan con texto tipo "Plantilla ..."
+        if df.columns[0].startswith("Plantilla"):
+            df.columns = ['Nombre BD', 'Charset', 'Collation']
+            df = df.dropna(how='all')  # quitar filas completamente vacias
 
-            for index, row in df.iterrows():
+        for index, row in df.iterrows():
 
-                nombre_bd = row.get('Nombre BD')
-                if not nombre_bd or pd.isna(nombre_bd) or index < 1:
-                    print(f" -> Fila {index} ignorada (vacia o invalida)")
-                    continue
+            nombre_bd = row.get('Nombre BD')
+            if not nombre_bd or pd.isna(nombre_bd) or index < 1:
+                continue
 
-                charset = row.get('Charset', 'utf8mb4')
-                collation = row.get('Collation', 'utf8mb4_unicode_ci')
+            charset = row.get('Charset', 'utf8mb4')
+            collation = row.get('Collation', 'utf8mb4_unicode_ci')
 
-                script += get_sintaxis_create_database(nombre_bd, charset, collation, motor_bd) + "\n"
+            sql.sentencia(dialecto.create_database(nombre_bd, charset, collation), fin_lote=True)
+            yield from sql.vaciar(SqlScriptBuilder.TANDA)
 
-        # ===========================================
-        # CASO: CREACION DE ESQUEMAS
-        # ===========================================
-        elif tipo_solicitud == 'crear_esquemas':
-            print(f"ANTES FOR RECORRE ROW: {tipo_solicitud}")
+    # ===========================================
+    # CASO: CREACION DE ESQUEMAS
+    # ===========================================
+    elif tipo_solicitud == 'crear_esquemas':
 
-             # Detectar columnas que comienzan con texto tipo "Plantilla ..."
-            if df.columns[0].startswith("Plantilla"):
-                df.columns = ['Nombre Esquema', 'Propietario']
-                df = df.dropna(how='all')  # quitar filas completamente vacias
+        # Detectar columnas que comienzan con texto tipo "Plantilla ..."
+        if df.columns[0].startswith("Plantilla"):
+            df.columns = ['Nombre Esquema', 'Propietario']
+            df = df.dropna(how='all')  # quitar filas completamente vacias
 
-            for index, row in df.iterrows():
-                print(f"ENTRA AL FOR (fila {index}): {row.to_dict()}")
+        for index, row in df.iterrows():
 
-                nombre_esquema = row.get('Nombre Esquema')
-                if not nombre_esquema or pd.isna(nombre_esquema) or index < 1:
-                    print(f" -> Fila {index} ignorada (vacia o invalida)")
-                    continue
+            nombre_esquema = row.get('Nombre Esquema')
+            if not nombre_esquema or pd.isna(nombre_esquema) or index < 1:
+                continue
 
+            propietario = row.get('Propietario', 'admin')
 
-                propietario = row.get('Propietario', 'admin')
+            sql.sentencia(dialecto.create_schema(nombre_esquema, propietario), fin_lote=True)
+            yield from sql.vaciar(SqlScriptBuilder.TANDA)
 
-                script += get_sintaxis_create_schema(nombre_esquema, propietario, motor_bd) + "\n"
+    else:
+        logger.warning("Tipo de solicitud no reconocido para BD/esquemas: %s", tipo_solicitud)
 
-        else:
-            print(f"Tipo de solicitud no reconocido: {tipo_solicitud}")
+    yield from sql.vaciar()
 
-        return script
 
+def generar_script_bd_esquemas(df, tipo_solicitud, base_datos, motor_bd='postgresql'):
+    """
+    Genera script SQL para creacion de bases de datos y esquemas (texto completo)
+    """
+    try:
+        return ''.join(iterar_script_bd_esquemas(df, tipo_solicitud, base_datos, motor_bd))
     except Exception as e:
         return f"-- Error generando script de BD/esquemas: {str(e)}"
 
@@ -1111,9 +1490,86 @@ def generar_credenciales_usuario(solicitud):
     password = ''.join(secrets.choice(alphabet) for i in range(12))
     return base_username, password
 
+ResultadoEnvio = namedtuple('ResultadoEnvio', ['referencia', 'destinatarios', 'enviado', 'error'])
+
+
+class DespachadorCorreos:
+    """
+    Junta los correos generados en un request o lote y los envia todos por
+    una sola conexion (connection.send_messages), informando el resultado de
+    cada mensaje en lugar de cortar el lote con el primer error.
+
+        with DespachadorCorreos() as despachador:
+            despachador.agregar(email, referencia=correo.pk)
+        despachador.resultados  # [ResultadoEnvio, ...]
+    """
+
+    def __init__(self, connection=None):
+        self.connection = connection
+        self.resultados = []
+        self._mensajes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.enviar()
+        return False
+
+    def __len__(self):
+        return len(self._mensajes)
+
+    def agregar(self, mensaje, referencia=None):
+        self._mensajes.append((referencia, mensaje))
+
+    def enviar(self):
+        """Envia los mensajes acumulados y retorna la lista de ResultadoEnvio"""
+        mensajes, self._mensajes = self._mensajes, []
+        if not mensajes:
+            return []
+
+        connection = self.connection or get_connection()
+        resultados = []
+        try:
+            connection.open()
+        except Exception as e:
+            logger.error("No se pudo abrir la conexion de correo: %s", e)
+            resultados = [ResultadoEnvio(ref, m.recipients(), False, e) for ref, m in mensajes]
+        else:
+            try:
+                for referencia, mensaje in mensajes:
+                    try:
+                        connection.send_messages([mensaje])
+                        resultados.append(ResultadoEnvio(referencia, mensaje.recipients(), True, None))
+                    except Exception as e:
+                        logger.error("Error enviando correo '%s' a %s: %s", mensaje.subject, mensaje.recipients(), e)
+                        resultados.append(ResultadoEnvio(referencia, mensaje.recipients(), False, e))
+            finally:
+                connection.close()
+
+        self.resultados.extend(resultados)
+        return resultados
+
+
+def encolar_correo(asunto, cuerpo_html, destinatarios, solicitud=None, tipo='', adjuntos=None):
+    """
+    Deja un correo HTML en la bandeja de salida (CorreoPendiente).
+    El envio real lo hace el comando `enviar_correos`, fuera del request.
+    """
+    return CorreoPendiente.objects.create(
+        solicitud=solicitud,
+        tipo=tipo,
+        asunto=asunto,
+        cuerpo=cuerpo_html,
+        remitente=settings.DEFAULT_FROM_EMAIL,
+        destinatarios=list(destinatarios),
+        adjuntos=adjuntos or [],
+    )
+
 def enviar_correo_notificacion(solicitud, estado, comentario=""):
     """
-    Envia correo de notificacion cuando se resuelve una solicitud
+    Encola correo de notificacion cuando se resuelve una solicitud
     """
     try:
         subject = f"Solicitud #{solicitud.id} - {solicitud.get_estado_display()}"
@@ -1126,31 +1582,28 @@ def enviar_correo_notificacion(solicitud, estado, comentario=""):
         
         html_content = render_to_string('emails/notificacion_resolucion.html', context)
         
-        email = EmailMessage(
-            subject=subject,
-            body=html_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[solicitud.correo_notificacion],
-        )
-        email.content_subtype = 'html'
-        
-        if solicitud.script_sql_generado and solicitud.tipo_solicitud in ['crear_tabla', 'modificar_tabla', 'crear_bd']:
-            email.attach(
-                f'script_solicitud_{solicitud.id}.sql',
-                solicitud.script_sql_generado,
-                'text/plain'
-            )
+        adjuntos = []
+        if solicitud.tiene_script and solicitud.tipo_solicitud in ['crear_tabla', 'modificar_tabla', 'crear_bd']:
+            adjunto = {'nombre': f'script_solicitud_{solicitud.id}.sql', 'mimetype': 'text/plain'}
+            if solicitud.script_vigente_id:
+                # Referencia a la version guardada: el script no se copia en la bandeja
+                adjunto['script_id'] = solicitud.script_vigente_id
+            else:
+                # Script anterior a ScriptGenerado (ver migrar_scripts_generados)
+                adjunto['contenido'] = solicitud.script_sql
+            adjuntos.append(adjunto)
         
-        email.send()
+        encolar_correo(subject, html_content, [solicitud.correo_notificacion],
+                       solicitud=solicitud, tipo='notificacion', adjuntos=adjuntos)
         return True
         
     except Exception as e:
-        print(f"Error enviando correo de notificacion: {e}")
+        logger.error("Error encolando correo de notificacion: %s", e)
         return False
 
 def enviar_correo_credenciales(solicitud, usuario, password):
     """
-    Envia correo con las credenciales del usuario creado
+    Encola correo con las credenciales del usuario creado
     """
     try:
         subject = f"Credenciales de acceso - Usuario creado"
@@ -1163,24 +1616,16 @@ def enviar_correo_credenciales(solicitud, usuario, password):
         
         html_content = render_to_string('emails/credenciales_usuario.html', context)
         
-        email = EmailMessage(
-            subject=subject,
-            body=html_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[solicitud.correo_notificacion],
-        )
-        email.content_subtype = 'html'
-        
-        email.send()
+        encolar_correo(subject, html_content, [solicitud.correo_notificacion], solicitud=solicitud, tipo='credenciales')
         return True
         
     except Exception as e:
-        print(f"Error enviando correo de credenciales: {e}")
+        logger.error("Error encolando correo de credenciales: %s", e)
         return False
 
 def enviar_correo_aprobacion_lider(solicitud):
     """
-    Envia correo al lider de proyecto para aprobacion de creacion de usuario
+    Encola correo al lider de proyecto para aprobacion de creacion de usuario
     """
     try:
         subject = f"Aprobacion requerida - Solicitud #{solicitud.id}"
@@ -1192,24 +1637,16 @@ def enviar_correo_aprobacion_lider(solicitud):
         
         html_content = render_to_string('emails/aprobacion_lider.html', context)
         
-        email = EmailMessage(
-            subject=subject,
-            body=html_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[solicitud.lider_proyecto.email],
-        )
-        email.content_subtype = 'html'
-        
-        email.send()
+        encolar_correo(subject, html_content, [solicitud.lider_proyecto.email], solicitud=solicitud, tipo='aprobacion_lider')
         return True
         
     except Exception as e:
-        print(f"Error enviando correo de aprobacion: {e}")
+        logger.error("Error encolando correo de aprobacion: %s", e)
         return False
 
 def enviar_correo_cambio_estado(solicitud, estado_anterior, estado_nuevo, usuario_cambio, comentario=""):
     """
-    Envia correo de notificacion cuando cambia el estado de una solicitud
+    Encola correo de notificacion cuando cambia el estado de una solicitud
     """
     try:
         destinatarios = [solicitud.correo_notificacion]
@@ -1235,19 +1672,11 @@ def enviar_correo_cambio_estado(solicitud, estado_anterior, estado_nuevo, usuari
         
         html_content = render_to_string('emails/notificacion_resolucion.html', context)
         
-        email = EmailMessage(
-            subject=subject,
-            body=html_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=destinatarios,
-        )
-        email.content_subtype = 'html'
-        
-        email.send()
+        encolar_correo(subject, html_content, destinatarios, solicitud=solicitud, tipo='cambio_estado')
         return True
         
     except Exception as e:
-        print(f"Error enviando correo de cambio de estado: {e}")
+        logger.error("Error encolando correo de cambio de estado: %s", e)
         return False
 
 def generar_script_sql(solicitud):
@@ -1255,14 +1684,15 @@ def generar_script_sql(solicitud):
     Funcion principal para generar scripts SQL basados en el tipo de solicitud
     """
     if solicitud.tipo_solicitud in ['pull_request', 'despliegue']:
-        script = f"-- Solicitud de {solicitud.get_tipo_solicitud_display()}\n"
-        script += f"-- Base de datos/Aplicacion: {solicitud.base_datos_aplicacion}\n"
-        script += f"-- URL: {solicitud.url_commit}\n"
-        script += f"-- Branch: {solicitud.nombre_branch}\n"
-        script += f"-- Entorno: {solicitud.entorno}\n"
+        sql = SqlScriptBuilder()
+        sql.comentario(f"Solicitud de {solicitud.get_tipo_solicitud_display()}")
+        sql.comentario(f"Base de datos/Aplicacion: {solicitud.base_datos_aplicacion}")
+        sql.comentario(f"URL: {solicitud.url_commit}")
+        sql.comentario(f"Branch: {solicitud.nombre_branch}")
+        sql.comentario(f"Entorno: {solicitud.entorno}")
         if solicitud.ambientes_ejecucion:
-            script += f"-- Ambientes de ejecucion: {', '.join(solicitud.ambientes_ejecucion)}\n"
-        return script
+            sql.comentario(f"Ambientes de ejecucion: {', '.join(solicitud.ambientes_ejecucion)}")
+        return sql.render()
 
     if solicitud.archivo_adjunto and solicitud.tipo_archivo == 'excel':
         return procesar_archivo_excel(solicitud)
@@ -1319,8 +1749,7 @@ def _tipo_con_tamano(tipo_dato, tamano_str):
         return t
 
     base = t.lower()
-    acepta = ('character varying', 'varchar', 'character', 'char', 'numeric', 'decimal', 'nvarchar', 'varchar2')
-    if any(base.startswith(a) for a in acepta):
+    if base.startswith(TIPOS_CON_TAMANO):
         return f"{t}({tamano_str})"
     return t
 
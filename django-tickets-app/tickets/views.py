@@ -2,29 +2,41 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth import login, logout
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse, FileResponse, HttpResponseNotFound
+from django.http import HttpResponse, JsonResponse, FileResponse, HttpResponseNotFound, StreamingHttpResponse
 from django.core.paginator import Paginator
-from django.db.models import Q, Count
+from django.db.models import Q, Count, Prefetch
 from django.contrib.auth.models import User
 from django.conf import settings
-from .models import Solicitud, UserProfile, HistorialEstado, Comentario, ConfiguracionEstructuraExcel, Proyecto
+from .models import (Solicitud, UserProfile, Comentario, ConfiguracionEstructuraExcel, Proyecto, GeneracionJob,
+                     HistorialEstado)
 from .forms import (SolicitudForm, ComentarioForm, 
                    CambiarEstadoForm, EditarSolicitudForm, ValidarEstructuraForm,
                    ProyectoForm, AsignarMiembrosProyectoForm, UserProfileForm, FiltroSolicitudesForm,
                    CrearUsuarioForm)
-from .utils import (procesar_archivo_excel, generar_script_sql, validar_estructura_excel,
+from .paginacion import PaginadorCursor
+from .utils import (generar_script_sql, validar_estructura_excel,
                    enviar_correo_notificacion, enviar_correo_credenciales, 
                    enviar_correo_aprobacion_lider, enviar_correo_cambio_estado, generar_credenciales_usuario, crear_plantilla_excel)
+from django.utils import timezone
+from datetime import date, datetime, time, timedelta
 import json
 import os
 
+def _inicio_del_dia(fecha, dias=0):
+    """Inicio del día (YYYY-MM-DD) en la zona horaria actual, desplazado `dias`. None si es inválida."""
+    try:
+        dia = date.fromisoformat(fecha) + timedelta(days=dias)
+    except ValueError:
+        return None
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
 # Decorador para verificar si el usuario es admin
 def es_admin(user):
     return user.is_authenticated and hasattr(user, 'profile') and user.profile.role == 'admin'
 
 @login_required
 def dashboard(request):
-    user_profile = UserProfile.objects.get_or_create(user=request.user)[0]
+    user_profile = request.user_profile
     
     # Obtener proyectos del usuario
     if user_profile.role == 'admin':
@@ -39,19 +51,19 @@ def dashboard(request):
             solicitudes = Solicitud.objects.filter(
                 Q(usuario=request.user) | 
                 Q(tipo_solicitud__in=Solicitud.TIPOS_BD)
-            ).distinct()
+            )
         elif user_profile.role == 'devops':
             # Ver sus propias solicitudes + solicitudes DevOps de TODOS los usuarios
             solicitudes = Solicitud.objects.filter(
                 Q(usuario=request.user) | 
                 Q(tipo_solicitud__in=Solicitud.TIPOS_DEVOPS)
-            ).distinct()
+            )
         elif user_profile.role == 'lider':
             # Ver sus propias solicitudes + solicitudes que debe aprobar
             solicitudes = Solicitud.objects.filter(
                 Q(usuario=request.user) | 
                 Q(lider_proyecto=request.user)
-            ).distinct()
+            )
         else:  # dev - Solo sus propias solicitudes
             solicitudes = Solicitud.objects.filter(usuario=request.user)
     
@@ -75,24 +87,27 @@ def dashboard(request):
         solicitudes = solicitudes.filter(tipo_solicitud=tipo_solicitud)
     if estado:
         solicitudes = solicitudes.filter(estado=estado)
-    if fecha_desde:
-        solicitudes = solicitudes.filter(fecha_creacion__date__gte=fecha_desde)
-    if fecha_hasta:
-        solicitudes = solicitudes.filter(fecha_creacion__date__lte=fecha_hasta)
-    
-    # Paginación
-    paginator = Paginator(solicitudes.order_by('-fecha_creacion'), 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    # Estadísticas
-    stats = {
-        'total_solicitudes': solicitudes.count(),
-        'pendientes': solicitudes.filter(estado='registrada').count(),
-        'en_proceso': solicitudes.filter(estado__in=['revision', 'aprobada']).count(),
-        'finalizadas': solicitudes.filter(estado='finalizada').count(),
-        'total_proyectos': proyectos.count(),
-    }
+    # Rangos sobre fecha_creacion (no __date) para que usen su índice
+    desde = _inicio_del_dia(fecha_desde) if fecha_desde else None
+    hasta = _inicio_del_dia(fecha_hasta, dias=1) if fecha_hasta else None
+    if desde:
+        solicitudes = solicitudes.filter(fecha_creacion__gte=desde)
+    if hasta:
+        solicitudes = solicitudes.filter(fecha_creacion__lt=hasta)
+    
+    # Estadísticas (una sola consulta con conteos condicionales)
+    stats = solicitudes.aggregate(
+        total_solicitudes=Count('id'),
+        pendientes=Count('id', filter=Q(estado='registrada')),
+        en_proceso=Count('id', filter=Q(estado__in=['revision', 'aprobada'])),
+        finalizadas=Count('id', filter=Q(estado='finalizada')),
+    )
+    stats['total_proyectos'] = proyectos.count()
+    
+    # Paginación por cursor (sin OFFSET); reutiliza el total ya calculado
+    paginator = PaginadorCursor(solicitudes.for_listing(), 10)
+    paginator.count = stats['total_solicitudes']
+    page_obj = paginator.page(request.GET.get('cursor'), parametros=request.GET)
     
     context = {
         'page_obj': page_obj,
@@ -113,7 +128,7 @@ def dashboard(request):
 
 @login_required
 def crear_solicitud(request):
-    user_profile = UserProfile.objects.get_or_create(user=request.user)[0]
+    user_profile = request.user_profile
     
     # Verificar que el usuario tenga proyectos asignados
     proyectos_disponibles = user_profile.get_proyectos_disponibles()
@@ -147,19 +162,11 @@ def crear_solicitud(request):
             if user_profile.role == 'dev':
                 messages.success(request, 'Solicitud creada exitosamente. El script SQL será generado por el equipo de Base de Datos.')
             else:
-                # Solo admin y DB pueden generar scripts automáticamente
+                # Solo admin y DB generan scripts automáticamente (en segundo plano, ver procesar_generaciones)
                 if (solicitud.archivo_adjunto and solicitud.tipo_archivo == 'excel' and 
                     user_profile.role in ['admin', 'db']):
-                    try:
-                        script_sql = procesar_archivo_excel(solicitud)
-                        if script_sql:
-                            solicitud.script_sql_generado = script_sql
-                            solicitud.save()
-                            messages.success(request, 'Solicitud creada y script SQL generado exitosamente.')
-                        else:
-                            messages.warning(request, 'Solicitud creada, pero no se pudo generar el script SQL.')
-                    except Exception as e:
-                        messages.error(request, f'Error al procesar el archivo: {str(e)}')
+                    GeneracionJob.encolar(solicitud, request.user)
+                    messages.success(request, 'Solicitud creada. El script SQL se está generando.')
                 else:
                     messages.success(request, 'Solicitud creada exitosamente.')
             
@@ -185,7 +192,7 @@ def editar_solicitud(request, pk):
     solicitud = get_object_or_404(Solicitud, pk=pk)
     
     # Verificar permisos de edición según requerimientos
-    if not solicitud.puede_editar(request.user):
+    if not solicitud.puede_editar(request.user, request.user_profile):
         messages.error(request, 'No tienes permisos para editar esta solicitud o ya no está en estado registrada.')
         return redirect('detalle_solicitud', pk=pk)
     
@@ -202,7 +209,7 @@ def editar_solicitud(request, pk):
             
             # Si se cambió el archivo, resetear script generado para que DB lo regenere
             if 'archivo_adjunto' in form.changed_data:
-                solicitud_actualizada.script_sql_generado = None
+                solicitud_actualizada.descartar_script()
                 solicitud_actualizada.estructura_validada = False
                 solicitud_actualizada.save()
                 messages.info(request, 'Archivo actualizado. El script SQL deberá ser regenerado por el equipo de Base de Datos.')
@@ -218,20 +225,28 @@ def editar_solicitud(request, pk):
 
 @login_required
 def detalle_solicitud(request, pk):
-    solicitud = get_object_or_404(Solicitud, pk=pk)
-    user_profile = UserProfile.objects.get_or_create(user=request.user)[0]
+    solicitud = get_object_or_404(
+        Solicitud.objects.select_related('proyecto', 'usuario', 'lider_proyecto', 'script_vigente',
+                                         'ticket_referencia__script_vigente')
+        .prefetch_related(
+            Prefetch('historial', HistorialEstado.objects.select_related('usuario_cambio')),
+            Prefetch('comentarios', Comentario.objects.select_related('usuario')),
+        ),
+        pk=pk
+    )
+    user_profile = request.user_profile
     
     # Verificar permisos de visualización según requerimientos
     puede_ver = False
     if user_profile.role == 'admin':
         puede_ver = True
-    elif solicitud.usuario == request.user:
+    elif solicitud.usuario_id == request.user.pk:
         puede_ver = True
     elif user_profile.role == 'db' and solicitud.tipo_solicitud in Solicitud.TIPOS_BD:
         puede_ver = True
     elif user_profile.role == 'devops' and solicitud.tipo_solicitud in Solicitud.TIPOS_DEVOPS:
         puede_ver = True
-    elif user_profile.role == 'lider' and solicitud.lider_proyecto == request.user:
+    elif user_profile.role == 'lider' and solicitud.lider_proyecto_id == request.user.pk:
         puede_ver = True
     
     if not puede_ver:
@@ -243,7 +258,7 @@ def detalle_solicitud(request, pk):
     cambiar_estado_form = CambiarEstadoForm()
     
     # Obtener estados permitidos para este usuario
-    estados_permitidos = solicitud.estados_permitidos_para_usuario(request.user)
+    estados_permitidos = solicitud.estados_permitidos_para_usuario(request.user, user_profile)
     if estados_permitidos:
         cambiar_estado_form.fields['nuevo_estado'].choices = [
             (estado, dict(Solicitud.ESTADOS)[estado]) 
@@ -262,7 +277,7 @@ def detalle_solicitud(request, pk):
     
     # Procesar generación de script SQL (solo para DB/admin)
     if request.method == 'POST' and 'generar_sql' in request.POST:
-        if solicitud.puede_generar_script(request.user) and solicitud.archivo_adjunto:
+        if solicitud.puede_generar_script(request.user, user_profile) and solicitud.archivo_adjunto:
             
             comentario_texto = request.POST.get("comentario")
             
@@ -270,39 +285,13 @@ def detalle_solicitud(request, pk):
                 messages.error(request, "Debes ingresar un comentario antes de generar el script.")
                 return redirect("detalle_solicitud", pk=pk)
             
-            try:
-                script_sql = procesar_archivo_excel(solicitud)
-                if script_sql:
-                    solicitud.script_sql_generado = script_sql
-                    solicitud.estructura_validada = True
-
-                    # Marcar como finalizada
-                    estado_anterior  = solicitud.estado
-                    solicitud.estado = "revision"
-                    solicitud.save()
-
-                    # Guardar comentario
-                    Comentario.objects.create(
-                        solicitud = solicitud,
-                        usuario   = request.user,
-                        texto     = comentario_texto 
-                    )
-
-                    # Guardas historial de estado
-                    HistorialEstado.objects.create(
-                        solicitud       = solicitud,
-                        estado_anterior =  estado_anterior,
-                        estado_nuevo    = "revision",
-                        usuario_cambio  = request.user,
-                        comentario      = comentario_texto
-                    )
-
-                    messages.success(request, 'Script SQL generado exitosamente')
-                        
-                else:
-                    messages.error(request, 'No se pudo generar el script SQL.')
-            except Exception as e:
-                messages.error(request, f'Error al generar el script: {str(e)}')
+            # Se genera en segundo plano; al terminar se guarda el script, el
+            # comentario y la solicitud pasa a revisión
+            _, creada = GeneracionJob.encolar(solicitud, request.user, comentario_texto, pasar_a_revision=True)
+            if creada:
+                messages.info(request, 'Generación del script SQL en curso.')
+            else:
+                messages.warning(request, 'Ya hay una generación del script SQL en curso para esta solicitud.')
             return redirect('detalle_solicitud', pk=pk)
     
     # Procesar cambio de estado
@@ -318,21 +307,13 @@ def detalle_solicitud(request, pk):
                 # Validaciones especiales según requerimientos
                 print("Views.py 313")
                 if (solicitud.tipo_solicitud == 'crear_tabla' and nuevo_estado == 'finalizada' 
-                    and not solicitud.script_sql_generado):
+                    and not solicitud.tiene_script):
                     print("Views.py 316")
                     messages.error(request, 'No se puede finalizar sin generar el script SQL primero.')
                     return redirect('detalle_solicitud', pk=pk)
                 
-                # Crear historial
-                HistorialEstado.objects.create(
-                    solicitud=solicitud,
-                    estado_anterior=estado_anterior,
-                    estado_nuevo=nuevo_estado,
-                    usuario_cambio=request.user,
-                    comentario=comentario_texto
-                )
-                
-                solicitud.estado = nuevo_estado
+                # Cambiar estado (el historial se crea en la misma transacción del save)
+                solicitud.cambiar_estado(nuevo_estado, request.user, comentario_texto)
                 solicitud.save()
                 
                 # Enviar correo de cambio de estado
@@ -351,7 +332,7 @@ def detalle_solicitud(request, pk):
                         usuario_creado, password = generar_credenciales_usuario(solicitud)
                         solicitud.usuario_creado = usuario_creado
                         solicitud.password_generado = password
-                        solicitud.save()
+                        solicitud.save(update_fields=['usuario_creado', 'password_generado', 'fecha_modificacion'])
                         
                         enviar_correo_credenciales(solicitud, usuario_creado, password)
                         messages.success(request, f'Estado cambiado a {solicitud.get_estado_display()}. Usuario creado y credenciales enviadas.')
@@ -377,19 +358,15 @@ def detalle_solicitud(request, pk):
                 messages.error(request, 'No tienes permisos para cambiar a ese estado.')
     
     # Determinar qué mostrar según el rol del usuario
-    mostrar_script = solicitud.puede_ver_script(request.user)
-    puede_generar_script = solicitud.puede_generar_script(request.user)
-    puede_descargar_script = solicitud.puede_descargar_script(request.user)
-
     if solicitud.tipo_solicitud in Solicitud.TIPOS_COMPILACION:
         mostrar_script = False           # No mostrar botón ni vista del script
         puede_generar_script = False     # No permitir generar script
         # Mantener descarga si hay archivo adjunto
         puede_descargar_script = solicitud.archivo_adjunto is not None
     else:
-        mostrar_script = solicitud.puede_ver_script(request.user)
-        puede_generar_script = solicitud.puede_generar_script(request.user)
-        puede_descargar_script = solicitud.puede_descargar_script(request.user)
+        mostrar_script = solicitud.puede_ver_script(request.user, user_profile)
+        puede_generar_script = solicitud.puede_generar_script(request.user, user_profile)
+        puede_descargar_script = solicitud.puede_descargar_script(request.user, user_profile)
     
     context = {
         'solicitud': solicitud,
@@ -397,14 +374,24 @@ def detalle_solicitud(request, pk):
         'comentario_form': comentario_form,
         'cambiar_estado_form': cambiar_estado_form,
         'puede_cambiar_estado': bool(estados_permitidos),
-        'puede_editar': solicitud.puede_editar(request.user),
-        'puede_gestionar': solicitud.puede_gestionar(request.user),
+        'puede_editar': solicitud.puede_editar(request.user, user_profile),
+        'puede_gestionar': solicitud.puede_gestionar(request.user, user_profile),
         'mostrar_script': mostrar_script,
         'puede_generar_script': puede_generar_script,
         'puede_descargar_script': puede_descargar_script,
+        'generacion': solicitud.generaciones.order_by('-pk').first() if puede_generar_script else None,
     }
     return render(request, 'tickets/detalle_solicitud.html', context)
 
+@login_required
+def estado_generacion(request, pk):
+    """Estado (JSON) de la última generación de script de la solicitud; lo consulta la página de detalle"""
+    solicitud = get_object_or_404(Solicitud.objects.only('pk', 'estado', 'tipo_solicitud'), pk=pk)
+    if not solicitud.puede_generar_script(request.user, request.user_profile):
+        return JsonResponse({'error': 'Sin permisos'}, status=403)
+    generacion = GeneracionJob.objects.filter(solicitud_id=pk).order_by('-pk').first()
+    return JsonResponse({'generacion': generacion.como_dict() if generacion else None})
+
 @login_required
 def validar_estructura(request):
     """Vista para validar estructura de archivos Excel antes de generar script"""
@@ -429,27 +416,62 @@ def validar_estructura(request):
     
     return render(request, 'tickets/validar_estructura.html', {'form': form})
 
+def _acepta_gzip(request):
+    """True si el cliente acepta Content-Encoding: gzip (y no lo excluye con q=0)"""
+    for codificacion in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        nombre, _, parametros = codificacion.strip().partition(';')
+        if nombre.strip().lower() in ('gzip', '*'):
+            return parametros.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
 @login_required
 def descargar_script_sql(request, pk):
-    solicitud = get_object_or_404(Solicitud, pk=pk)
+    # El texto legado (script_sql_generado) solo se lee si no hay ScriptGenerado
+    solicitud = get_object_or_404(
+        Solicitud.objects.select_related('script_vigente').defer('script_sql_generado')
+        .annotate(script_legado=Q(script_sql_generado__gt='')),
+        pk=pk,
+    )
     
     # Verificar permisos según requerimientos (ingenieros dev NO pueden descargar)
-    if not solicitud.puede_descargar_script(request.user):
+    if not solicitud.puede_descargar_script(request.user, request.user_profile):
         messages.error(request, 'No tienes permisos para descargar este archivo.')
         return redirect('dashboard')
     
-    if not solicitud.script_sql_generado:
+    if not (solicitud.script_vigente_id or solicitud.script_legado):
+        if solicitud.se_puede_generar_al_vuelo:
+            # Sin script guardado: el Excel no se procesa en el request, se encola
+            # la generación (procesar_generaciones) y el cliente reintenta
+            GeneracionJob.encolar(solicitud, request.user)
+            response = HttpResponse('El script SQL se está generando. Intenta la descarga en unos segundos.',
+                                    status=202, content_type='text/plain; charset=utf-8')
+            response['Retry-After'] = '5'
+            return response
         messages.error(request, 'No hay script SQL generado para esta solicitud.')
         return redirect('detalle_solicitud', pk=pk)
     
-    response = HttpResponse(solicitud.script_sql_generado, content_type='text/plain')
+    script = solicitud.script_vigente
+    if script is None:
+        # Script anterior a ScriptGenerado (aún sin migrar)
+        response = HttpResponse(solicitud.script_sql_generado, content_type='text/plain')
+    elif _acepta_gzip(request):
+        # Se envía el blob tal como está guardado; el navegador lo descomprime.
+        # El ETag distingue la representación gzip de la sin comprimir
+        response = HttpResponse(bytes(script.contenido), content_type='text/plain; charset=utf-8')
+        response['Content-Encoding'] = 'gzip'
+        response['ETag'] = f'"{script.hash_contenido}-gzip"'
+    else:
+        response = StreamingHttpResponse(script.iterar_bytes(), content_type='text/plain; charset=utf-8')
+        response['ETag'] = f'"{script.hash_contenido}"'
+    
+    response['Vary'] = 'Accept-Encoding'
     response['Content-Disposition'] = f'attachment; filename="script_solicitud_{pk}.sql"'
     return response
 
 @login_required
 def solicitudes_pendientes_script(request):
     """Vista para mostrar solicitudes pendientes de generar script SQL"""
-    user_profile = UserProfile.objects.get_or_create(user=request.user)[0]
+    user_profile = request.user_profile
     
     # Solo ingenieros DB y admin pueden acceder
     if user_profile.role not in ['admin', 'db']:
@@ -457,17 +479,11 @@ def solicitudes_pendientes_script(request):
         return redirect('dashboard')
     
     # Solicitudes con archivo Excel pero sin script SQL generado
-    solicitudes_pendientes = Solicitud.objects.filter(
-        tipo_solicitud__in=Solicitud.TIPOS_BD,
-        archivo_adjunto__isnull=False,
-        tipo_archivo='excel',
-        script_sql_generado__isnull=True
-    ).order_by('-fecha_creacion')
+    solicitudes_pendientes = Solicitud.objects.for_listing().pendientes_de_script()
     
-    # Paginación
-    paginator = Paginator(solicitudes_pendientes, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginación por cursor (sin OFFSET)
+    paginator = PaginadorCursor(solicitudes_pendientes, 10)
+    page_obj = paginator.page(request.GET.get('cursor'), parametros=request.GET)
     
     context = {
         'page_obj': page_obj,
@@ -480,7 +496,7 @@ def solicitudes_pendientes_script(request):
 @login_required
 def lista_proyectos(request):
     """Lista proyectos según el rol del usuario"""
-    user_profile = UserProfile.objects.get_or_create(user=request.user)[0]
+    user_profile = request.user_profile
     
     if user_profile.role == 'admin':
         # Admin ve todos los proyectos
@@ -494,8 +510,8 @@ def lista_proyectos(request):
     if estado_filtro:
         proyectos = proyectos.filter(estado=estado_filtro)
     
-    # Paginación
-    paginator = Paginator(proyectos, 15)
+    # Paginación (los contadores se precargan para no contar por fila)
+    paginator = Paginator(proyectos.prefetch_related('contadores'), 15)
     page_number = request.GET.get('page')
     proyectos_page = paginator.get_page(page_number)
     
@@ -526,25 +542,32 @@ def crear_proyecto(request):
 @login_required
 def detalle_proyecto(request, pk):
     """Detalle de proyecto"""
-    proyecto = get_object_or_404(Proyecto, pk=pk)
-    user_profile = UserProfile.objects.get_or_create(user=request.user)[0]
+    proyecto = get_object_or_404(Proyecto.objects.prefetch_related('contadores'), pk=pk)
+    user_profile = request.user_profile
     
     # Verificar permisos
     if not (user_profile.role == 'admin' or user_profile.puede_gestionar_proyecto(proyecto)):
         messages.error(request, 'No tienes permisos para ver este proyecto.')
         return redirect('dashboard')
     
-    # Estadísticas del proyecto
+    # Estadísticas del proyecto (desde los contadores materializados)
     solicitudes = proyecto.solicitudes.all()
+    solicitudes_por_estado = {}
+    solicitudes_por_tipo = {}
+    for contador in proyecto.contadores.all():
+        if not contador.total:
+            continue
+        solicitudes_por_estado[contador.estado] = solicitudes_por_estado.get(contador.estado, 0) + contador.total
+        solicitudes_por_tipo[contador.tipo_solicitud] = solicitudes_por_tipo.get(contador.tipo_solicitud, 0) + contador.total
     stats = {
-        'total_solicitudes': solicitudes.count(),
+        'total_solicitudes': proyecto.get_solicitudes_total(),
         'solicitudes_activas': proyecto.get_solicitudes_activas(),
-        'solicitudes_por_estado': dict(solicitudes.values('estado').annotate(count=Count('estado')).values_list('estado', 'count')),
-        'solicitudes_por_tipo': dict(solicitudes.values('tipo_solicitud').annotate(count=Count('tipo_solicitud')).values_list('tipo_solicitud', 'count')),
+        'solicitudes_por_estado': solicitudes_por_estado,
+        'solicitudes_por_tipo': solicitudes_por_tipo,
     }
     
     # Solicitudes recientes
-    solicitudes_recientes = solicitudes.order_by('-fecha_creacion')[:10]
+    solicitudes_recientes = solicitudes.for_listing().order_by('-fecha_creacion')[:10]
     
     # Miembros del equipo
     miembros = User.objects.filter(profile__proyectos_asignados=proyecto)
@@ -649,7 +672,7 @@ def panel_administracion(request):
     proyectos_recientes = Proyecto.objects.order_by('-fecha_creacion')[:5]
     
     # Solicitudes recientes
-    solicitudes_recientes = Solicitud.objects.order_by('-fecha_creacion')[:10]
+    solicitudes_recientes = Solicitud.objects.for_listing().order_by('-fecha_creacion')[:10]
     
     # Usuarios sin perfil
     usuarios_sin_perfil = User.objects.filter(profile__isnull=True)
@@ -782,29 +805,39 @@ def inactivar_usuario(request, pk):
 def estadisticas_avanzadas(request):
     """Estadísticas avanzadas - Solo para admins"""
     
-    # Estadísticas básicas
-    total_solicitudes = Solicitud.objects.count()
-    solicitudes_por_estado = {}
-    for estado_code, estado_name in Solicitud.ESTADOS:
-        count = Solicitud.objects.filter(estado=estado_code).count()
-        solicitudes_por_estado[estado_name] = count
+    # Estadísticas básicas (agrupadas: una consulta por dimensión)
+    conteo_estados = dict(
+        Solicitud.objects.order_by().values_list('estado').annotate(total=Count('id'))
+    )
+    conteo_tipos = dict(
+        Solicitud.objects.order_by().values_list('tipo_solicitud').annotate(total=Count('id'))
+    )
+    total_solicitudes = sum(conteo_estados.values())
+    solicitudes_por_estado = {
+        estado_name: conteo_estados.get(estado_code, 0)
+        for estado_code, estado_name in Solicitud.ESTADOS
+    }
+    solicitudes_por_tipo = {
+        tipo_name: conteo_tipos.get(tipo_code, 0)
+        for tipo_code, tipo_name in Solicitud.TIPOS_SOLICITUD
+    }
     
-    solicitudes_por_tipo = {}
-    for tipo_code, tipo_name in Solicitud.TIPOS_SOLICITUD:
-        count = Solicitud.objects.filter(tipo_solicitud=tipo_code).count()
-        solicitudes_por_tipo[tipo_name] = count
-    
-    # Estadísticas por proyecto
-    proyectos_stats = []
-    for proyecto in Proyecto.objects.filter(activo=True):
-        solicitudes = proyecto.solicitudes.all()
-        proyectos_stats.append({
+    # Estadísticas por proyecto (un solo queryset anotado + contadores precargados)
+    proyectos = Proyecto.objects.filter(activo=True).annotate(
+        miembros_count=Count('miembros_equipo'),
+    ).prefetch_related('contadores')
+    proyectos_stats = [
+        {
             'proyecto': proyecto,
-            'total_solicitudes': solicitudes.count(),
+            'total_solicitudes': proyecto.get_solicitudes_total(),
             'solicitudes_activas': proyecto.get_solicitudes_activas(),
-            'solicitudes_finalizadas': solicitudes.filter(estado='finalizada').count(),
-            'miembros_count': proyecto.miembros_equipo.count(),
-        })
+            'solicitudes_finalizadas': sum(
+                c.total for c in proyecto.contadores.all() if c.estado == 'finalizada'
+            ),
+            'miembros_count': proyecto.miembros_count,
+        }
+        for proyecto in proyectos
+    ]
     
     context = {
         'total_solicitudes': total_solicitudes,
@@ -33,6 +33,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'tickets.middleware.PerfilUsuarioMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -95,6 +96,34 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Cache
+# 'scripts_sql' guarda los scripts generados por hash del archivo adjunto. Va en
+# una tabla de la base de datos para que la compartan los procesos y sobreviva
+# a los reinicios (crear la tabla con `python manage.py createcachetable`).
+# Es chica a proposito: cada version ya queda en ScriptGenerado, la cache solo
+# evita regenerar los scripts pequenos y frecuentes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'scripts_sql': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'cache_scripts_sql',
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100,
+            'CULL_FREQUENCY': 4,
+        },
+    },
+}
+
+# Tamano maximo (caracteres) de un script para guardarlo en la cache 'scripts_sql'.
+# Los mas grandes se regeneran: su version vigente ya queda en ScriptGenerado.
+SCRIPTS_SQL_CACHE_MAX_CARACTERES = 256 * 1024
+
+# Filas iniciales del Excel donde se buscan los headers de la plantilla de tablas
+EXCEL_MAX_FILAS_HEADERS = 50
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -118,5 +147,10 @@ EMAIL_HOST_PASSWORD = 'gbxh vrzi mqwv rqkp'
 # Configuración temporal para desarrollo
 DEFAULT_FROM_EMAIL = 'sistema@tickets.local'
 
+# Bandeja de salida: los correos se encolan y los envía
+# `python manage.py enviar_correos` con reintentos y backoff exponencial
+CORREOS_MAX_INTENTOS = 5
+CORREOS_BACKOFF_SEGUNDOS = 60
+
 # URL del sitio para enlaces en correos
 SITE_URL = 'http://localhost:8000'  # Cambiar en producción